@@ -0,0 +1,46 @@
+"""Time Patch.analyze on a large graph with feedback loops.
+
+Builds n objects in a ColumnarPatch, each connected from the one before it
+and from a random earlier object, with a feedback connection every 1000
+objects. Reports the time to index the graph and find cycles, and the
+time to list the outlets with fan-out.
+"""
+import random
+import sys
+import time
+
+from puredata_compiler import ColumnarPatch
+
+
+def generate(n: int, seed: int = 1) -> ColumnarPatch:
+    rng = random.Random(seed)
+    patch = ColumnarPatch()
+    obj_many, connect_many = patch.get_creators('obj_many, connect_many')
+    nodes = obj_many(['+ {}'.format(i % 100) for i in range(n)])
+    edges = []
+    for i in range(1, n):
+        edges.append((nodes[i - 1], 0, nodes[i], 0))
+        edges.append((nodes[rng.randrange(i)], 0, nodes[i], 1))
+        if i % 1000 == 0:
+            edges.append((nodes[i], 0, nodes[i - 10], 1))
+    connect_many(edges)
+    return patch
+
+
+def main(n: int):
+    patch = generate(n)
+    start = time.perf_counter()
+    analysis = patch.analyze()
+    elapsed = time.perf_counter() - start
+    print('{} nodes, {} connections'.format(n, len(patch.connections)))
+    print('  index and cycles: {:.2f} s, {} cycles'.format(
+        elapsed, len(analysis.cycles)))
+    start = time.perf_counter()
+    fanouts = analysis.fanouts
+    elapsed = time.perf_counter() - start
+    print('  fan-out:          {:.2f} s, {} outlets'.format(
+        elapsed, len(fanouts)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,62 @@
+"""Time writing large array contents and report the peak memory.
+
+A sine table of n 32-bit float samples is written to a .wav file,
+memory-mapped with ``load_samples`` and saved as ``#A`` records. Peak
+traced memory should stay near the size of one record, since the samples
+are read from the mapped file and the patch is written in chunks.
+"""
+from array import array
+import math
+import os
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from puredata_compiler import Patch, load_samples, write_file
+
+
+def write_table(filename: str, n: int) -> None:
+    """Write a 32-bit float .wav file, which is mapped without a copy"""
+    step = 1 << 16
+    with open(filename, 'wb') as fp:
+        fp.write(struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + 4 * n,
+                             b'WAVE', b'fmt ', 16, 3, 1, 44100,
+                             4 * 44100, 4, 32, b'data', 4 * n))
+        for start in range(0, n, step):
+            fp.write(array('f', (
+                math.sin(i * 0.001)
+                for i in range(start, min(n, start + step)))).tobytes())
+
+
+def write_patch(table_file: str, patch_file: str) -> None:
+    patch = Patch()
+    array_, = patch.get_creators('array')
+    array_('table', data=load_samples(table_file))
+    write_file(patch_file, patch)
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as directory:
+        table_file = os.path.join(directory, 'table.wav')
+        patch_file = os.path.join(directory, 'table.pd')
+        print('{:>10} {:>10} {:>12} {:>10} {:>10}'.format(
+            'samples', 'seconds', 'samples/s', 'MB', 'peak MiB'))
+        for n in sizes:
+            write_table(table_file, n)
+            start = time.perf_counter()
+            write_patch(table_file, patch_file)
+            elapsed = time.perf_counter() - start
+            # traced separately, since tracing slows down formatting
+            tracemalloc.start()
+            write_patch(table_file, patch_file)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('{:>10} {:>10.2f} {:>12.0f} {:>10.1f} {:>10.1f}'.format(
+                n, elapsed, n / elapsed, os.path.getsize(patch_file) / 1e6,
+                peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100000, 1000000, 10000000])
@@ -0,0 +1,56 @@
+"""Time Patch.auto_layout on a large generated graph.
+
+Builds n objects where each one is connected from one or two earlier
+objects, with a feedback connection every 100 objects, then lays the
+patch out. Reports the time, the number of layers and the number of
+overlapping boxes before and after.
+"""
+import random
+import sys
+import time
+
+from puredata_compiler import Patch, ColumnarPatch
+
+
+def generate(patch_class, n: int, seed: int = 1):
+    rng = random.Random(seed)
+    patch = patch_class()
+    obj, connect = patch.get_creators('obj, connect')
+    nodes = [obj('loadbang')]
+    for i in range(1, n):
+        first = nodes[rng.randrange(max(0, i - 50), i)]
+        second = nodes[rng.randrange(0, i)]
+        # every new node is placed in one long row
+        nodes.append(obj('+ {}'.format(i % 100), first[0], second[0],
+                         x_pos=25, y_pos=25))
+        if i % 100 == 0:
+            connect(nodes[i - 50], (), nodes[i][0])
+    return patch
+
+
+def overlaps(patch) -> int:
+    """Count boxes that share their position with an earlier box"""
+    seen = set()
+    count = 0
+    for node in patch.nodes:
+        if node.position in seen:
+            count += 1
+        seen.add(node.position)
+    return count
+
+
+def main(n: int):
+    for patch_class in (Patch, ColumnarPatch):
+        patch = generate(patch_class, n)
+        before = overlaps(patch)
+        start = time.perf_counter()
+        patch.auto_layout()
+        elapsed = time.perf_counter() - start
+        layers = len({node.position[1] for node in patch.nodes})
+        print('{} ({} nodes): {:.2f} s, {} lines, overlaps {} -> {}'.format(
+            patch_class.__name__, n, elapsed, layers, before,
+            overlaps(patch)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,34 @@
+"""Time patch construction as the node count grows.
+
+Each node is connected to the one before it, so every creator call goes
+through ``Patch.add_connections``. Build time should grow linearly.
+"""
+import sys
+import time
+
+from puredata_compiler import Patch
+
+
+def build(n: int) -> Patch:
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    prev = obj('loadbang')
+    for i in range(1, n):
+        prev = obj('f', prev[0], new_row=0 if i % 16 else 1)
+    return patch
+
+
+def main(sizes):
+    print('{:>10} {:>10} {:>12}'.format('nodes', 'seconds', 'us/node'))
+    for n in sizes:
+        start = time.perf_counter()
+        build(n)
+        elapsed = time.perf_counter() - start
+        print('{:>10} {:>10.3f} {:>12.2f}'.format(n, elapsed, elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main([int(arg) for arg in sys.argv[1:]])
+    else:
+        main([1000, 10000, 100000, 1000000])
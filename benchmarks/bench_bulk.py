@@ -0,0 +1,54 @@
+"""Compare bulk creators with the equivalent loop of creator calls.
+
+Creates n objects in rows of 64, each connected to a shared source, with
+``create_obj`` in a loop and with ``obj_many`` plus ``connect_many``.
+"""
+import sys
+import time
+
+from puredata_compiler import Patch, ColumnarPatch
+
+ROW = 64
+
+
+def with_loop(patch_class, texts):
+    patch = patch_class()
+    obj, = patch.get_creators('obj')
+    source = obj('loadbang')
+    for i, text in enumerate(texts):
+        obj(text, source[0], new_row=0 if i % ROW else 1)
+    return patch
+
+
+def with_bulk(patch_class, texts):
+    patch = patch_class()
+    obj, obj_many, connect_many = patch.get_creators(
+        'obj, obj_many, connect_many')
+    source = obj('loadbang')
+    nodes = []
+    for start in range(0, len(texts), ROW):
+        nodes.extend(obj_many(texts[start:start + 1], new_row=1))
+        nodes.extend(obj_many(texts[start + 1:start + ROW], new_row=0))
+    connect_many((source, 0, node, 0) for node in nodes)
+    return patch
+
+
+def main(n: int):
+    texts = ['+ {}'.format(i % 1000) for i in range(n)]
+    for patch_class in (Patch, ColumnarPatch):
+        timings = {}
+        output = {}
+        for build in (with_loop, with_bulk):
+            start = time.perf_counter()
+            patch = build(patch_class, texts)
+            timings[build] = time.perf_counter() - start
+            output[build] = str(patch)
+        assert output[with_loop] == output[with_bulk]
+        print('{} ({} nodes)'.format(patch_class.__name__, n))
+        for build, elapsed in timings.items():
+            print('  {:<10} {:.2f} s  {:.0f} nodes/s'.format(
+                build.__name__, elapsed, n / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,69 @@
+"""Compare a clone-based voice bank with one subpatch copy per voice.
+
+The copy-per-voice bank builds a separate Patch for every voice, as
+generator scripts do today; the clone bank writes the voice once as an
+abstraction and adds a single ``clone`` object.
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from example import envelope  # noqa: E402
+from puredata_compiler import Patch, write_file  # noqa: E402
+
+
+def voice() -> Patch:
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    inlet = obj('inlet')
+    unpack = obj('unpack 0 0 0 0 0 0', inlet[0])
+    osc = obj('osc~', unpack[0])
+    env = subpatch('envelope', envelope(), unpack[1])
+    out = obj('*~', osc[0], env[0])
+    obj('outlet~', out[0])
+    return patch
+
+
+def copy_per_voice(voices: int) -> Patch:
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    note = obj('r note')
+    router = obj('route ' + ' '.join(map(str, range(voices))), note[0])
+    mix = [subpatch('voice', voice(), router[i], new_row=0)
+           for i in range(voices)]
+    obj('dac~', tuple(m[0] for m in mix))
+    return patch
+
+
+def cloned(voices: int) -> Patch:
+    patch = Patch()
+    obj, clone = patch.get_creators('obj, clone')
+    note = obj('r note')
+    bank = clone('voice', voice(), voices, note[0])
+    obj('dac~', bank[0])
+    return patch
+
+
+def main(voices: int):
+    directory = tempfile.mkdtemp()
+    for build in (copy_per_voice, cloned):
+        start = time.perf_counter()
+        patch = build(voices)
+        filename = os.path.join(directory, build.__name__ + '.pd')
+        write_file(filename, patch)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(filename)
+        if build is cloned:
+            size += os.path.getsize(os.path.join(directory, 'voice.pd'))
+        print('{:<15} {} voices: {:.3f} s, {} bytes'.format(
+            build.__name__, voices, elapsed, size))
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
@@ -0,0 +1,64 @@
+"""Compare Patch and ColumnarPatch on a patch with many connections.
+
+Builds the same graph with both backends and reports the memory held
+after building (tracemalloc) and the time to serialize it.
+"""
+import collections
+import sys
+import time
+import tracemalloc
+
+from puredata_compiler import Patch, ColumnarPatch
+
+
+def build(patch_class, n: int, fan_in: int = 3):
+    patch = patch_class()
+    obj, msg, connect = patch.get_creators('obj, msg, connect')
+    # only the last few nodes are kept, as a generator script would
+    recent = collections.deque([obj('loadbang')], maxlen=fan_in)
+    for i in range(1, n):
+        create = msg if i % 8 == 0 else obj
+        node = create('+ {}'.format(i % 64), recent[-1][0],
+                      new_row=0 if i % 16 else 1)
+        for previous in list(recent)[:-1]:
+            connect(node, (), previous[0])
+        recent.append(node)
+    return patch
+
+
+def measure(patch_class, n: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    patch = build(patch_class, n)
+    build_time = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    size = sum(map(len, patch.iter_lines()))
+    serialize_time = time.perf_counter() - start
+    return {'connections': len(patch.connections),
+            'build': build_time,
+            'memory': memory,
+            'serialize': serialize_time,
+            'chars': size}
+
+
+def main(n: int):
+    results = {}
+    for patch_class in (Patch, ColumnarPatch):
+        results[patch_class] = r = measure(patch_class, n)
+        print('{}: {} nodes, {} connections'.format(
+            patch_class.__name__, n, r['connections']))
+        print('  build:     {:.2f} s'.format(r['build']))
+        print('  memory:    {:.1f} MiB'.format(r['memory'] / 2 ** 20))
+        print('  serialize: {:.2f} s'.format(r['serialize']))
+    plain, columnar = results[Patch], results[ColumnarPatch]
+    assert plain['chars'] == columnar['chars']
+    print('memory ratio:    {:.1f}x'.format(
+        plain['memory'] / columnar['memory']))
+    print('serialize ratio: {:.1f}x'.format(
+        plain['serialize'] / columnar['serialize']))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,58 @@
+"""Report DSP object counts and estimated cost before and after
+Patch.optimize_dsp.
+
+Modelled on example.py: each voice is a subpatch holding an oscillator
+and the ``envelope()`` subpatch, whose output goes through a chain of
+``*~`` objects. Inlining removes the inlet~/outlet~ copies and fusing
+turns each chain into one ``expr~``.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from example import envelope  # noqa: E402
+from puredata_compiler import Patch  # noqa: E402
+
+
+def voice_bank(voices: int) -> Patch:
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    note = obj('r note')
+    router = obj('route ' + ' '.join(str(i) for i in range(voices)),
+                 note[0])
+    outputs = []
+    for i in range(voices):
+        voice = Patch()
+        v_obj, v_subpatch = voice.get_creators('obj, subpatch')
+        inlet = v_obj('inlet')
+        env = v_subpatch('envelope', envelope(), inlet[0])
+        osc = v_obj('osc~ {}'.format(110 * (i + 1)), new_row=0)
+        level = v_obj('*~', osc[0], env[0])
+        level = v_obj('*~ 0.1', level[0])
+        v_obj('outlet~', level[0])
+        outputs.append(subpatch('voice{}'.format(i), voice, router[i],
+                                new_row=0)[0])
+    obj('dac~', tuple(outputs), tuple(outputs))
+    return patch
+
+
+def main(voices: int):
+    patch = voice_bank(voices)
+    cost_before = patch.cost_report().cost_per_block
+    start = time.perf_counter()
+    report = patch.optimize_dsp()
+    elapsed = time.perf_counter() - start
+    cost_after = patch.cost_report().cost_per_block
+    print('{} voices in {:.3f} s'.format(voices, elapsed))
+    print('  DSP objects {} -> {}'.format(report.dsp_objects_before,
+                                          report.dsp_objects_after))
+    print('  {} subpatches inlined, {} chains fused'.format(
+        report.inlined_subpatches, report.fused_chains))
+    print('  estimated cost per block {:.0f} -> {:.0f}'.format(
+        cost_before, cost_after))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
@@ -0,0 +1,69 @@
+"""Time batched graph edits on a large patch.
+
+Builds n objects, each connected from the one before it and from a
+random earlier object, then removes, replaces and inserts nodes in one
+``Patch.edit`` batch. Then 20 single ``Patch.remove`` calls are timed,
+along with the read of ``nodes`` that applies them.
+"""
+import random
+import sys
+import time
+
+from puredata_compiler import Patch
+from puredata_compiler.api import Obj
+
+
+def generate(n: int, rng: random.Random) -> Patch:
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    nodes = [obj('t f f')]
+    for i in range(1, n):
+        nodes.append(obj('+ 1', nodes[i - 1][0],
+                         nodes[rng.randrange(i)][1], new_row=0))
+    return patch
+
+
+def main(n: int, edits: int):
+    rng = random.Random(1)
+    patch = generate(n, rng)
+    nodes = list(patch.nodes)
+    start = time.perf_counter()
+    graph = patch.edit()
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    picked = rng.sample(range(1, n - 1), 3 * edits)
+    changed = set(picked[:2 * edits])
+    for i in range(edits):
+        graph.remove(nodes[picked[i]])
+        graph.replace(nodes[picked[edits + i]], Obj(0, 0, '- 1'))
+        sink = nodes[picked[2 * edits + i] + 1]
+        if picked[2 * edits + i] + 1 not in changed:
+            graph.insert_between(nodes[picked[2 * edits + i]][0], (sink, 0),
+                                 Obj(0, 0, 't f'))
+    edited = time.perf_counter() - start
+    start = time.perf_counter()
+    graph.apply()
+    applied = time.perf_counter() - start
+    print('{} nodes, {} edits of each kind'.format(n, edits))
+    print('  edit():   {:.3f} s'.format(opened))
+    print('  edits:    {:.3f} s ({:.1f} us each)'.format(
+        edited, edited / (3 * edits) * 1e6))
+    print('  apply():  {:.3f} s'.format(applied))
+    print('  now {} nodes, {} connections'.format(len(patch.nodes),
+                                                  len(patch.connections)))
+    # the first call indexes the connections, and the next read of the
+    # graph renumbers the patch once for all of them
+    start = time.perf_counter()
+    for node in patch.nodes[1:41:2]:
+        patch.remove(node)
+    removed = time.perf_counter() - start
+    start = time.perf_counter()
+    count = len(patch.nodes)
+    read = time.perf_counter() - start
+    print('  20 Patch.remove calls: {:.3f} s, then applied on the next '
+          'read: {:.3f} s ({} nodes)'.format(removed, read, count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
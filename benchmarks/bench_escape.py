@@ -0,0 +1,71 @@
+"""Check and time the escape/unescape codec on message strings.
+
+Before timing, the codec is compared with the original multi-pass
+``re.sub`` implementation on random strings, and the round trip
+``unescape(escape(text))`` is checked against it.
+"""
+import random
+import re
+import sys
+import time
+
+from puredata_compiler.api import escape, escape_many, unescape
+
+
+def reference_escape(text: str) -> str:
+    save = re.sub(r'\\', '\\\\', text)
+    save = re.sub(r';', ' \\; ', save)
+    save = re.sub(r',', ' \\, ', save)
+    save = re.sub(r'\$(?=[0-9])', '\\$', save)
+    return save
+
+
+def reference_unescape(text: str) -> str:
+    disp = re.sub(r' (?<!\\)\\; ', '\n', text)
+    disp = re.sub(r' (?<!\\)\\, ', ',', disp)
+    disp = re.sub(r'(?<!\\)\\$', '$', disp)
+    lines = [l.strip() for l in disp.split('\n')]
+    return '\n'.join(lines)
+
+
+ALPHABET = 'ab 1;,$\\\n\t \u00b2'
+
+
+def random_text(rng: random.Random) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40)))
+
+
+def check(samples: int, seed: int = 0):
+    rng = random.Random(seed)
+    texts = [random_text(rng) for _ in range(samples)]
+    for text in texts:
+        saved = escape(text)
+        assert saved == reference_escape(text), repr(text)
+        assert unescape(text) == reference_unescape(text), repr(text)
+        assert unescape(saved) == reference_unescape(reference_escape(text)), \
+            repr(text)
+    assert escape_many(texts) == [reference_escape(t) for t in texts]
+    print('{} random strings match the reference codec'.format(samples))
+
+
+def timed(label, fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    print('  {:<20} {:.3f} s'.format(label, time.perf_counter() - start))
+
+
+def main(n: int):
+    check(100000)
+    messages = ['{} 0.5, {} $1; note {}'.format(i, i * 2, i % 88)
+                for i in range(n)]
+    saved = escape_many(messages)
+    print('{} message strings'.format(n))
+    timed('reference escape', lambda: [reference_escape(m) for m in messages])
+    timed('escape', lambda: [escape(m) for m in messages])
+    timed('escape_many', escape_many, messages)
+    timed('reference unescape', lambda: [reference_unescape(m) for m in saved])
+    timed('unescape', lambda: [unescape(m) for m in saved])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,57 @@
+"""Time full, no-op and partial builds with ``puredata_compiler.build``.
+
+Writes a build module with several targets to a temporary directory and
+builds it three times: from scratch, with nothing changed, and after
+editing the module so that one target's text changes. Reports the time of
+each build and how many files were written.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from puredata_compiler.build import build
+
+MODULE = '''
+from puredata_compiler import ColumnarPatch
+
+CHANGED = {changed}
+
+
+def make(seed, size={size}):
+    def factory():
+        patch = ColumnarPatch()
+        obj_many, = patch.get_creators('obj_many')
+        offset = 1 if seed == 0 and CHANGED else 0
+        obj_many(['+ {{}}'.format(seed + i + offset) for i in range(size)])
+        return patch
+    return factory
+
+
+TARGETS = {{'patch{{}}.pd'.format(i): make(i) for i in range({targets})}}
+'''
+
+
+def timed(label: str, module: str, directory: str) -> None:
+    start = time.perf_counter()
+    report = build([module], directory)
+    elapsed = time.perf_counter() - start
+    print('{:<10} {:>7.2f} s  {:>3} written, {:>3} unchanged'.format(
+        label, elapsed, len(report.written), len(report.unchanged)))
+
+
+def main(targets: int, size: int):
+    with tempfile.TemporaryDirectory() as directory:
+        module = os.path.join(directory, 'patches.py')
+        with open(module, 'w') as fp:
+            fp.write(MODULE.format(changed=False, size=size, targets=targets))
+        timed('full', module, directory)
+        timed('no-op', module, directory)
+        with open(module, 'w') as fp:
+            fp.write(MODULE.format(changed=True, size=size, targets=targets))
+        timed('one edit', module, directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
@@ -0,0 +1,41 @@
+"""Compare build and serialize time with and without instrumentation.
+
+Builds and serializes the ``chain`` and ``voices`` workloads three ways:
+before instrumentation was ever enabled, inside ``instrument()``, and
+after it. The first and last runs should take the same time, since the
+wrappers are removed when the block exits.
+"""
+import gc
+import sys
+import time
+
+from puredata_compiler import instrument
+from puredata_compiler.api import subpatch_cache_clear
+
+from workloads import chain, voices
+
+
+def run(size: int) -> float:
+    gc.collect()
+    start = time.perf_counter()
+    for factory in (chain, voices):
+        subpatch_cache_clear()
+        str(factory(size))
+    return time.perf_counter() - start
+
+
+def main(size: int):
+    before = min(run(size) for _ in range(3))
+    with instrument() as instrumentation:
+        enabled = run(size)
+    after = min(run(size) for _ in range(3))
+    print('before: {:.3f} s'.format(before))
+    print('inside: {:.3f} s'.format(enabled))
+    print('after:  {:.3f} s'.format(after))
+    for phase, timing in sorted(instrumentation.timings()['phases'].items()):
+        print('  {:<17} {:>8} calls {:>8.3f} s'.format(
+            phase, timing.count, timing.seconds))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
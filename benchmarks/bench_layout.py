@@ -0,0 +1,41 @@
+"""Time creation of long rows built with ``new_row=0``.
+
+Every object in a row is placed from the size of the one before it, so
+this measures how often ``Obj.size`` and ``Msg.size`` are recomputed.
+"""
+import sys
+import time
+
+from puredata_compiler import Patch
+
+
+def build_rows(n: int, row_length: int) -> Patch:
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    for i in range(n):
+        new_row = 0 if i % row_length else 1
+        if i % 2:
+            msg('set $1, bang; recv {}'.format(i), new_row=new_row)
+        else:
+            obj('pack 0 0 {}'.format(i), new_row=new_row)
+    return patch
+
+
+def main(n, row_length):
+    start = time.perf_counter()
+    patch = build_rows(n, row_length)
+    build_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for node in patch.nodes:
+        node.get_next_position(0, 0)
+    remeasure_time = time.perf_counter() - start
+    print('{} nodes, rows of {}'.format(n, row_length))
+    print('  create:        {:.3f} s ({:.2f} us/node)'.format(
+        build_time, build_time / n * 1e6))
+    print('  re-layout all: {:.3f} s ({:.2f} us/node)'.format(
+        remeasure_time, remeasure_time / n * 1e6))
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [100000, 1000][len(args):]))
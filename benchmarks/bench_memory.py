@@ -0,0 +1,40 @@
+"""Measure the memory held by a large patch with tracemalloc.
+
+Builds a chain of objects, each connected to the previous one, and
+reports the traced memory once the patch is complete.
+"""
+import sys
+import time
+import tracemalloc
+
+from puredata_compiler import Patch
+
+
+def build(n: int) -> Patch:
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    prev = obj('loadbang')
+    for i in range(1, n):
+        create = msg if i % 4 == 0 else obj
+        prev = create('+ {}'.format(i % 100), prev[0],
+                      new_row=0 if i % 16 else 1)
+    return patch
+
+
+def main(n: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    patch = build(n)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('{} nodes, {} connections'.format(len(patch.nodes),
+                                            len(patch.connections)))
+    print('  build:   {:.1f} s'.format(elapsed))
+    print('  current: {:.1f} MiB ({:.0f} bytes/node)'.format(
+        current / 2 ** 20, current / n))
+    print('  peak:    {:.1f} MiB'.format(peak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
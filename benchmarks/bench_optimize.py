@@ -0,0 +1,40 @@
+"""Time Patch.optimize on a generated patch with dead and constant chains.
+
+Each group has a constant ``msg -> t b f -> f -> +`` chain that folds to a
+single message, an arithmetic object whose output is unused and a live
+``print``. Reports the time and the removed objects and connections.
+"""
+import sys
+import time
+
+from puredata_compiler import Patch
+
+
+def generate(n: int) -> Patch:
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    loadbang = obj('loadbang')
+    for i in range(n):
+        trigger = msg('bang', loadbang[0])
+        value = msg(str(i % 100), trigger[0], new_row=0)
+        split = obj('t b f', value[0], new_row=0)
+        store = obj('f', split[0], split[1], new_row=0)
+        add = obj('+ 1', store[0], new_row=0)
+        obj('* 2', add[0], new_row=0)
+        obj('print', add[0], new_row=0)
+    return patch
+
+
+def main(n: int):
+    patch = generate(n)
+    before = len(patch.nodes), len(patch.connections)
+    start = time.perf_counter()
+    report = patch.optimize()
+    elapsed = time.perf_counter() - start
+    print('{} groups, {} nodes, {} connections: {:.2f} s'.format(
+        n, *before, elapsed))
+    print(report)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
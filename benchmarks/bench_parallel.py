@@ -0,0 +1,62 @@
+"""Measure how serialization and multi-file builds scale with processes.
+
+Serializes a patch made of many distinct subpatches, and builds several
+output files with ``compile_many``, for an increasing number of worker
+processes. Parallel output is checked against the serial text.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from puredata_compiler import Patch, compile_many
+from puredata_compiler.api import subpatch_cache_clear
+
+
+def section(seed: int, size: int = 2000) -> Patch:
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    prev = obj('inlet')
+    for i in range(size):
+        prev = obj('+ {}'.format(seed * size + i), prev[0],
+                   new_row=0 if i % 8 else 1)
+    obj('outlet', prev[0])
+    return patch
+
+
+def big_patch(sections: int = 64) -> Patch:
+    patch = Patch()
+    subpatch, = patch.get_creators('subpatch')
+    for i in range(sections):
+        subpatch('section{}'.format(i), section(i), new_row=0)
+    return patch
+
+
+def main(max_processes: int):
+    patch = big_patch()
+    subpatch_cache_clear()
+    start = time.perf_counter()
+    expected = patch.serialize()
+    print('serialize, serial:       {:.2f} s'.format(
+        time.perf_counter() - start))
+    directory = tempfile.mkdtemp()
+    targets = {os.path.join(directory, 'out{}.pd'.format(i)): big_patch
+               for i in range(4)}
+    for processes in range(1, max_processes + 1):
+        subpatch_cache_clear()
+        start = time.perf_counter()
+        text = patch.serialize(parallel=True, processes=processes)
+        elapsed = time.perf_counter() - start
+        assert text == expected
+        print('serialize, {} processes: {:.2f} s'.format(processes, elapsed))
+        start = time.perf_counter()
+        compile_many(targets, processes)
+        print('compile_many, {} processes: {:.2f} s'.format(
+            processes, time.perf_counter() - start))
+    for filename in targets:
+        os.remove(filename)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count() or 1)
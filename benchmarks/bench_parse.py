@@ -0,0 +1,48 @@
+"""Measure .pd parsing throughput in MB/s.
+
+Writes a generated patch with nested subpatches to a temporary file,
+loads it back with ``Patch.load`` and checks that it round-trips.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from puredata_compiler import Patch, write_file
+
+
+def generate(n: int) -> Patch:
+    patch = Patch()
+    obj, msg, subpatch = patch.get_creators('obj, msg, subpatch')
+    prev = obj('loadbang')
+    for i in range(1, n):
+        if i % 1000 == 0:
+            inner = generate(50)
+            prev = subpatch('voice{}'.format(i), inner, prev[0])
+        elif i % 4 == 0:
+            prev = msg('set {}, bang; note $1'.format(i), prev[0], new_row=0)
+        else:
+            prev = obj('+ {}'.format(i), prev[0])
+    return patch
+
+
+def main(n: int):
+    patch = generate(n)
+    fd, path = tempfile.mkstemp(suffix='.pd')
+    os.close(fd)
+    try:
+        write_file(path, patch)
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        loaded = Patch.load(path)
+        elapsed = time.perf_counter() - start
+        with open(path) as fp:
+            assert str(loaded) == fp.read()
+    finally:
+        os.remove(path)
+    print('{:.1f} MB in {:.2f} s: {:.1f} MB/s'.format(
+        size / 1e6, elapsed, size / 1e6 / elapsed))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
@@ -0,0 +1,85 @@
+"""Time the control-rate simulator on message-heavy patches.
+
+A chain of n ``+ 1`` objects between ``r in`` and ``s out`` receives
+repeated sends, a counter clocked by ``delay 1`` runs for a number of
+virtual milliseconds, and the note routing of ``example.py`` plays
+notes. The chain and the counter report messages per second, counting
+each message delivered to an inlet.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from example import example  # noqa: E402
+from puredata_compiler import Patch  # noqa: E402
+
+
+def chain(n: int) -> Patch:
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    prev = obj('r in')
+    for i in range(n):
+        prev = obj('+ 1', prev[0], new_row=0 if i % 32 else 1)
+    obj('s out', prev[0])
+    return patch
+
+
+def counter() -> Patch:
+    """A counter that counts once per virtual millisecond"""
+    patch = Patch()
+    obj, connect = patch.get_creators('obj, connect')
+    start = obj('r start')
+    value = obj('f', start[0])
+    increment = obj('+ 1', value[0], new_row=0)
+    connect(value, (), increment[0])
+    again = obj('t b', value[0])
+    tick = obj('delay 1', again[0])
+    connect(value, tick[0])
+    return patch
+
+
+def report(name: str, messages: int, elapsed: float) -> None:
+    print('{}: {} messages in {:.3f} s, {:.2f} M messages/s'.format(
+        name, messages, elapsed, messages / elapsed / 1e6))
+
+
+def main(n: int, sends: int, ticks: int):
+    patch = chain(n)
+    start = time.perf_counter()
+    sim = patch.simulate()
+    print('compile {} objects: {:.3f} s'.format(
+        len(patch.nodes), time.perf_counter() - start))
+    out = sim.watch('out')
+    start = time.perf_counter()
+    for i in range(sends):
+        sim.send('in', i)
+    # the receive, each object and the send deliver one message each
+    report('chain', sends * (n + 2), time.perf_counter() - start)
+    assert out[-1] == sends - 1 + n
+
+    sim = counter().simulate()
+    count = sim.probe(('', 2))
+    start = time.perf_counter()
+    sim.send('start')
+    sim.advance(ticks)
+    # each tick sends to f, + 1, the right inlet of f, t b and delay
+    report('counter', 5 * ticks, time.perf_counter() - start)
+    assert count[-1] == ticks + 1
+
+    sim = example().simulate()
+    frequencies = sim.probe(('', 8), 1)
+    start = time.perf_counter()
+    for i in range(sends):
+        sim.send('note', 440, 0.8 if i % 2 else 0.0, 80, 0, 1.0, 320)
+    elapsed = time.perf_counter() - start
+    print('example notes: {} in {:.3f} s, {:.0f} notes/s'.format(
+        sends, elapsed, sends / elapsed))
+    assert len(frequencies) == sends // 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10000,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 200000)
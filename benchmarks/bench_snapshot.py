@@ -0,0 +1,76 @@
+"""Compare binary snapshots with pickle for a large built patch.
+
+Builds the ``chain`` and ``voices`` workloads into one Patch, then
+reports the file size and the time to save, to load, and to load and
+write a ``.pd`` file, for ``pickle`` and for ``Patch.save_snapshot``.
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from puredata_compiler import Patch
+from puredata_compiler.api import subpatch_cache_clear
+
+from workloads import chain, voices
+
+
+def build(size: int) -> Patch:
+    patch = Patch()
+    subpatch, = patch.get_creators('subpatch')
+    subpatch('chain', chain(size))
+    subpatch('voices', voices(size))
+    return patch
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def report(label: str, filename: str, save: float, load: float,
+           emit: float) -> None:
+    print('{:<9} {:>8.1f} MiB  save {:>6.2f} s  load {:>6.3f} s  '
+          'load and write .pd {:>6.2f} s'.format(
+              label, os.path.getsize(filename) / 2 ** 20, save, load, emit))
+
+
+def write_pd(patch: Patch, filename: str) -> None:
+    subpatch_cache_clear()
+    with open(filename, 'w') as fp:
+        patch.write_to(fp)
+
+
+def main(size: int):
+    patch = build(size)
+    with tempfile.TemporaryDirectory() as directory:
+        pd_file = os.path.join(directory, 'out.pd')
+        pickle_file = os.path.join(directory, 'patch.pickle')
+        snapshot_file = os.path.join(directory, 'patch.pds')
+
+        def dump():
+            with open(pickle_file, 'wb') as fp:
+                pickle.dump(patch, fp, pickle.HIGHEST_PROTOCOL)
+
+        def load_pickle():
+            with open(pickle_file, 'rb') as fp:
+                return pickle.load(fp)
+
+        _, save = timed(dump)
+        _, load = timed(load_pickle)
+        _, emit = timed(lambda: write_pd(load_pickle(), pd_file))
+        report('pickle', pickle_file, save, load, emit)
+
+        _, save = timed(lambda: patch.save_snapshot(snapshot_file))
+        _, load = timed(lambda: Patch.load_snapshot(snapshot_file))
+        _, emit = timed(lambda: write_pd(Patch.load_snapshot(snapshot_file),
+                                         pd_file))
+        report('snapshot', snapshot_file, save, load, emit)
+        with open(pd_file) as fp:
+            assert fp.read() == str(patch)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
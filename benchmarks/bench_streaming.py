@@ -0,0 +1,61 @@
+"""Compare the peak memory of building and writing a large patch with
+Patch and with StreamingPatch.
+
+Builds the same chain of objects as bench_memory.py and writes it to a
+temporary file, reporting the time and the peak traced memory. The
+StreamingPatch peak should stay flat as the node count grows.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from puredata_compiler import Patch, StreamingPatch, write_file
+
+
+def build(patch: Patch, n: int) -> None:
+    obj, msg = patch.get_creators('obj, msg')
+    prev = obj('loadbang')
+    for i in range(1, n):
+        create = msg if i % 4 == 0 else obj
+        prev = create('+ {}'.format(i % 100), prev[0],
+                      new_row=0 if i % 16 else 1)
+
+
+def run_patch(filename: str, n: int) -> None:
+    patch = Patch()
+    build(patch, n)
+    write_file(filename, patch)
+
+
+def run_streaming(filename: str, n: int) -> None:
+    with StreamingPatch.open(filename) as patch:
+        build(patch, n)
+
+
+def measure(label: str, run, filename: str, n: int) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    run(filename, n)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('  {:<10} {:6.1f} s  peak {:8.1f} MiB  {} bytes'.format(
+        label, elapsed, peak / 2 ** 20, os.path.getsize(filename)))
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            print('{} nodes'.format(n))
+            patch_file = os.path.join(directory, 'patch.pd')
+            stream_file = os.path.join(directory, 'stream.pd')
+            measure('Patch', run_patch, patch_file, n)
+            measure('Streaming', run_streaming, stream_file, n)
+            with open(patch_file) as a, open(stream_file) as b:
+                assert a.read() == b.read()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
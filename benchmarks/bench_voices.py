@@ -0,0 +1,47 @@
+"""Serialize a voice bank that reuses one envelope subpatch.
+
+Modelled on example.py: every voice inserts the same ``envelope()``
+Patch instance. With the subpatch cache, the envelope body should be
+serialized once however many voices there are.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from example import envelope  # noqa: E402
+from puredata_compiler import Patch  # noqa: E402
+from puredata_compiler.api import (  # noqa: E402
+    subpatch_cache_clear, subpatch_cache_info)
+
+
+def voice_bank(voices: int) -> Patch:
+    env = envelope()
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    note = obj('r note')
+    router = obj('route ' + ' '.join(str(i) for i in range(voices)),
+                 note[0])
+    for i in range(voices):
+        voice = Patch()
+        v_obj, v_subpatch = voice.get_creators('obj, subpatch')
+        inlet = v_obj('inlet')
+        v_subpatch('envelope', env, inlet[0])
+        subpatch('voice{}'.format(i), voice, router[i], new_row=0)
+    return patch
+
+
+def main(voices: int):
+    patch = voice_bank(voices)
+    subpatch_cache_clear()
+    start = time.perf_counter()
+    text = str(patch)
+    elapsed = time.perf_counter() - start
+    print('{} voices: {} chars in {:.3f} s'.format(voices, len(text),
+                                                   elapsed))
+    print('  {}'.format(subpatch_cache_info()))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 64)
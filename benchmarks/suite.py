@@ -0,0 +1,169 @@
+"""Run the synthetic workloads and record build, layout and serialize cost.
+
+For each workload in ``workloads.py``, times building the patch, laying
+it out with ``Patch.auto_layout``, subpatches included, and serializing
+it with ``str``, taking the best of several runs. A separate pass under tracemalloc records the
+peak memory allocated in each phase, since tracing slows the timed code.
+
+    PYTHONPATH=. python benchmarks/suite.py -o before.json
+    PYTHONPATH=. python benchmarks/suite.py -o after.json --compare before.json
+
+With ``--compare``, phases slower than the baseline by more than the
+tolerance are listed and the exit status is 1.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from puredata_compiler import Patch
+from puredata_compiler.api import Subpatch, subpatch_cache_clear
+
+from workloads import WORKLOADS
+
+DEFAULT_SIZE = 50000
+PHASES = ('build', 'layout', 'serialize')
+
+
+def count_nodes(patch: Patch) -> int:
+    count = 0
+    for node in patch.nodes:
+        count += 1
+        if isinstance(node, Subpatch):
+            count += count_nodes(node.src)
+    return count
+
+
+def layout_all(patch: Patch) -> None:
+    """Lay out a patch and each subpatch it contains"""
+    patch.auto_layout()
+    for node in patch.nodes:
+        if isinstance(node, Subpatch):
+            layout_all(node.src)
+
+
+def run_phases(factory: Callable[[int], Patch], size: int,
+               measure: Callable[[Callable[[], object]], float]
+               ) -> Dict[str, float]:
+    """Run each phase once, returning what ``measure`` reports for it"""
+    results = {}
+    patch = None
+
+    def build():
+        nonlocal patch
+        patch = factory(size)
+
+    def serialize():
+        subpatch_cache_clear()
+        return str(patch)
+
+    results['build'] = measure(build)
+    results['layout'] = measure(lambda: layout_all(patch))
+    results['serialize'] = measure(serialize)
+    return results
+
+
+def elapsed(function: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def peak_mib(function: Callable[[], object]) -> float:
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def run_workload(name: str, size: int, repeat: int) -> dict:
+    factory = WORKLOADS[name]
+    runs = [run_phases(factory, size, elapsed) for _ in range(repeat)]
+    result = {phase + '_s': min(run[phase] for run in runs)
+              for phase in PHASES}
+    memory = run_phases(factory, size, peak_mib)
+    for phase in PHASES:
+        result[phase + '_peak_mib'] = memory[phase]
+    patch = factory(size)
+    result['nodes'] = count_nodes(patch)
+    result['chars'] = len(str(patch))
+    return result
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results: dict, baseline: dict,
+                tolerance: float) -> List[str]:
+    """List the phases slower than the baseline by more than a fraction
+    """
+    found = []
+    for name, result in results['workloads'].items():
+        before = baseline['workloads'].get(name)
+        if before is None or before['size'] != result['size']:
+            continue
+        for phase in PHASES:
+            key = phase + '_s'
+            if result[key] > before[key] * (1 + tolerance):
+                found.append('{} {}: {:.3f} s -> {:.3f} s'.format(
+                    name, phase, before[key], result[key]))
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('workloads', nargs='*',
+                        help='workloads to run, by default all of: ' +
+                        ', '.join(WORKLOADS))
+    parser.add_argument('-n', '--size', type=int, default=DEFAULT_SIZE,
+                        help='approximate nodes per workload')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='a JSON file from an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed slowdown against the baseline')
+    args = parser.parse_args(argv)
+    for name in args.workloads:
+        if name not in WORKLOADS:
+            parser.error('unknown workload {!r}'.format(name))
+
+    results = {'commit': git_commit(), 'python': platform.python_version(),
+               'workloads': {}}
+    print('{:<10} {:>8} {:>9} {:>9} {:>9} {:>10}'.format(
+        'workload', 'nodes', 'build s', 'layout s', 'serial s', 'peak MiB'))
+    for name in args.workloads or WORKLOADS:
+        result = run_workload(name, args.size, args.repeat)
+        result['size'] = args.size
+        results['workloads'][name] = result
+        print('{:<10} {:>8} {:>9.3f} {:>9.3f} {:>9.3f} {:>10.1f}'.format(
+            name, result['nodes'], result['build_s'], result['layout_s'],
+            result['serialize_s'],
+            max(result[phase + '_peak_mib'] for phase in PHASES)))
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2)
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        slower = regressions(results, baseline, args.tolerance)
+        for line in slower:
+            print('slower:', line)
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Synthetic patch generators for the benchmark suite.
+
+Each workload takes a size, roughly the number of nodes it creates, and
+builds a Patch through the creators, so building it times
+``create_obj``, ``add_connections`` and the ``Obj.size`` measurements
+behind ``new_row`` and ``new_col``.
+"""
+import os
+import random
+import sys
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from example import envelope  # noqa: E402
+from puredata_compiler import Patch  # noqa: E402
+
+
+def chain(size: int) -> Patch:
+    """Objects in long rows, each connected to the one before"""
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    prev = obj('loadbang')
+    for i in range(1, size):
+        prev = obj('+ {}'.format(i % 100), prev[0],
+                   new_row=0 if i % 32 else 1)
+    return patch
+
+
+def fanout(size: int) -> Patch:
+    """Groups of objects all connected to one outlet"""
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    width = 256
+    for group in range(0, size, width + 1):
+        source = msg('bang; send{} $1'.format(group), new_row=2, new_col=0)
+        for i in range(min(width, size - group - 1)):
+            obj('f {}'.format(i), source[0], new_row=1 if i == 0 else 0)
+    return patch
+
+
+def feedback(size: int, degree: int = 4, seed: int = 1) -> Patch:
+    """A dense graph where ``connect`` adds edges back to earlier nodes"""
+    rng = random.Random(seed)
+    patch = Patch()
+    obj, connect = patch.get_creators('obj, connect')
+    nodes = [obj('t f f')]
+    for i in range(1, size):
+        sources = [nodes[rng.randrange(i)][rng.randrange(2)]
+                   for _ in range(degree // 2)]
+        nodes.append(obj('pack f f', *sources, new_row=0 if i % 16 else 1))
+    for i in range(size):
+        later = nodes[rng.randrange(i, size)]
+        connect(nodes[i], (), later[0])
+    return patch
+
+
+def nested(size: int, branching: int = 2, leaf_size: int = 8) -> Patch:
+    """A tree of subpatches with a few objects at each level"""
+
+    def level(remaining: int, depth: int) -> Patch:
+        patch = Patch()
+        obj, subpatch = patch.get_creators('obj, subpatch')
+        prev = obj('inlet')
+        for i in range(leaf_size):
+            prev = obj('* {}'.format(depth + i), prev[0])
+        share = (remaining - leaf_size - 2 - branching) // branching
+        if share >= leaf_size + 2:
+            for branch in range(branching):
+                prev = subpatch('level{}_{}'.format(depth, branch),
+                                level(share, depth + 1), prev[0], new_row=0)
+        obj('outlet', prev[0])
+        return patch
+
+    return level(size, 0)
+
+
+def voices(size: int) -> Patch:
+    """A bank of voices like ``example.py``, each with its own envelope"""
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    count = max(1, size // 30)
+    note = obj('r note')
+    router = obj('route ' + ' '.join(str(i) for i in range(count)),
+                 note[0])
+    mix = []
+    for i in range(count):
+        voice = Patch()
+        v_obj, v_subpatch = voice.get_creators('obj, subpatch')
+        inlet = v_obj('inlet')
+        params = v_obj('unpack 0 0 0 0 0 0', inlet[0])
+        osc = v_obj('osc~', params[0], new_row=2)
+        env = v_subpatch('envelope', envelope(), params[1])
+        output = v_obj('*~', osc[0], env[0])
+        v_obj('outlet~', output[0])
+        mix.append(subpatch('voice{}'.format(i), voice, router[i],
+                            new_row=0 if i % 16 else 1))
+    total = obj('+~', *[v[0] for v in mix[:1]], new_row=2, new_col=0)
+    for v in mix[1:]:
+        total = obj('+~', total[0], v[0], new_row=0)
+    obj('dac~', total[0], total[0])
+    return patch
+
+
+WORKLOADS: Dict[str, Callable[[int], Patch]] = {
+    'chain': chain,
+    'fanout': fanout,
+    'feedback': feedback,
+    'nested': nested,
+    'voices': voices,
+}
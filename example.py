@@ -68,4 +68,4 @@ def example() -> Patch:
 
 if __name__ == "__main__":
     pd_example = example()
-    write_file('pd_example.pd', str(pd_example))
+    write_file('pd_example.pd', pd_example)
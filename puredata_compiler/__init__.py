@@ -10,10 +10,18 @@ This package lets you write PureData patches as Python programs.
   >>> loadbang = obj('loadbang')
   >>> exclamation = msg('!', loadbang[0])
   >>> obj('print Hello world', exclamation[0])
-  >>> write_file('patch.pd', str(patch))
+  >>> write_file('patch.pd', patch)
 """
 
 from .api import Patch, write_file
+from .columnar import ColumnarPatch
+from .parser import parse
+from .abstractions import write_with_abstractions
+from .parallel import compile_many
+from .streaming import StreamingPatch
+from .samples import load_samples
+from .cost import CostReport
+from .instrumentation import instrument
 
 
 """
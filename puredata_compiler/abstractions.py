@@ -0,0 +1,150 @@
+from typing import Dict, Iterable, Iterator, List, Set
+import collections
+import os
+import re
+
+from .api import Patch, Subpatch, subpatch_cache, write_clone_sources
+
+AbstractionReport = collections.namedtuple(
+    'AbstractionReport', ['files', 'bytes_saved', 'objects_saved'])
+
+
+def count_subpatches(patch: Patch, counts: Dict[str, int],
+                     sources: Dict[str, Subpatch], seen: Set[str]) -> None:
+    """Count Subpatch nodes by structure hash, visiting each unique
+    subpatch body once"""
+    for node in patch.nodes:
+        if not isinstance(node, Subpatch):
+            continue
+        key = node.src.structure_hash()
+        counts[key] = counts.get(key, 0) + 1
+        sources.setdefault(key, node)
+        if key not in seen:
+            seen.add(key)
+            count_subpatches(node.src, counts, sources, seen)
+
+
+def iter_inline(patch: Patch) -> Iterator[str]:
+    """Yield the body of a patch one record at a time, bypassing the
+    subpatch cache"""
+    for chunk in patch.iter_body(iter_inline_subpatch):
+        yield from chunk.splitlines(keepends=True)
+
+
+def iter_inline_subpatch(node: Subpatch) -> Iterator[str]:
+    yield node.canvas_line
+    yield from iter_inline(node.src)
+    yield node.restore_line()
+
+
+def uses_dollar_args(patch: Patch) -> bool:
+    # creation arguments and $0 resolve differently in an abstraction than
+    # in its parent; $1 in a message box refers to the incoming message
+    for line in iter_inline(patch):
+        if '\\$' in line and (line.startswith('#X obj')
+                               or '\\$0' in line):
+            return True
+    return False
+
+
+def abstraction_name(prefix: str, name: str) -> str:
+    return prefix + re.sub(r'[^\w.-]', '_', name)
+
+
+def write_lines(filename: str, lines: Iterable[str]) -> None:
+    with open(filename, 'w', encoding='utf-8') as fp:
+        fp.writelines(lines)
+
+
+def count_objects(chunks: Iterable[str],
+                  totals: List[int]) -> Iterator[str]:
+    """Pass text through, adding the object records and bytes seen to
+    ``totals``"""
+    for chunk in chunks:
+        text = '\n' + chunk
+        totals[0] += text.count('\n#X ') - text.count('\n#X connect ')
+        totals[1] += len(chunk.encode('utf-8'))
+        yield chunk
+
+
+def write_with_abstractions(filename: str, patch: Patch,
+                            min_count: int = 2) -> AbstractionReport:
+    """Write a patch, moving repeated subpatches into abstraction files
+
+    Subpatches whose contents are identical, as found by
+    ``Patch.structure_hash``, are written once as a sibling ``.pd`` file
+    named after the base file and the first subpatch's name. Each
+    occurrence becomes a single ``#X obj x y <abstraction>`` line.
+    Subpatches that use dollar arguments are always kept inline, since
+    ``$0`` and ``$1`` mean something else inside an abstraction.
+
+    Parameters
+    ----------
+    filename : str
+        the destination path of the main patch
+
+    patch : Patch
+        the patch to write
+
+    min_count : int, optional
+        the number of occurrences needed to extract a subpatch
+
+    Returns
+    -------
+    report : AbstractionReport
+        the abstraction files written, including those of clone objects,
+        and the number of bytes and object
+        records saved compared to writing every subpatch inline
+    """
+    # the patch does not change while it is written, so each structure
+    # hash is computed once
+    with subpatch_cache.session():
+        return write_extracted(filename, patch, min_count)
+
+
+def write_extracted(filename: str, patch: Patch,
+                    min_count: int) -> AbstractionReport:
+    counts: Dict[str, int] = {}
+    sources: Dict[str, Subpatch] = {}
+    count_subpatches(patch, counts, sources, set())
+
+    directory = os.path.dirname(filename)
+    prefix = os.path.splitext(os.path.basename(filename))[0] + '-'
+    names: Dict[str, str] = {}
+    used_names = set()
+    for key, count in counts.items():
+        node = sources[key]
+        if count < min_count or uses_dollar_args(node.src):
+            continue
+        name = abstraction_name(prefix, node.name)
+        if name in used_names:
+            name += '-' + key[:8]
+        used_names.add(name)
+        names[key] = name
+
+    def emit_subpatch(node: Subpatch) -> Iterator[str]:
+        name = names.get(node.src.structure_hash())
+        if name is not None:
+            yield '#X obj {} {} {};\n'.format(node.x_pos, node.y_pos, name)
+            return
+        yield node.canvas_line
+        yield from node.src.iter_body(emit_subpatch)
+        yield node.restore_line()
+
+    inline = [0, 0]
+    for _ in count_objects(patch.iter_lines(), inline):
+        pass
+
+    written = [0, 0]
+    files = []
+    write_lines(filename,
+                count_objects(patch.iter_lines(emit_subpatch), written))
+    for key, name in names.items():
+        path = os.path.join(directory, name + '.pd')
+        src = sources[key].src
+        write_lines(path,
+                    count_objects(src.iter_lines(emit_subpatch), written))
+        files.append(path)
+    files.extend(write_clone_sources(directory, patch))
+    return AbstractionReport(files, inline[1] - written[1],
+                             inline[0] - written[0])
@@ -0,0 +1,375 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import collections
+
+from .api import Node, Subpatch, Patch
+from .dsp import Ports, object_name
+
+NodeRef = collections.namedtuple('NodeRef', ['path', 'index', 'text'])
+Cycle = collections.namedtuple('Cycle',
+                               ['nodes', 'signal', 'delayed', 'hot'])
+FanOut = collections.namedtuple('FanOut', ['node', 'outlet', 'sinks'])
+
+TRIGGERS = frozenset(['t', 'trigger'])
+# control objects that send their output later, through the scheduler
+SCHEDULED = frozenset(['delay', 'del', 'pipe', 'metro', 'line'])
+
+
+class GraphIndex:
+    """Adjacency of a patch and its subpatches, flattened into one graph
+
+    Every node of every subpatch occurrence gets an integer id. A
+    connection to a subpatch goes to the matching ``inlet`` or ``inlet~``
+    object inside it, and a connection from a subpatch comes from the
+    matching ``outlet`` or ``outlet~`` object. Edges are stored in
+    compressed rows: the edges of node ``i`` are ``offsets[i]`` to
+    ``offsets[i + 1]`` of ``sinks``, ``outlets`` and ``inlets``, in the
+    order the connections were made. Clone abstractions are indexed as
+    separate graphs, since their copies are not connected to the parent
+    through inlets and outlets.
+    """
+    paths: List[str]
+    patches: List[Patch]
+    firsts: List[int]
+    path_ids: array
+    local_indices: array
+    refs: Dict[int, NodeRef]
+    offsets: array
+    sinks: array
+    outlets: array
+    inlets: array
+
+    def __init__(self, patch: Patch):
+        self.paths = []
+        self.patches = []
+        self.firsts = []
+        self.path_ids = array('i')
+        self.local_indices = array('i')
+        self.refs = {}
+        edges = (array('i'), array('i'), array('i'), array('i'))
+        pending = [(patch, '')]
+        seen_clones = set()
+        while pending:
+            root, path = pending.pop()
+            self.add_patch(root, path, edges, pending, seen_clones)
+        self.build_rows(*edges)
+
+    def add_patch(self, patch: Patch, path: str, edges, pending,
+                  seen_clones) -> int:
+        """Number the nodes of a patch occurrence and record its edges
+
+        Returns the id of its first node.
+        """
+        path_id = len(self.paths)
+        first = len(self.path_ids)
+        self.paths.append(path)
+        self.patches.append(patch)
+        self.firsts.append(first)
+        count = len(patch.nodes)
+        self.path_ids.extend([path_id] * count)
+        self.local_indices.extend(range(count))
+        prefix = path + '/' if path else ''
+        inner_ports = {}
+        for index, node in patch.iter_containers():
+            if isinstance(node, Subpatch):
+                inner_ports[index] = (self.add_patch(
+                    node.src, prefix + node.name, edges, pending,
+                    seen_clones), Ports(node.src))
+            elif id(node.src) not in seen_clones:
+                seen_clones.add(id(node.src))
+                pending.append((node.src, prefix + node.name))
+        sources, outlets, sinks, inlets = edges
+        columns = patch.edge_columns()
+        if not inner_ports:
+            sources.extend(source + first for source in columns[0])
+            outlets.extend(columns[1])
+            sinks.extend(sink + first for sink in columns[2])
+            inlets.extend(columns[3])
+            return first
+        for source, outlet_index, sink, inlet_index in zip(*columns):
+            if source in inner_ports:
+                inner_first, ports = inner_ports[source]
+                if outlet_index >= len(ports.outlets):
+                    continue
+                source = inner_first + ports.outlets[outlet_index]
+                outlet_index = 0
+            else:
+                source += first
+            if sink in inner_ports:
+                inner_first, ports = inner_ports[sink]
+                if inlet_index >= len(ports.inlets):
+                    continue
+                sink = inner_first + ports.inlets[inlet_index]
+                inlet_index = 0
+            else:
+                sink += first
+            sources.append(source)
+            outlets.append(outlet_index)
+            sinks.append(sink)
+            inlets.append(inlet_index)
+        return first
+
+    def build_rows(self, sources: array, outlets: array, sinks: array,
+                   inlets: array) -> None:
+        """Group the edges by source with a stable counting sort"""
+        count = len(self.path_ids)
+        offsets = array('i', [0]) * (count + 1)
+        for source in sources:
+            offsets[source + 1] += 1
+        for i in range(count):
+            offsets[i + 1] += offsets[i]
+        fill = array('i', offsets[:-1])
+        total = len(sources)
+        self.sinks = array('i', [0]) * total
+        self.outlets = array('i', [0]) * total
+        self.inlets = array('i', [0]) * total
+        for edge in range(total):
+            source = sources[edge]
+            position = fill[source]
+            fill[source] = position + 1
+            self.sinks[position] = sinks[edge]
+            self.outlets[position] = outlets[edge]
+            self.inlets[position] = inlets[edge]
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.path_ids)
+
+    def node(self, node_id: int) -> Node:
+        return self.patches[self.path_ids[node_id]].nodes[
+            self.local_indices[node_id]]
+
+    def ref(self, node_id: int) -> NodeRef:
+        ref = self.refs.get(node_id)
+        if ref is None:
+            ref = self.refs[node_id] = self.make_ref(node_id)
+        return ref
+
+    def make_ref(self, node_id: int) -> NodeRef:
+        node = self.node(node_id)
+        if isinstance(node, Subpatch):
+            text = 'pd ' + node.name
+        else:
+            text = getattr(node, 'text', None)
+            if text is None:
+                # the record type, such as floatatom or array
+                text = str(node).split(' ', 2)[1]
+        return NodeRef(self.paths[self.path_ids[node_id]],
+                       self.local_indices[node_id], text)
+
+    def find(self, path: str, index: int) -> int:
+        """Get the id of the node at an index in the patch at a path"""
+        try:
+            path_id = self.paths.index(path)
+        except ValueError:
+            raise KeyError(path) from None
+        return self.firsts[path_id] + index
+
+    def name(self, node_id: int) -> Optional[str]:
+        return object_name(self.node(node_id))
+
+
+def has_hot_cycle(index: GraphIndex, component: List[int]) -> bool:
+    """Check if a component still has a cycle through left inlets only
+
+    Messages to the other inlets of a Pd object are stored without
+    output, so a loop closed through one of them runs once per message.
+    """
+    members = set(component)
+    offsets = index.offsets
+    sinks = index.sinks
+    inlets = index.inlets
+    ACTIVE, DONE = 1, 2
+    state = {}
+    for root in component:
+        if root in state:
+            continue
+        state[root] = ACTIVE
+        stack = [(root, offsets[root])]
+        while stack:
+            node, edge = stack[-1]
+            end = offsets[node + 1]
+            while edge < end:
+                child = sinks[edge]
+                edge += 1
+                if inlets[edge - 1] != 0 or child not in members:
+                    continue
+                if state.get(child) == ACTIVE:
+                    return True
+                if child not in state:
+                    stack[-1] = (node, edge)
+                    state[child] = ACTIVE
+                    stack.append((child, offsets[child]))
+                    break
+            else:
+                state[node] = DONE
+                stack.pop()
+    return False
+
+
+def strongly_connected(index: GraphIndex) -> Iterator[List[int]]:
+    """Yield the components of a graph with Tarjan's algorithm
+
+    The search is iterative, so deep graphs do not hit the recursion
+    limit.
+    """
+    count = len(index)
+    offsets = index.offsets
+    sinks = index.sinks
+    order = array('i', [-1]) * count
+    low = array('i', [0]) * count
+    on_stack = bytearray(count)
+    stack = []
+    counter = 0
+    for root in range(count):
+        if order[root] != -1:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, offsets[root])]
+        while work:
+            node, edge = work[-1]
+            end = offsets[node + 1]
+            descended = False
+            while edge < end:
+                child = sinks[edge]
+                edge += 1
+                if order[child] == -1:
+                    work[-1] = (node, edge)
+                    order[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = 1
+                    work.append((child, offsets[child]))
+                    descended = True
+                    break
+                if on_stack[child] and order[child] < low[node]:
+                    low[node] = order[child]
+            if descended:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if low[node] < low[parent]:
+                    low[parent] = low[node]
+            if low[node] == order[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = 0
+                    component.append(member)
+                    if member == node:
+                        break
+                yield component
+
+
+class GraphAnalysis:
+    """Cycles, untriggered fan-out and message order of a patch
+
+    See ``Patch.analyze``.
+    """
+    index: GraphIndex
+    cycles: List[Cycle]
+
+    def __init__(self, patch: Patch):
+        self.index = index = GraphIndex(patch)
+        self.cycles = []
+        offsets = index.offsets
+        sinks = index.sinks
+        for component in strongly_connected(index):
+            if len(component) == 1:
+                node = component[0]
+                if node not in sinks[offsets[node]:offsets[node + 1]]:
+                    continue
+            component.sort()
+            names = [index.name(node) or '' for node in component]
+            self.cycles.append(Cycle(
+                [index.ref(node) for node in component],
+                all(name.endswith('~') for name in names),
+                any(name in SCHEDULED for name in names),
+                has_hot_cycle(index, component)))
+        self._fanouts = None
+
+    @property
+    def fanouts(self) -> List[FanOut]:
+        """Control outlets connected to several inlets without a trigger,
+        found on first use"""
+        if self._fanouts is None:
+            self._fanouts = list(self.find_fanouts())
+        return self._fanouts
+
+    def find_fanouts(self) -> Iterator[FanOut]:
+        """Find control outlets connected to several inlets
+
+        Pd sends to them in the order the connections were made, which is
+        not visible in the patch. Triggers and signal outlets are not
+        reported.
+        """
+        index = self.index
+        offsets = index.offsets
+        outlets = index.outlets
+        for node in range(len(index)):
+            start, end = offsets[node], offsets[node + 1]
+            if end - start < 2:
+                continue
+            row = outlets[start:end]
+            if len(set(row)) == len(row):
+                continue
+            counts = collections.Counter(row)
+            shared = [outlet for outlet, count in counts.items() if count > 1]
+            name = index.name(node)
+            if name in TRIGGERS or (name is not None and name.endswith('~')):
+                continue
+            for outlet in sorted(shared):
+                yield FanOut(index.ref(node), outlet, [
+                    index.ref(index.sinks[edge]) for edge in range(start, end)
+                    if outlets[edge] == outlet])
+
+    @property
+    def control_cycles(self) -> List[Cycle]:
+        """Cycles of control objects through left inlets that are not
+        broken by a delay, which would loop forever once a message enters
+        them"""
+        return [cycle for cycle in self.cycles
+                if cycle.hot and not cycle.signal and not cycle.delayed]
+
+    def message_order(self, start: Union[NodeRef, Tuple[str, int]]
+                      ) -> List[NodeRef]:
+        """Get the order in which a message from a node reaches others
+
+        Messages are followed depth first, as Pd sends them. The outlets
+        of a node are taken from right to left, as a trigger sends them,
+        and the connections of an outlet in the order they were made.
+        Each node is listed the first time it is reached.
+
+        Parameters
+        ----------
+        start : NodeRef or tuple
+            the sending node, as ``(path, index)``
+        """
+        index = self.index
+        offsets = index.offsets
+        sinks = index.sinks
+        outlets = index.outlets
+
+        def targets(node: int) -> Iterator[int]:
+            edges = range(offsets[node], offsets[node + 1])
+            ordered = sorted(edges, key=lambda edge: -outlets[edge])
+            return iter([sinks[edge] for edge in ordered])
+
+        first = index.find(start[0], start[1])
+        seen = {first}
+        order = [first]
+        work = [targets(first)]
+        while work:
+            for sink in work[-1]:
+                if sink not in seen:
+                    seen.add(sink)
+                    order.append(sink)
+                    work.append(targets(sink))
+                    break
+            else:
+                work.pop()
+        return [index.ref(node) for node in order]
@@ -1,39 +1,119 @@
-from typing import List, Tuple, Union, Sequence, Dict, Optional, Any, Callable
+from typing import (List, Tuple, Union, Sequence, Dict, Optional, Any,
+                    Callable, Iterable, Iterator, Mapping, TextIO)
+import array
+import collections
 import collections.abc
+import contextlib
+import hashlib
+import math
+import os
 import re
 
 
+DIGITS = frozenset('0123456789')
+TRAILING_BACKSLASH_PATTERN = re.compile(r'(?<!\\)\\$')
+# native numeric formats that memoryview.tolist and slicing support
+SAMPLE_FORMATS = frozenset('bBhHiIlLqQfd')
+
+
 def escape(text: str) -> str:
-    save = re.sub(r'\\', '\\\\', text)
-    save = re.sub(r';', ' \\; ', save)
-    save = re.sub(r',', ' \\, ', save)
-    save = re.sub(r'\$(?=[0-9])', '\\$', save)
-    return save
+    if ';' in text:
+        text = text.replace(';', ' \\; ')
+    if ',' in text:
+        text = text.replace(',', ' \\, ')
+    if '$' in text:
+        # only dollar signs followed by a digit are arguments
+        parts = text.split('$')
+        for i in range(1, len(parts)):
+            part = parts[i]
+            if part and part[0] in DIGITS:
+                parts[i - 1] += '\\'
+        text = '$'.join(parts)
+    return text
+
+
+def escape_many(texts: Iterable[str]) -> List[str]:
+    """Escape a batch of object or message texts
+
+    Equivalent to ``[escape(t) for t in texts]``.
+    """
+    return list(map(escape, texts))
 
 
 def unescape(text: str) -> str:
-    disp = re.sub(r' (?<!\\)\\; ', '\n', text)
-    disp = re.sub(r' (?<!\\)\\, ', ',', disp)
-    disp = re.sub(r'(?<!\\)\\$', '$', disp)
-    lines = [l.strip() for l in disp.split('\n')]
-    return '\n'.join(lines)
+    disp = text.replace(' \\; ', '\n').replace(' \\, ', ',')
+    if disp.endswith('\\') or disp.endswith('\\\n'):
+        disp = TRAILING_BACKSLASH_PATTERN.sub('$', disp)
+    if '\n' not in disp:
+        return disp.strip()
+    return '\n'.join([l.strip() for l in disp.split('\n')])
+
+
+WRAP_PATTERN = re.compile(r'[ ]*(?:.{1,60}(?:\s|$)|.{60})')
 
 
 def get_display_lines(text: str) -> List[str]:
+    if len(text) <= 60 and '\\' not in text and text.isprintable():
+        # nothing to unescape or wrap, and the only whitespace is ' '
+        stripped = text.strip()
+        return [stripped] if stripped else []
     display_text = unescape(text)
     lines = []
     for line in display_text.splitlines():
-        wrapped = re.findall(r'[ ]*(?:.{1,60}(?:\s|$)|.{60})', line)
+        wrapped = WRAP_PATTERN.findall(line)
         lines.extend(filter(lambda x: len(x) > 0, map(str.strip, wrapped)))
     return lines
 
 
+def get_box_size(display_lines: Sequence[str]) -> Tuple[int, int]:
+    max_chars = max([len(l) for l in display_lines], default=0)
+    x_size = max(50, 20 + max_chars * 6)
+    y_size = 10 + 15 * len(display_lines)
+    return (x_size, y_size)
+
+
+class Parameters(collections.abc.MutableMapping):
+    """Dictionary view of a node's fields
+
+    Reads and writes go straight to the node's attributes, so
+    ``node.parameters['text'] = ...`` and ``node.text = ...`` are the same.
+    """
+    __slots__ = ('node',)
+
+    def __init__(self, node: 'Node'):
+        self.node = node
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.node.fields:
+            raise KeyError(key)
+        return getattr(self.node, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self.node.fields:
+            raise KeyError(key)
+        setattr(self.node, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError('node parameters cannot be removed')
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.node.fields)
+
+    def __len__(self) -> int:
+        return len(self.node.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
 class Node(collections.abc.Sequence):
     """Represents one element in a PureData patch"""
-    parameters: Dict[str, Any]
+    __slots__ = ('_outlets',)
+    fields: Tuple[str, ...] = ()
     hidden: bool = False
 
     class Outlet:
+        __slots__ = ('owner', 'index')
         owner: 'Node'
         index: int
 
@@ -42,16 +122,37 @@ class Node(collections.abc.Sequence):
             self.index = index
 
     def __getitem__(self, key) -> 'Node.Outlet':
-        return Node.Outlet(self, key)
+        outlets = self._outlets
+        if outlets is not None and 0 <= key < len(outlets):
+            outlet = outlets[key]
+            if outlet is not None:
+                return outlet
+        outlet = Node.Outlet(self, key)
+        if 0 <= key < 256:
+            # handles are interned in a tuple, which is rebuilt only when
+            # an outlet is used for the first time
+            padded = list(outlets or ())
+            padded.extend([None] * (key + 1 - len(padded)))
+            padded[key] = outlet
+            self._outlets = tuple(padded)
+        return outlet
 
     def __len__(self):
         return 256
 
+    @property
+    def parameters(self) -> Parameters:
+        return Parameters(self)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Yield the lines of this node's record"""
+        yield str(self)
+
     @property
     def position(self) -> Tuple[int, int]:
         if self.hidden:
             return (-1, -1)
-        return (self.parameters['x_pos'], self.parameters['y_pos'])
+        return (self.x_pos, self.y_pos)
 
     @property
     def size(self) -> Tuple[int, int]:
@@ -69,61 +170,106 @@ class Node(collections.abc.Sequence):
         return (x_pos, y_pos)
 
 
-class Obj(Node):
-    parameters: Dict[str, Any]
+class TextNode(Node):
+    """Base for boxes whose size depends on their text
+
+    The display lines and size are measured once and reused until the
+    text is replaced.
+    """
+    __slots__ = ('x_pos', 'y_pos', 'text',
+                 '_measured_text', '_display_lines', '_width', '_height')
+    fields = ('x_pos', 'y_pos', 'text')
+    x_pos: int
+    y_pos: int
+    text: str
 
     def __init__(self, x_pos: int, y_pos: int, text: str):
-        self.parameters = {'x_pos': x_pos,
-                           'y_pos': y_pos,
-                           'text': escape(text)}
+        self._outlets = None
+        self._measured_text = None
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+        self.text = escape(text)
+
+    @classmethod
+    def from_saved(cls, x_pos: int, y_pos: int, text: str) -> 'TextNode':
+        """Create a node from text that is already escaped"""
+        node = cls.__new__(cls)
+        node._outlets = None
+        node._measured_text = None
+        node.x_pos = x_pos
+        node.y_pos = y_pos
+        node.text = text
+        return node
 
-    def __str__(self):
-        return '#X obj {x_pos} {y_pos} {text};\n'.format(**self.parameters)
+    def __reduce__(self):
+        # pickle as constructor arguments, without the cached measurements
+        return (type(self).from_saved, (self.x_pos, self.y_pos, self.text))
+
+    def measure(self) -> None:
+        text = self.text
+        display_lines = get_display_lines(text)
+        x_size, y_size = get_box_size(display_lines)
+        # a single line equal to the text is the common case, so it is
+        # not stored separately
+        if display_lines == [text]:
+            self._display_lines = None
+        else:
+            self._display_lines = tuple(display_lines)
+        self._width = x_size
+        self._height = y_size
+        self._measured_text = text
+
+    @property
+    def display_lines(self) -> List[str]:
+        if self._measured_text is not self.text:
+            self.measure()
+        if self._display_lines is None:
+            return [self.text]
+        return list(self._display_lines)
 
     @property
     def size(self) -> Tuple[int, int]:
-        display_lines = get_display_lines(self.parameters['text'])
-        max_chars = max([len(l) for l in display_lines], default=0)
-        x_size = max(50, 20 + max_chars * 6)
-        y_size = 10 + 15 * len(display_lines)
-        return (x_size, y_size)
+        if self._measured_text is not self.text:
+            self.measure()
+        return (self._width, self._height)
 
 
-class Msg(Node):
-    def __init__(self, x_pos: int, y_pos: int, text: str):
-        self.parameters = {'x_pos': x_pos,
-                           'y_pos': y_pos,
-                           'text': escape(text)}
+class Obj(TextNode):
+    __slots__ = ()
 
     def __str__(self):
-        return '#X msg {x_pos} {y_pos} {text};\n'.format(**self.parameters)
+        return '#X obj {} {} {};\n'.format(self.x_pos, self.y_pos, self.text)
 
-    @property
-    def size(self) -> Tuple[int, int]:
-        display_lines = get_display_lines(self.parameters['text'])
-        max_chars = max([len(l) for l in display_lines], default=0)
-        x_size = max(50, 20 + max_chars * 6)
-        y_size = 10 + 15 * len(display_lines)
-        return (x_size, y_size)
+
+class Msg(TextNode):
+    __slots__ = ()
+
+    def __str__(self):
+        return '#X msg {} {} {};\n'.format(self.x_pos, self.y_pos, self.text)
 
 
 class FloatAtom(Node):
+    __slots__ = ('x_pos', 'y_pos', 'width', 'upper_limit', 'lower_limit',
+                 'label', 'receive', 'send')
+    fields = __slots__
+
     def __init__(self, x_pos: int, y_pos: int, width: int = 5,
                  upper_limit: int = 0, lower_limit: int = 0,
                  label: str = '-', receive: str = '-', send: str = '-'):
-        self.parameters = {'x_pos': x_pos,
-                           'y_pos': y_pos,
-                           'width': width,
-                           'upper_limit': upper_limit,
-                           'lower_limit': lower_limit,
-                           'label': label,
-                           'receive': receive,
-                           'send': send}
+        self._outlets = None
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+        self.width = width
+        self.upper_limit = upper_limit
+        self.lower_limit = lower_limit
+        self.label = label
+        self.receive = receive
+        self.send = send
 
     def __str__(self):
-        return ('#X floatatom {x_pos} {y_pos} {width} {upper_limit} '
-                '{lower_limit} {label} {receive} {send};\n'
-                ).format(**self.parameters)
+        return '#X floatatom {} {} {} {} {} {} {} {};\n'.format(
+            self.x_pos, self.y_pos, self.width, self.upper_limit,
+            self.lower_limit, self.label, self.receive, self.send)
 
     @property
     def size(self) -> Tuple[int, int]:
@@ -131,41 +277,155 @@ class FloatAtom(Node):
 
 
 class Subpatch(Node):
+    __slots__ = ('x_pos', 'y_pos', 'name', 'src')
+    fields = ('x_pos', 'y_pos', 'name')
+    canvas_line = '#N canvas 0 0 300 180 (subpatch) 0;\n'
     src: 'Patch'
 
     def __init__(self, x_pos: int, y_pos: int, name: str, src: 'Patch'):
+        self._outlets = None
         self.src = src
-        self.parameters = {'x_pos': x_pos,
-                           'y_pos': y_pos,
-                           'name': name}
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+        self.name = name
 
     def __str__(self):
-        return '#N canvas 0 0 300 180 (subpatch) 0;\n' + \
-               self.src.subpatch_str() + \
-               '#X restore {x_pos} {y_pos} pd {name};\n'.format(
-                   **self.parameters)
+        return ''.join(self.iter_lines())
+
+    def iter_lines(self) -> Iterator[str]:
+        yield self.canvas_line
+        yield from subpatch_cache.iter_body(self.src)
+        yield self.restore_line()
+
+    def restore_line(self) -> str:
+        return '#X restore {} {} pd {};\n'.format(
+            self.x_pos, self.y_pos, self.name)
 
     @property
     def size(self):
-        x_size = max(50, 20 + len('pd ' + self.parameters['name']) * 6)
+        x_size = max(50, 20 + len('pd ' + self.name) * 6)
         return (x_size, 25)
 
 
+class Clone(Obj):
+    """A ``clone`` object, holding the Patch used as its abstraction"""
+    __slots__ = ('name', 'count', 'src')
+    src: 'Patch'
+
+    def __init__(self, x_pos: int, y_pos: int, name: str, src: 'Patch',
+                 count: int):
+        super().__init__(x_pos, y_pos, 'clone {} {}'.format(name, count))
+        self.name = name
+        self.count = count
+        self.src = src
+
+    def __reduce__(self):
+        return (Clone, (self.x_pos, self.y_pos, self.name, self.src,
+                        self.count))
+
+
 class Array(Node):
-    def __init__(self, name: str, length: int, element_type: str = 'float',
-                 save_flag: int = 0):
-        self.hidden = True
-        self.parameters = {'name': name,
-                           'length': length,
-                           'element_type': element_type,
-                           'save_flag': save_flag}
+    """An array declaration, with its contents if ``data`` is given
+
+    ``data`` is kept as a flat view, so arrays backed by NumPy, ``array``
+    or a memory-mapped file are not copied. Contents are written as ``#A``
+    records of ``chunk_size`` values each, and ``save_flag`` is set so
+    that Pd keeps them. Writing contents with inf or nan raises
+    ``ValueError``.
+    """
+    __slots__ = ('name', 'length', 'element_type', 'save_flag', 'data')
+    fields = __slots__
+    hidden = True
+    chunk_size = 1000
+    data: Optional[Sequence[float]]
+
+    def __init__(self, name: str, length: Optional[int] = None,
+                 element_type: str = 'float', save_flag: int = 0,
+                 data: Any = None):
+        self._outlets = None
+        if data is not None:
+            data = as_samples(data)
+            save_flag |= 1
+            if length is None:
+                length = len(data)
+            elif length < len(data):
+                raise ValueError('Array {!r} has {} values, but its length '
+                                 'is {}'.format(name, len(data), length))
+        elif length is None:
+            raise ValueError('Array length is required without data')
+        self.name = name
+        self.length = length
+        self.element_type = element_type
+        self.save_flag = save_flag
+        self.data = data
+
+    def __reduce__(self):
+        data = self.data
+        if isinstance(data, memoryview):
+            # views of files and other buffers are sent as a copy
+            data = array.array(data.format, data.tobytes())
+        return (Array, (self.name, self.length, self.element_type,
+                        self.save_flag, data))
 
     def __str__(self):
-        return '#X array {name} {length} {element_type} {save_flag};\n'.format(
-            **self.parameters)
+        return ''.join(self.iter_lines())
+
+    def iter_lines(self) -> Iterator[str]:
+        yield '#X array {} {} {} {};\n'.format(
+            self.name, self.length, self.element_type, self.save_flag)
+        data = self.data
+        if data is None:
+            return
+        chunk_size = self.chunk_size
+        full_format = '#A %d' + ' %g' * chunk_size + ';\n'
+        count = len(data)
+        for start in range(0, count - chunk_size + 1, chunk_size):
+            record = full_format % (start, *data[start:start + chunk_size])
+            # %g writes inf and nan, which are the only values with an n
+            if 'n' in record:
+                raise self.non_finite(start)
+            yield record
+        start = count - count % chunk_size
+        if start < count:
+            record = ('#A %d' + ' %g' * (count - start) + ';\n') % (
+                start, *data[start:])
+            if 'n' in record:
+                raise self.non_finite(start)
+            yield record
+
+    def non_finite(self, start: int) -> ValueError:
+        data = self.data
+        index = next(i for i in range(start, len(data))
+                     if not math.isfinite(data[i]))
+        return ValueError('Array {!r} has the value {} at index {}, which Pd '
+                          'cannot read'.format(self.name, data[index], index))
+
+
+def as_samples(data: Any) -> Sequence[float]:
+    """Get a flat view of array contents, without copying buffers
+
+    Objects that support the buffer protocol, such as NumPy arrays,
+    ``array.array`` and ``mmap``-backed views, become a one-dimensional
+    memoryview. Other sequences are used as they are.
+    """
+    try:
+        view = memoryview(data)
+    except TypeError:
+        if not isinstance(data, collections.abc.Sequence):
+            data = list(data)
+        return data
+    if view.format.lstrip('@') not in SAMPLE_FORMATS:
+        raise ValueError('Unsupported sample format {!r}'.format(view.format))
+    if view.ndim != 1:
+        if not view.c_contiguous:
+            raise ValueError('Array data with more than one dimension must '
+                             'be C-contiguous')
+        view = view.cast('B').cast(view.format.lstrip('@'))
+    return view
 
 
 class Connection:
+    __slots__ = ('source', 'outlet_index', 'sink', 'inlet_index')
     source: int
     outlet_index: int
     sink: int
@@ -178,6 +438,10 @@ class Connection:
         self.sink = sink
         self.inlet_index = inlet_index
 
+    def __reduce__(self):
+        return (Connection, (self.source, self.outlet_index, self.sink,
+                             self.inlet_index))
+
     def __str__(self):
         return '#X connect {} {} {} {};\n'.format(self.source,
                                                   self.outlet_index,
@@ -186,17 +450,121 @@ class Connection:
 
 OutletList = Union[Node.Outlet, Sequence[Node.Outlet]]
 
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class SubpatchCache:
+    """LRU cache of serialized subpatch bodies
+
+    Bodies are keyed by ``Patch.structure_hash``, so a Patch inserted as a
+    subpatch many times, or several Patches with the same contents, are
+    serialized once. Bodies longer than ``max_body_size`` characters are
+    streamed without being cached.
+
+    The key is a hash of the contents, so nodes can be edited in any way
+    between serializations. Within a ``session``, such as one
+    ``str(patch)``, the hash of each Patch is computed once.
+    """
+    entries: 'collections.OrderedDict[str, str]'
+    hashes: Optional[Dict[int, str]]
+    maxsize: int
+    max_body_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, maxsize: int = 256, max_body_size: int = 1 << 20):
+        self.entries = collections.OrderedDict()
+        self.hashes = None
+        self.maxsize = maxsize
+        self.max_body_size = max_body_size
+        self.hits = 0
+        self.misses = 0
+
+    @contextlib.contextmanager
+    def session(self) -> Iterator[None]:
+        """Reuse structure hashes, by Patch identity, until the end of the
+        outermost session. The patches must not change meanwhile."""
+        if self.hashes is not None:
+            yield
+            return
+        self.hashes = {}
+        try:
+            yield
+        finally:
+            self.hashes = None
+
+    def iter_body(self, patch: 'Patch') -> Iterator[str]:
+        key = patch.structure_hash()
+        body = self.entries.get(key)
+        if body is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            yield body
+            return
+        self.misses += 1
+        lines = []
+        size = 0
+        for line in patch.iter_body():
+            if lines is not None:
+                lines.append(line)
+                size += len(line)
+                if size > self.max_body_size:
+                    lines = None
+            yield line
+        if lines is not None and self.maxsize > 0:
+            self.entries[key] = ''.join(lines)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self.entries))
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+subpatch_cache = SubpatchCache()
+
+
+def subpatch_cache_info() -> CacheInfo:
+    """Get the hit and miss counts of the subpatch body cache"""
+    return subpatch_cache.info()
+
+
+def subpatch_cache_clear() -> None:
+    """Empty the subpatch body cache and reset its statistics"""
+    subpatch_cache.clear()
+
+
+def not_in_patch(node: Node) -> ValueError:
+    return ValueError(
+        "{} is not in this patch; nodes can only be connected "
+        "within the Patch that created them".format(type(node).__name__))
+
 
 class Patch:
     """Represents a PureData patch, stores its nodes and connections"""
-    nodes: List[Node]
-    connections: List[Connection]
     row_head: Optional[Node]
     row_tail: Optional[Node]
     creators: Dict[str, Callable]
+    # the open editor, from ``edit`` or holding pending edits
+    editor: Optional['PatchEditor']
+    # whether ``editor`` holds edits to apply when the graph is next read
+    edits_pending: bool
+    canvas_line = '#N canvas 0 50 1000 600 10;\n'
+    # remove, replace and insert_between are collected and applied when
+    # the graph is next read
+    defers_edits = True
 
     def __init__(self):
+        self.editor = None
+        self.edits_pending = False
         self.nodes = []
+        self.node_indices = {}
         self.connections = []
         self.row_head = None
         self.row_tail = None
@@ -205,7 +573,41 @@ class Patch:
                          'floatatom': self.create_floatatom,
                          'subpatch': self.create_subpatch,
                          'array': self.create_array,
-                         'connect': self.add_connections}
+                         'clone': self.create_clone,
+                         'connect': self.add_connections,
+                         'obj_many': self.create_obj_many,
+                         'msg_many': self.create_msg_many,
+                         'connect_many': self.add_connections_many}
+
+    @property
+    def nodes(self) -> List[Node]:
+        if self.edits_pending:
+            self.apply_edits()
+        return self._nodes
+
+    @nodes.setter
+    def nodes(self, nodes: List[Node]) -> None:
+        self._nodes = nodes
+
+    @property
+    def node_indices(self) -> Dict[Node, int]:
+        if self.edits_pending:
+            self.apply_edits()
+        return self._node_indices
+
+    @node_indices.setter
+    def node_indices(self, node_indices: Dict[Node, int]) -> None:
+        self._node_indices = node_indices
+
+    @property
+    def connections(self) -> List[Connection]:
+        if self.edits_pending:
+            self.apply_edits()
+        return self._connections
+
+    @connections.setter
+    def connections(self, connections: List[Connection]) -> None:
+        self._connections = connections
 
     def resolve_position(self,
                          x_pos: int,
@@ -272,7 +674,7 @@ class Patch:
         x_pos, y_pos, pos_update = self.resolve_position(
             x_pos, y_pos, new_row, new_col)
         node = Obj(x_pos, y_pos, text)
-        self.nodes.append(node)
+        self.append_node(node)
         self.add_connections(node, *connections)
         pos_update(node)
         return node
@@ -319,7 +721,7 @@ class Patch:
         x_pos, y_pos, pos_update = self.resolve_position(
             x_pos, y_pos, new_row, new_col)
         node = Msg(x_pos, y_pos, text)
-        self.nodes.append(node)
+        self.append_node(node)
         self.add_connections(node, *connections)
         pos_update(node)
         return node
@@ -360,7 +762,7 @@ class Patch:
         x_pos, y_pos, pos_update = self.resolve_position(
             x_pos, y_pos, new_row, new_col)
         node = FloatAtom(x_pos, y_pos)
-        self.nodes.append(node)
+        self.append_node(node)
         self.add_connections(node, *connections)
         pos_update(node)
         return node
@@ -411,12 +813,74 @@ class Patch:
         x_pos, y_pos, pos_update = self.resolve_position(
             x_pos, y_pos, new_row, new_col)
         node = Subpatch(x_pos, y_pos, name, src)
-        self.nodes.append(node)
+        self.append_node(node)
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_clone(
+            self,
+            name: str,
+            src: 'Patch',
+            count: int,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> Clone:
+        """Insert ``count`` copies of a patch as a clone object
+
+        Parameters
+        ----------
+        name : str
+            the abstraction name. ``write_file`` writes ``src`` to
+            ``<name>.pd`` next to the patch file.
+
+        src : Patch
+            the patch to clone
+
+        count : int
+            the number of copies
+
+        \\*connections : Node.Outlet or tuple of Node.Outlet
+            zero or more outlets to connect to the new object
+
+        new_row : float, optional
+            0 to continue current row, 1 to add a new row.
+            Values greater than 1 add a top margin.
+
+        new_col : float, optional
+            0 to keep current baseline, 1 to set new baseline.
+            Values greater than 1 add a left margin.
+
+        x_pos : int, optional
+            Absolute x-position for the object. Overrides new_row and new_col
+            if set.
+
+        y_pos : int, optional
+            Absolute y-position for the object. Overrides new_row and new_col
+            if set.
+
+        Returns
+        -------
+        node : Clone
+            The created clone object
+
+        Notes
+        -----
+        Inside the abstraction, ``$1`` is the instance number. Messages to
+        the clone's inlets are routed by their first number, as in Pd.
+        """
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = Clone(x_pos, y_pos, name, src, count)
+        self.append_node(node)
         self.add_connections(node, *connections)
         pos_update(node)
         return node
 
-    def create_array(self, name: str, length: int) -> Array:
+    def create_array(self, name: str, length: Optional[int] = None,
+                     data: Any = None) -> Array:
         """Declare an array in the subpatch.
 
         Parameters
@@ -424,8 +888,12 @@ class Patch:
         name : str
             the subpatch name
 
-        length : int
-            the array length
+        length : int, optional
+            the array length. Defaults to the length of ``data``.
+
+        data : sequence or buffer, optional
+            the array contents, such as a NumPy array or the result of
+            ``load_samples``. Buffers are written from a view, not copied.
 
         Returns
         -------
@@ -434,12 +902,153 @@ class Patch:
 
         Notes
         -----
-        The array will not have a graph. Its contents are not stored.
+        The array will not have a graph. Its contents are only stored if
+        ``data`` is given.
         """
-        node = Array(name, length)
-        self.nodes.append(node)
+        node = Array(name, length, data=data)
+        self.append_node(node)
+        return node
+
+    def create_obj_many(
+            self,
+            texts: Iterable[str],
+            connections: Optional[Iterable[Sequence[OutletList]]] = None,
+            new_row: float = 1,
+            new_col: float = 0) -> List[Obj]:
+        """Create a batch of objects and add them to the patch
+
+        The result is the same as calling ``create_obj`` once per text,
+        but the texts are escaped and the nodes placed in one pass.
+
+        Parameters
+        ----------
+        texts : iterable of str
+            the content of each object
+
+        connections : iterable of tuples of Node.Outlet, optional
+            for each object, the outlets to connect to its inlets, as they
+            would be passed to ``create_obj``
+
+        new_row : float, optional
+            0 to continue current row, 1 to add a new row.
+            Values greater than 1 add a top margin.
+
+        new_col : float, optional
+            0 to keep current baseline, 1 to set new baseline.
+            Values greater than 1 add a left margin.
+
+        Returns
+        -------
+        nodes : list of Obj
+            The created objects
+        """
+        return self.create_text_nodes(Obj, texts, connections, new_row,
+                                      new_col)
+
+    def create_msg_many(
+            self,
+            texts: Iterable[str],
+            connections: Optional[Iterable[Sequence[OutletList]]] = None,
+            new_row: float = 1,
+            new_col: float = 0) -> List[Msg]:
+        """Create a batch of message objects and add them to the patch
+
+        The result is the same as calling ``create_msg`` once per text.
+        See ``create_obj_many`` for the parameters.
+        """
+        return self.create_text_nodes(Msg, texts, connections, new_row,
+                                      new_col)
+
+    def create_text_nodes(self, node_class: type, texts: Iterable[str],
+                          connections, new_row: float,
+                          new_col: float) -> List[Node]:
+        saved_texts = escape_many(texts)
+        if connections is None:
+            connections = [()] * len(saved_texts)
+        elif not isinstance(connections, collections.abc.Sized):
+            connections = list(connections)
+        if len(connections) != len(saved_texts):
+            raise ValueError('Expected one connections tuple per text')
+        append_saved = self.append_saved
+        add_connections = self.add_connections
+        # the same arithmetic as Node.get_next_position, with the anchors'
+        # positions and sizes kept in locals
+        continue_row = new_row < 1
+        if continue_row:
+            x_offset = max(0, int(50 * (new_col - 1)))
+            y_offset = 0
+        else:
+            x_offset = max(0, int(50 * new_col))
+            y_offset = int(25 * (new_row - 1))
+        new_head = not continue_row or new_col > 0
+        anchor = self.row_tail if continue_row else self.row_head
+        if anchor is not None:
+            x_pos, y_pos = anchor.position
+            width, height = anchor.size
+        nodes = []
+        for text, node_connections in zip(saved_texts, connections):
+            if anchor is None:
+                x_pos, y_pos = (25, 25)
+            elif continue_row:
+                x_pos += width + x_offset
+            else:
+                x_pos += x_offset
+                y_pos += height + y_offset
+            anchor = append_saved(node_class, x_pos, y_pos, text)
+            width, height = anchor.size
+            if node_connections:
+                add_connections(anchor, *node_connections)
+            nodes.append(anchor)
+        if nodes:
+            self.row_tail = anchor
+            if new_head:
+                self.row_head = anchor
+            elif self.row_head is None:
+                # a continued row starts at the first node, as in a loop
+                self.row_head = nodes[0]
+        return nodes
+
+    def append_saved(self, node_class: type, x_pos: int, y_pos: int,
+                     text: str) -> Node:
+        """Add an Obj or Msg whose text is already escaped"""
+        node = node_class.from_saved(x_pos, y_pos, text)
+        self.append_node(node)
         return node
 
+    def append_node(self, node: Node) -> int:
+        """Add a node to the end of the patch and return its index"""
+        if self.editor is not None:
+            self.end_edits()
+        index = len(self.nodes)
+        self.nodes.append(node)
+        self.node_indices[node] = index
+        return index
+
+    def node_index(self, node: Node) -> int:
+        """Get the index of a node in this patch
+
+        Raises
+        ------
+        ValueError
+            if the node was not created in this patch
+        """
+        try:
+            return self.node_indices[node]
+        except KeyError:
+            raise not_in_patch(node) from None
+
+    def index_lookup(self) -> Callable[[Node], int]:
+        """Get a function like ``node_index`` for the current graph, which
+        keeps working while edits are pending"""
+        node_indices = self.node_indices
+
+        def lookup(node: Node) -> int:
+            try:
+                return node_indices[node]
+            except KeyError:
+                raise not_in_patch(node) from None
+        return lookup
+
     def add_connections(self, node: Node, *connections: OutletList) -> None:
         """Add connections to a node in this patch
 
@@ -451,7 +1060,7 @@ class Patch:
         \\*connections : Node.Outlet or tuple of Node.Outlet
             zero or more outlets to connect to the node
         """
-        inlet_owner_index = self.nodes.index(node)
+        inlet_owner_index = self.node_index(node)
         for inlet_index, outlets in enumerate(connections):
             if isinstance(outlets, Node.Outlet):
                 outlets = (outlets,)
@@ -463,10 +1072,428 @@ class Patch:
             except (AssertionError, IndexError):
                 raise Exception("Malformed connections list")
             for o in outlets:
-                outlet_owner_index = self.nodes.index(o.owner)
-                self.connections.append(Connection(outlet_owner_index,
-                                                   o.index, inlet_owner_index,
-                                                   inlet_index))
+                outlet_owner_index = self.node_index(o.owner)
+                self.append_connection(outlet_owner_index, o.index,
+                                       inlet_owner_index, inlet_index)
+
+    def add_connections_many(
+            self, edges: Iterable[Tuple[Node, int, Node, int]]) -> None:
+        """Add a batch of connections to nodes in this patch
+
+        Parameters
+        ----------
+        edges : iterable of tuples
+            ``(source, outlet_index, sink, inlet_index)`` for each
+            connection, where source and sink are nodes in this patch
+        """
+        node_index = self.node_index
+        append_connection = self.append_connection
+        for source, outlet_index, sink, inlet_index in edges:
+            append_connection(node_index(source), outlet_index,
+                              node_index(sink), inlet_index)
+
+    def append_connection(self, source: int, outlet_index: int, sink: int,
+                          inlet_index: int) -> None:
+        """Add a connection between two node indices"""
+        if self.editor is not None:
+            self.end_edits()
+        self.connections.append(Connection(source, outlet_index, sink,
+                                           inlet_index))
+
+    def edge_columns(self) -> Tuple[Sequence[int], Sequence[int],
+                                    Sequence[int], Sequence[int]]:
+        """Get the sources, outlet indices, sinks and inlet indices of the
+        connections, as four sequences"""
+        connections = self.connections
+        return ([c.source for c in connections],
+                [c.outlet_index for c in connections],
+                [c.sink for c in connections],
+                [c.inlet_index for c in connections])
+
+    def iter_containers(self) -> Iterator[Tuple[int, Node]]:
+        """Yield the index and node of each Subpatch and Clone"""
+        for index, node in enumerate(self.nodes):
+            if isinstance(node, (Subpatch, Clone)):
+                yield index, node
+
+    def replace_graph(self, nodes: Sequence[Node],
+                      connections: Iterable[Connection]) -> None:
+        """Replace the nodes and connections of the patch
+
+        Connections refer to positions in ``nodes``. Removed nodes can still
+        be used as layout anchors, but not connected.
+        """
+        self.nodes = list(nodes)
+        self.node_indices = {node: index
+                             for index, node in enumerate(self.nodes)}
+        self.connections = list(connections)
+
+    def edit(self) -> 'PatchEditor':
+        """Start a batch of edits to the graph
+
+        The editor holds node references and the incoming and outgoing
+        connections of each node, so ``remove``, ``replace``,
+        ``insert_between``, ``connect`` and ``disconnect`` each take time
+        in the number of connections of the nodes involved. The patch is
+        renumbered once, by ``apply`` or at the end of a ``with`` block.
+        Until then, nodes and connections can only be added through the
+        editor.
+
+            with patch.edit() as graph:
+                graph.remove(unused)
+                graph.insert_between(osc[0], (dac, 0), Obj(0, 0, 'hip~ 5'))
+
+        Returns
+        -------
+        editor : PatchEditor
+
+        Raises
+        ------
+        RuntimeError
+            if another editor from ``edit`` is open
+        """
+        from .edit import PatchEditor
+        self.end_edits()
+        self.editor = PatchEditor(self)
+        return self.editor
+
+    def end_edits(self) -> None:
+        """Apply pending edits before the graph is changed another way
+
+        Raises
+        ------
+        RuntimeError
+            if an editor from ``edit`` is open
+        """
+        if self.edits_pending:
+            self.apply_edits()
+        elif self.editor is not None:
+            raise RuntimeError(
+                'the patch is being edited; add nodes and connections '
+                'with the editor, or apply it first')
+
+    def pending_edits(self) -> 'PatchEditor':
+        """Get the editor holding the edits of ``remove``, ``replace`` and
+        ``insert_between``
+
+        The first edit indexes the connections. Until ``nodes``,
+        ``connections`` or ``node_indices`` is next read, later edits
+        only touch the connections of the nodes involved, and the read
+        renumbers the patch once. Inside an ``edit`` block, the edits go
+        to its editor.
+        """
+        editor = self.editor
+        if editor is None:
+            from .edit import PatchEditor
+            editor = PatchEditor(self)
+            if self.defers_edits:
+                self.editor = editor
+                self.edits_pending = True
+        return editor
+
+    def apply_edits(self) -> None:
+        """Renumber the patch for the pending edits, if there are any"""
+        if self.edits_pending:
+            self.editor.apply()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        self.apply_edits()
+        state = dict(self.__dict__)
+        # an open editor belongs to this process
+        state['editor'] = None
+        return state
+
+    def remove(self, node: Node) -> None:
+        """Remove a node and its connections
+
+        Edits are applied when the graph is next read, see
+        ``pending_edits``, so each call takes time in the number of the
+        node's connections.
+        """
+        graph = self.pending_edits()
+        graph.remove(node)
+        self.finish_edit(graph)
+
+    def replace(self, old: Node, new: Node) -> None:
+        """Put a node that is not in the patch in place of another, keeping
+        its connections
+
+        Edits are applied when the graph is next read, see
+        ``pending_edits``.
+        """
+        graph = self.pending_edits()
+        graph.replace(old, new)
+        self.finish_edit(graph)
+
+    def insert_between(self, outlet: Node.Outlet, inlet: Tuple[Node, int],
+                       node: Node) -> None:
+        """Route the connections from an outlet to ``(sink, inlet_index)``
+        through the first inlet and outlet of a node
+
+        Edits are applied when the graph is next read, see
+        ``pending_edits``.
+        """
+        graph = self.pending_edits()
+        graph.insert_between(outlet, inlet, node)
+        self.finish_edit(graph)
+
+    def finish_edit(self, graph: 'PatchEditor') -> None:
+        if graph is not self.editor:
+            graph.apply()
+
+    def move_nodes(self, positions: Mapping[int, Tuple[int, int]]) -> None:
+        """Set the positions of nodes, by index"""
+        nodes = self.nodes
+        for index, (x_pos, y_pos) in positions.items():
+            node = nodes[index]
+            node.x_pos = x_pos
+            node.y_pos = y_pos
+
+    def auto_layout(self, x_spacing: int = 20, y_spacing: int = 25,
+                    max_width: Optional[int] = 2000,
+                    sweeps: int = 2) -> None:
+        """Place every visible node, replacing the positions from creators
+
+        Each node goes one layer below the deepest node connected to it,
+        so connections run downwards. Connections that close a cycle,
+        such as those added with ``connect``, are ignored for layering.
+        Nodes in a layer are ordered by the mean position of their
+        neighbors, to reduce crossings. Spacing uses the same box sizes
+        as the creators. Subpatches keep their own layout. ``inlet`` and
+        ``outlet`` objects keep their left to right order, which numbers
+        the ports seen by the parent, and outlets go in the last layer.
+
+        Parameters
+        ----------
+        x_spacing, y_spacing : int, optional
+            the gaps between boxes in a layer, and between layers
+
+        max_width : int, optional
+            the width at which a layer wraps onto another line, or None
+            to never wrap
+
+        sweeps : int, optional
+            the number of down and up passes of crossing reduction
+        """
+        from .layout import auto_layout
+        auto_layout(self, x_spacing, y_spacing, max_width, sweeps)
+
+    def analyze(self) -> 'GraphAnalysis':
+        """Find cycles, untriggered fan-out and message order
+
+        The patch and its subpatches are indexed as one graph, in time
+        linear in the number of nodes and connections. Connections to a
+        subpatch continue from its inlet and outlet objects.
+
+        Returns
+        -------
+        analysis : GraphAnalysis
+            ``cycles`` lists every strongly connected component, and
+            ``control_cycles`` those closed through left inlets without a
+            delay, which would hang Pd. ``fanouts`` lists control outlets
+            connected to several inlets without a trigger.
+            ``message_order((path, index))`` gives the depth-first order of
+            messages from a node.
+        """
+        from .analysis import GraphAnalysis
+        return GraphAnalysis(self)
+
+    def simulate(self) -> 'Simulator':
+        """Run the patch's control objects in Python, without Pd
+
+        Supported objects are ``t``, ``f``, ``i``, arithmetic and
+        comparison objects, ``moses``, ``pack``, ``unpack``, ``sel``,
+        ``route``, ``s``, ``r``, ``delay``, ``b``, ``print``,
+        ``loadbang`` and message boxes with ``$1`` arguments, commas and
+        semicolons. Messages are sent depth first, trigger outlets from
+        right to left, and fan-out in the order connections were made.
+        Delays wait on a virtual clock. Other objects drop their messages.
+        Non-signal objects among them are listed in ``unsupported``.
+
+            sim = patch.simulate()
+            notes = sim.watch('note')
+            sim.send_to(('', 2))  # click the message box at index 2
+            sim.advance(500)
+            assert notes == [('list', 440.0, 0.5)]
+
+        Returns
+        -------
+        simulator : Simulator
+            ``send``, ``send_to``, ``loadbang`` and ``advance`` drive the
+            patch, and ``printed``, ``watch`` and ``probe`` collect its
+            output
+        """
+        from .simulate import Simulator
+        return Simulator(self)
+
+    def optimize(self) -> 'OptimizeReport':
+        """Remove unused objects and resolve constant message chains
+
+        Objects without side effects are removed when their output goes
+        nowhere, along with control objects that never receive input.
+        Chains of ``t``, ``f``, ``i`` and arithmetic objects that only
+        receive one constant message are replaced by a message box that
+        sends their result. Subpatches and clone abstractions are
+        optimized too.
+
+        Returns
+        -------
+        report : OptimizeReport
+            the numbers of removed objects and connections, and of folded
+            message chains, in this patch and the patches it contains
+        """
+        from .optimize import optimize
+        return optimize(self)
+
+    def optimize_dsp(self) -> 'DspReport':
+        """Inline subpatches and fuse chains of signal arithmetic
+
+        Subpatches are replaced by their contents, which removes the
+        ``inlet~`` and ``outlet~`` copies from Pd's DSP graph. Subpatches
+        with arrays, ``loadbang``, ``block~`` or ``switch~``, or whose
+        control messages would change order, are kept. Linear chains of
+        ``*~``, ``+~``, ``-~`` and ``/~`` become one ``expr~`` computing
+        the same operations in the same order.
+
+        Returns
+        -------
+        report : DspReport
+            the numbers of DSP objects before and after, and of inlined
+            subpatches and fused chains
+        """
+        from .dsp import optimize_dsp
+        return optimize_dsp(self)
+
+    def cost_report(self, block_size: int = 64, sample_rate: int = 44100,
+                    costs: Optional[Mapping[str, Any]] = None,
+                    top: Optional[int] = 20) -> 'CostReport':
+        """Estimate the DSP work of the patch, without running Pd
+
+        Tilde objects are given a cost per sample from a table, in units
+        of one signal addition. Signals summed into one inlet add to the
+        cost of their sink. Subpatches are included once per use and
+        clone abstractions once per copy.
+
+        Parameters
+        ----------
+        block_size : int, optional
+            the number of samples per DSP block
+
+        sample_rate : int, optional
+            the number of samples per second
+
+        costs : mapping, optional
+            costs to use instead of those in ``cost.DEFAULT_COSTS``, by
+            object name. A cost is a number, or a function that takes the
+            block size and returns a number.
+
+        top : int, optional
+            the number of hotspots to report, or None for all objects
+
+        Returns
+        -------
+        report : CostReport
+            the total cost, object counts and the most expensive objects.
+            ``report.to_json()`` gives a form that CI can store and check
+            with ``CostReport.from_json(text)`` and ``report.exceeds``.
+        """
+        from .cost import cost_report
+        return cost_report(self, block_size, sample_rate, costs, top)
+
+    def structure_hash(self) -> str:
+        """Get a hash of the patch contents, including its subpatches
+
+        Patches that serialize to the same body have the same hash. The
+        hash is computed from the current records, except inside a
+        ``subpatch_cache.session()``, which computes it once per Patch.
+        """
+        hashes = subpatch_cache.hashes
+        if hashes is not None:
+            key = hashes.get(id(self))
+            if key is not None:
+                return key
+        digest = hashlib.blake2b(digest_size=16)
+        children = []
+        chunk = []
+
+        def emit_subpatch(node: Subpatch) -> Iterator[str]:
+            children.append(node.src)
+            return (node.restore_line(),)
+
+        for line in self.iter_body(emit_subpatch):
+            chunk.append(line)
+            if len(chunk) >= 4096:
+                digest.update(''.join(chunk).encode('utf-8'))
+                chunk.clear()
+        digest.update(''.join(chunk).encode('utf-8'))
+        if children:
+            digest = hashlib.blake2b(digest.digest(), digest_size=16)
+            for child in children:
+                digest.update(child.structure_hash().encode('ascii'))
+        key = digest.hexdigest()
+        if hashes is not None:
+            hashes[id(self)] = key
+        return key
+
+    @classmethod
+    def load(cls, filename: str) -> 'Patch':
+        """Read a patch from a .pd file
+
+        Parameters
+        ----------
+        filename : str
+            the file to read
+
+        Returns
+        -------
+        patch : Patch
+            the loaded patch, with nested subpatches rebuilt
+        """
+        from .parser import load
+        return load(filename, cls)
+
+    def save_snapshot(self, filename: str) -> None:
+        """Write the patch to a binary snapshot file
+
+        The snapshot holds a table of the distinct texts and, for each
+        distinct patch in the subpatch tree, packed node and connection
+        columns. Arrays and other uncommon nodes are pickled. See
+        ``load_snapshot``.
+
+        Parameters
+        ----------
+        filename : str
+            the file to write
+        """
+        from .snapshot import save_snapshot
+        save_snapshot(self, filename)
+
+    @staticmethod
+    def load_snapshot(filename: str) -> 'SnapshotPatch':
+        """Memory-map a snapshot written by ``save_snapshot``
+
+        Nodes and texts are decoded from the file as they are read, so a
+        loaded patch can be written as a ``.pd`` file without decoding it
+        all first. The patch is copied into memory the first time it is
+        changed. Snapshots are read back on a machine with the same byte
+        order. The file must not be changed in place while the patch is in
+        use; ``save_snapshot`` replaces it with a new file, which is safe.
+
+        Uncommon nodes such as arrays are stored with ``pickle``, so only
+        load snapshots from a trusted source.
+
+        Parameters
+        ----------
+        filename : str
+            the file to read
+
+        Returns
+        -------
+        patch : SnapshotPatch
+            a ColumnarPatch backed by the file, with its subpatches
+        """
+        from .snapshot import load_snapshot
+        return load_snapshot(filename)
 
     def get_creators(self, names: str) -> Sequence[Callable]:
         """Get a list of functions to compose the patch
@@ -475,7 +1502,8 @@ class Patch:
         ----------
         names : str
             a comma-separated list of function names
-            allowed values: obj, msg, floatatom, subpatch, array, connect
+            allowed values: obj, msg, floatatom, subpatch, array, clone,
+            connect, obj_many, msg_many, connect_many
 
         Returns
         -------
@@ -485,17 +1513,154 @@ class Patch:
         return tuple(self.creators[k] for k in name_list if (k in self.creators.keys()))
 
     def __str__(self):
-        out = '#N canvas 0 50 1000 600 10;\n'
-        out += self.subpatch_str().rstrip()
-        return out
+        return ''.join(self.iter_lines())
 
     def subpatch_str(self):
-        out = ''.join([str(n) for n in self.nodes])
-        out += ''.join([str(c) for c in self.connections])
-        return out
+        with subpatch_cache.session():
+            return ''.join(self.iter_body())
+
+    def serialize(self, parallel: bool = False,
+                  processes: Optional[int] = None) -> str:
+        """Get the text of the patch file
 
+        Parameters
+        ----------
+        parallel : bool, optional
+            serialize the distinct top-level subpatches in a process pool.
+            The result is the same as ``str(patch)``.
 
-def write_file(filename: str, data: str):
-    fp = open(filename, 'w')
-    fp.write(data)
-    fp.close()
+        processes : int, optional
+            the number of worker processes, by default one per CPU
+        """
+        if not parallel:
+            return str(self)
+        from .parallel import serialize_parallel
+        return serialize_parallel(self, processes)
+
+    def iter_lines(self, emit_subpatch: Optional[
+            Callable[[Subpatch], Iterable[str]]] = None) -> Iterator[str]:
+        """Yield the lines of the patch file, in order
+
+        The lines are produced lazily, so nested subpatches are never
+        joined into intermediate strings. Joining the result gives the
+        same text as ``str(patch)``. See ``iter_body`` for
+        ``emit_subpatch``.
+        """
+        with subpatch_cache.session():
+            yield self.canvas_line
+            lines = self.iter_body(emit_subpatch)
+            last = next(lines, None)
+            if last is None:
+                return
+            for line in lines:
+                yield last
+                last = line
+            yield last.rstrip()
+
+    def iter_body(self, emit_subpatch: Optional[
+            Callable[[Subpatch], Iterable[str]]] = None) -> Iterator[str]:
+        """Yield the node and connection lines, without the canvas header
+
+        Parameters
+        ----------
+        emit_subpatch : function, optional
+            called for each Subpatch node, returns the lines to write in
+            its place. By default the subpatch is written inline.
+        """
+        for n in self.nodes:
+            if emit_subpatch is not None and isinstance(n, Subpatch):
+                yield from emit_subpatch(n)
+            else:
+                yield from n.iter_lines()
+        for c in self.connections:
+            yield str(c)
+
+    def iter_clones(self) -> Iterator[Clone]:
+        """Yield the clone objects in this patch and everything it contains
+        """
+        seen = set()
+        stack = [self]
+        while stack:
+            patch = stack.pop()
+            for node in patch.nodes:
+                if isinstance(node, (Subpatch, Clone)):
+                    if isinstance(node, Clone):
+                        yield node
+                    if id(node.src) not in seen:
+                        seen.add(id(node.src))
+                        stack.append(node.src)
+
+    def write_to(self, fileobj: TextIO, buffer_size: int = 1 << 16) -> None:
+        """Write the patch to an open text file
+
+        Parameters
+        ----------
+        fileobj : file object
+            the destination, opened for writing text
+
+        buffer_size : int, optional
+            the number of characters collected before each write
+        """
+        chunk = []
+        chunk_size = 0
+        for line in self.iter_lines():
+            chunk.append(line)
+            chunk_size += len(line)
+            if chunk_size >= buffer_size:
+                fileobj.write(''.join(chunk))
+                chunk.clear()
+                chunk_size = 0
+        if chunk:
+            fileobj.write(''.join(chunk))
+
+
+def write_file(filename: str, data: Union[str, Patch]):
+    """Write a patch to a file
+
+    Parameters
+    ----------
+    filename : str
+        the destination path
+
+    data : str or Patch
+        the patch text, or a Patch to be written line by line. The
+        abstractions of the Patch's clone objects are written to the same
+        directory.
+    """
+    with open(filename, 'w') as fp:
+        if isinstance(data, str):
+            fp.write(data)
+        else:
+            data.write_to(fp)
+    if isinstance(data, Patch):
+        write_clone_sources(os.path.dirname(filename), data)
+
+
+def write_clone_sources(directory: str, patch: Patch) -> List[str]:
+    """Write the abstraction of each clone object in a patch
+
+    Returns
+    -------
+    filenames : list of str
+        the files written
+
+    Raises
+    ------
+    ValueError
+        if two clone objects use the same name for different patches
+    """
+    sources = {}
+    for node in patch.iter_clones():
+        src = sources.setdefault(node.name, node.src)
+        if src is not node.src and \
+                src.structure_hash() != node.src.structure_hash():
+            raise ValueError(
+                'Clone name {!r} is used for different patches'.format(
+                    node.name))
+    filenames = []
+    for name, src in sources.items():
+        filename = os.path.join(directory, name + '.pd')
+        with open(filename, 'w') as fp:
+            src.write_to(fp)
+        filenames.append(filename)
+    return filenames
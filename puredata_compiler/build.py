@@ -0,0 +1,360 @@
+from typing import (IO, Callable, Dict, Iterable, Iterator, List,
+                    Mapping, Optional, Tuple)
+import collections
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import time
+
+from .api import Patch
+
+BuildReport = collections.namedtuple(
+    'BuildReport', ['written', 'unchanged', 'skipped_modules'])
+
+CACHE_NAME = '.puredata-cache.json'
+CACHE_VERSION = 1
+
+
+def file_hash(filenames: Iterable[str]) -> str:
+    """Hash the contents of several files, with their names"""
+    digest = hashlib.blake2b(digest_size=16)
+    for filename in filenames:
+        digest.update(filename.encode('utf-8') + b'\0')
+        try:
+            with open(filename, 'rb') as fp:
+                digest.update(fp.read())
+        except OSError:
+            digest.update(b'\0missing')
+    return digest.hexdigest()
+
+
+def package_hash() -> str:
+    """Hash the sources of this package, which write every output"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    return file_hash(sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.py')))
+
+
+def file_stamp(filename: str) -> Optional[List[int]]:
+    try:
+        info = os.stat(filename)
+    except OSError:
+        return None
+    return [info.st_size, info.st_mtime_ns]
+
+
+class BuildCache:
+    """Hashes of the modules and outputs of earlier builds, stored as JSON
+
+    ``modules`` maps each module path to the hash of its source and of
+    the local modules it imported, and the outputs it produced.
+    ``outputs`` maps each written file to the hash of its contents and its
+    size and modification time when written, so that files changed
+    outside the build are rewritten. The module hashes are only used with
+    the version of this package that stored them.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.compiler = package_hash()
+        self.modules: Dict[str, dict] = {}
+        self.outputs: Dict[str, dict] = {}
+        try:
+            with open(filename, encoding='utf-8') as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            if data.get('compiler') == self.compiler:
+                self.modules = data['modules']
+            self.outputs = data['outputs']
+
+    def save(self) -> None:
+        data = {'version': CACHE_VERSION, 'compiler': self.compiler,
+                'modules': self.modules, 'outputs': self.outputs}
+        write_atomic(self.filename, [json.dumps(data, indent=1)])
+
+    def is_current(self, filename: str) -> bool:
+        """Check that a file is as the last build left it"""
+        entry = self.outputs.get(filename)
+        return entry is not None and file_stamp(filename) == entry['stamp']
+
+    def module_is_current(self, module: str) -> bool:
+        entry = self.modules.get(module)
+        if entry is None or \
+                file_hash(entry['sources']) != entry['hash']:
+            return False
+        return all(self.is_current(filename) for filename in entry['outputs'])
+
+
+def file_mode() -> int:
+    """Get the permissions that ``open`` gives new files"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def temporary_file(filename: str, mode: str = 'w') -> Tuple[IO, str]:
+    """Open a temporary file next to another, to replace it later"""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temp_name = tempfile.mkstemp(
+        prefix='.' + os.path.basename(filename) + '.', dir=directory)
+    os.chmod(temp_name, file_mode())
+    encoding = None if 'b' in mode else 'utf-8'
+    return os.fdopen(fd, mode, encoding=encoding), temp_name
+
+
+def write_atomic(filename: str, chunks: Iterable[str]) -> None:
+    """Write a file through a temporary file in the same directory, so
+    readers see either the old or the new contents"""
+    fp, temp_name = temporary_file(filename)
+    try:
+        with fp:
+            fp.writelines(chunks)
+        os.replace(temp_name, filename)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def hashed(chunks: Iterable[str], digest) -> Iterator[str]:
+    for chunk in chunks:
+        digest.update(chunk.encode('utf-8'))
+        yield chunk
+
+
+def text_hash(filename: str) -> Optional[str]:
+    """Hash an existing file the way ``write_if_changed`` hashes text"""
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(filename, encoding='utf-8') as fp:
+            for chunk in iter(lambda: fp.read(1 << 16), ''):
+                digest.update(chunk.encode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
+def write_if_changed(filename: str, patch: Patch, cache: BuildCache) -> bool:
+    """Write a patch unless the file already holds the same text
+
+    The text is hashed while it is written to a temporary file, which
+    replaces the output only when the hash differs from the file's.
+
+    Returns
+    -------
+    written : bool
+        whether the file was replaced
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    fp, temp_name = temporary_file(filename)
+    try:
+        with fp:
+            fp.writelines(hashed(patch.iter_lines(), digest))
+        content = digest.hexdigest()
+        if cache.is_current(filename):
+            unchanged = cache.outputs[filename]['content'] == content
+        else:
+            # not written by an earlier build, or changed since
+            unchanged = text_hash(filename) == content
+        if unchanged:
+            os.unlink(temp_name)
+        else:
+            os.replace(temp_name, filename)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    cache.outputs[filename] = {'content': content,
+                               'stamp': file_stamp(filename)}
+    return not unchanged
+
+
+def clone_sources(patch: Patch) -> Dict[str, Patch]:
+    """Get the abstraction of each clone object, by name"""
+    sources = {}
+    for node in patch.iter_clones():
+        src = sources.setdefault(node.name, node.src)
+        if src is not node.src and \
+                src.structure_hash() != node.src.structure_hash():
+            raise ValueError(
+                'Clone name {!r} is used for different patches'.format(
+                    node.name))
+    return sources
+
+
+def local_modules(directory: str) -> Dict[str, str]:
+    """Get the source files of loaded modules under a directory, other
+    than this package's and the main script's, by module name"""
+    prefix = os.path.join(os.path.abspath(directory), '')
+    package = os.path.join(os.path.dirname(os.path.abspath(__file__)), '')
+    found = {}
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, '__file__', None)
+        if name != '__main__' and filename and filename.endswith('.py'):
+            filename = os.path.abspath(filename)
+            if filename.startswith(prefix) and \
+                    not filename.startswith(package) and \
+                    'site-packages' not in filename:
+                found[name] = filename
+    return found
+
+
+def forget_modules(filenames: Iterable[str]) -> None:
+    """Remove modules from ``sys.modules`` so they are imported again"""
+    filenames = set(filenames)
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, '__file__', None)
+        if filename and os.path.abspath(filename) in filenames:
+            del sys.modules[name]
+
+
+def load_targets(path: str) -> Mapping[str, Callable[[], Patch]]:
+    """Run a build module and get its ``TARGETS``
+
+    The module is loaded from its file each time, with its directory on
+    ``sys.path`` so that it can import its neighbours.
+    """
+    directory = os.path.dirname(path)
+    name = '_puredata_build_' + \
+        os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, directory)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(directory)
+    targets = getattr(module, 'TARGETS', None)
+    if not isinstance(targets, Mapping):
+        raise ValueError('{} does not define a TARGETS mapping'.format(path))
+    return targets
+
+
+def build_module(path: str, output_dir: str, cache: BuildCache,
+                 report: BuildReport) -> None:
+    """Run a module's patch factories and write the outputs that changed
+    """
+    directory = os.path.dirname(path)
+    # local modules are imported again, so the ones that appear while the
+    # module and its factories run are the ones it uses
+    forget_modules(local_modules(directory).values())
+    loaded = set(sys.modules)
+    targets = load_targets(path)
+    outputs = []
+    for target, factory in targets.items():
+        filename = os.path.abspath(os.path.join(output_dir, target))
+        patch = factory()
+        files = [(filename, patch)]
+        target_dir = os.path.dirname(filename)
+        for name, src in clone_sources(patch).items():
+            files.append((os.path.join(target_dir, name + '.pd'), src))
+        for output, patch in files:
+            outputs.append(output)
+            if write_if_changed(output, patch, cache):
+                report.written.append(output)
+            else:
+                report.unchanged.append(output)
+    sources = [path] + sorted(
+        filename for name, filename in local_modules(directory).items()
+        if name not in loaded and filename != path)
+    cache.modules[path] = {'hash': file_hash(sources), 'sources': sources,
+                           'outputs': outputs}
+
+
+def build(modules: Iterable[str], output_dir: str = '.',
+          cache_file: Optional[str] = None,
+          force: bool = False) -> BuildReport:
+    """Build the patches defined by modules, skipping unchanged outputs
+
+    Each module is a Python file with a ``TARGETS`` mapping, like the one
+    given to ``compile_many``, from output paths to functions returning
+    a Patch. A module is not run again while its source, the source of
+    the local modules it imports, this package and its outputs are
+    unchanged since the last build. When it is run, outputs whose text
+    did not change are not rewritten, and the others are replaced
+    atomically.
+
+    Parameters
+    ----------
+    modules : iterable of str
+        paths of the build modules
+
+    output_dir : str, optional
+        the directory that the target paths are relative to
+
+    cache_file : str, optional
+        where to store the hashes, by default ``.puredata-cache.json`` in
+        the output directory
+
+    force : bool, optional
+        run every module, even if it is unchanged
+
+    Returns
+    -------
+    report : BuildReport
+        the files written and left unchanged, and the modules that were
+        not run
+    """
+    if cache_file is None:
+        cache_file = os.path.join(output_dir, CACHE_NAME)
+    cache = BuildCache(cache_file)
+    report = BuildReport([], [], [])
+    for module in modules:
+        path = os.path.abspath(module)
+        if not force and cache.module_is_current(path):
+            report.skipped_modules.append(module)
+            continue
+        build_module(path, output_dir, cache, report)
+    cache.save()
+    return report
+
+
+def watch(modules: List[str], output_dir: str = '.',
+          cache_file: Optional[str] = None, interval: float = 0.5,
+          on_build: Optional[Callable[[BuildReport], None]] = None) -> None:
+    """Build the modules, then rebuild each one when its sources change
+
+    Source files are polled for new modification times. Only the changed
+    module is run again, and only the outputs whose text changed are
+    written. Runs until interrupted.
+    """
+    if cache_file is None:
+        cache_file = os.path.join(output_dir, CACHE_NAME)
+    report = build(modules, output_dir, cache_file)
+    if on_build is not None:
+        on_build(report)
+    cache = BuildCache(cache_file)
+
+    def stamps(path: str) -> list:
+        entry = cache.modules.get(path, {'sources': [path]})
+        return [file_stamp(filename) for filename in entry['sources']]
+
+    paths = {module: os.path.abspath(module) for module in modules}
+    seen = {module: stamps(path) for module, path in paths.items()}
+    while True:
+        time.sleep(interval)
+        changed = [module for module, path in paths.items()
+                   if stamps(path) != seen[module]]
+        if not changed:
+            continue
+        report = BuildReport([], [], [])
+        for module in changed:
+            path = paths[module]
+            if cache.module_is_current(path):
+                report.skipped_modules.append(module)
+            else:
+                try:
+                    build_module(path, output_dir, cache, report)
+                except Exception as e:
+                    # keep watching, the next save may fix it
+                    print('{}: {}: {}'.format(module, type(e).__name__, e),
+                          file=sys.stderr)
+            seen[module] = stamps(path)
+        cache.save()
+        if on_build is not None:
+            on_build(report)
@@ -0,0 +1,52 @@
+from typing import List, Optional
+import argparse
+import os
+import sys
+
+from .build import BuildReport, build, watch
+
+
+def print_report(report: BuildReport) -> None:
+    for filename in report.written:
+        print('wrote', os.path.relpath(filename))
+    print('{} written, {} unchanged, {} modules skipped'.format(
+        len(report.written), len(report.unchanged),
+        len(report.skipped_modules)))
+    sys.stdout.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='puredata-compiler',
+        description='Build PureData patches from Python modules')
+    commands = parser.add_subparsers(dest='command')
+    build_parser = commands.add_parser(
+        'build', help='write the patches of modules that define TARGETS, '
+        'skipping unchanged outputs')
+    build_parser.add_argument('modules', nargs='+', metavar='module.py')
+    build_parser.add_argument('-o', '--output-dir', default='.',
+                              help='directory the target paths are '
+                              'relative to')
+    build_parser.add_argument('--cache', help='cache file, by default '
+                              '.puredata-cache.json in the output directory')
+    build_parser.add_argument('-f', '--force', action='store_true',
+                              help='run every module')
+    build_parser.add_argument('-w', '--watch', action='store_true',
+                              help='rebuild modules when their sources '
+                              'change')
+    build_parser.add_argument('--interval', type=float, default=0.5,
+                              help='seconds between checks in watch mode')
+    args = parser.parse_args(argv)
+    if args.command != 'build':
+        parser.print_help()
+        return 2
+    if args.watch:
+        try:
+            watch(args.modules, args.output_dir, args.cache, args.interval,
+                  print_report)
+        except KeyboardInterrupt:
+            pass
+        return 0
+    print_report(build(args.modules, args.output_dir, args.cache,
+                       args.force))
+    return 0
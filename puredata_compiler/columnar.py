@@ -0,0 +1,405 @@
+from array import array
+from typing import (Callable, Dict, Iterable, Iterator, List, Mapping,
+                    Optional, Sequence, Tuple)
+import collections.abc
+import itertools
+
+from .api import (Node, Obj, Msg, FloatAtom, Subpatch, Clone, Connection,
+                  Patch, OutletList, escape, get_display_lines,
+                  get_box_size)
+
+OBJ = 0
+MSG = 1
+FLOATATOM = 2
+OTHER = 3
+
+CONNECT_FORMAT = '#X connect %d %d %d %d;\n'
+FLOATATOM_FORMAT = '#X floatatom %d %d 5 0 0 - - -;\n'
+RECORD_FORMATS = {OBJ: '#X obj %d %d %s;\n',
+                  MSG: '#X msg %d %d %s;\n'}
+KINDS = {Obj: OBJ, Msg: MSG}
+CHUNK_LINES = 4096
+
+
+class ColumnarNode(Node):
+    """Handle to an object, message or number box in a ColumnarPatch
+
+    The node's fields live in the patch's columns. Handles are created on
+    demand and hold only the patch and the node index, so their
+    ``parameters`` are read-only.
+    """
+    __slots__ = ('patch', 'index')
+
+    def __init__(self, patch: 'ColumnarPatch', index: int):
+        self._outlets = None
+        self.patch = patch
+        self.index = index
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        if self.kind == FLOATATOM:
+            return ('x_pos', 'y_pos')
+        return ('x_pos', 'y_pos', 'text')
+
+    @property
+    def kind(self) -> int:
+        return self.patch.kinds[self.index]
+
+    @property
+    def x_pos(self) -> int:
+        return self.patch.x_positions[self.index]
+
+    @property
+    def y_pos(self) -> int:
+        return self.patch.y_positions[self.index]
+
+    @property
+    def text(self) -> str:
+        text_id = self.patch.text_ids[self.index]
+        if text_id < 0:
+            raise AttributeError('text')
+        return self.patch.strings[text_id]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        text_id = self.patch.text_ids[self.index]
+        if text_id < 0:
+            return (50, 25)
+        return self.patch.text_size(text_id)
+
+    def __str__(self):
+        return self.patch.format_node(self.index)
+
+    def detach(self) -> Node:
+        """Copy the node to a regular Obj, Msg or FloatAtom"""
+        kind = self.kind
+        if kind == FLOATATOM:
+            return FloatAtom(self.x_pos, self.y_pos)
+        node_class = Obj if kind == OBJ else Msg
+        return node_class.from_saved(self.x_pos, self.y_pos, self.text)
+
+
+class ColumnarNodes(collections.abc.Sequence):
+    """Read-only view of the nodes in a ColumnarPatch"""
+    __slots__ = ('patch',)
+
+    def __init__(self, patch: 'ColumnarPatch'):
+        self.patch = patch
+
+    def __len__(self):
+        return len(self.patch.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.patch.get_node(index)
+
+
+class ColumnarConnections(collections.abc.Sequence):
+    """Read-only view of the connections in a ColumnarPatch"""
+    __slots__ = ('patch',)
+
+    def __init__(self, patch: 'ColumnarPatch'):
+        self.patch = patch
+
+    def __len__(self):
+        return len(self.patch.sources)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        p = self.patch
+        return Connection(p.sources[index], p.outlet_indices[index],
+                          p.sinks[index], p.inlet_indices[index])
+
+
+class ColumnarPatch(Patch):
+    """A Patch that stores nodes and connections in packed columns
+
+    Objects, messages and number boxes are kept as rows in typed arrays,
+    and their text is interned in a string table. Connections are four
+    ``array('i')`` columns. Subpatches and arrays are stored as regular
+    nodes. The creators are the same as for ``Patch``; ``obj``, ``msg``
+    and ``floatatom`` return lightweight ColumnarNode handles.
+
+    ``nodes`` and ``connections`` are read-only views that build node
+    handles and Connection objects on access. ``node_indices`` only holds
+    the regular nodes.
+    """
+    kinds: array
+    x_positions: array
+    y_positions: array
+    text_ids: array
+    strings: List[str]
+    string_ids: Dict[str, int]
+    text_sizes: Dict[int, Tuple[int, int]]
+    objects: Dict[int, Node]
+    sources: array
+    outlet_indices: array
+    sinks: array
+    inlet_indices: array
+    # the columns are read directly, so edits are applied at once
+    defers_edits = False
+
+    def __init__(self):
+        super().__init__()
+        self.nodes = ColumnarNodes(self)
+        self.connections = ColumnarConnections(self)
+        self.kinds = array('b')
+        self.x_positions = array('i')
+        self.y_positions = array('i')
+        self.text_ids = array('i')
+        self.strings = []
+        self.string_ids = {}
+        self.text_sizes = {}
+        self.objects = {}
+        self.sources = array('i')
+        self.outlet_indices = array('i')
+        self.sinks = array('i')
+        self.inlet_indices = array('i')
+
+    def intern(self, text: str) -> int:
+        """Get the string table id of some text, adding it if needed"""
+        text_id = self.string_ids.get(text)
+        if text_id is None:
+            text_id = self.string_ids[text] = len(self.strings)
+            self.strings.append(text)
+        return text_id
+
+    def text_size(self, text_id: int) -> Tuple[int, int]:
+        size = self.text_sizes.get(text_id)
+        if size is None:
+            display_lines = get_display_lines(self.strings[text_id])
+            size = self.text_sizes[text_id] = get_box_size(display_lines)
+        return size
+
+    def append_row(self, kind: int, x_pos: int, y_pos: int,
+                   text_id: int) -> ColumnarNode:
+        if self.editor is not None:
+            self.end_edits()
+        index = len(self.kinds)
+        self.kinds.append(kind)
+        self.x_positions.append(x_pos)
+        self.y_positions.append(y_pos)
+        self.text_ids.append(text_id)
+        return ColumnarNode(self, index)
+
+    def append_node(self, node: Node) -> int:
+        index = len(self.kinds)
+        x_pos, y_pos = node.position
+        self.append_row(OTHER, x_pos, y_pos, -1)
+        self.objects[index] = node
+        self.node_indices[node] = index
+        return index
+
+    def append_saved(self, node_class: type, x_pos: int, y_pos: int,
+                     text: str) -> ColumnarNode:
+        return self.append_row(KINDS[node_class], x_pos, y_pos,
+                               self.intern(text))
+
+    def get_node(self, index: int) -> Node:
+        """Get the node at an index, as a handle or stored node"""
+        if index < 0:
+            index += len(self.kinds)
+        if self.kinds[index] == OTHER:
+            return self.objects[index]
+        return ColumnarNode(self, index)
+
+    def node_index(self, node: Node) -> int:
+        if isinstance(node, ColumnarNode) and node.patch is self:
+            return node.index
+        return super().node_index(node)
+
+    def index_lookup(self) -> Callable[[Node], int]:
+        return self.node_index
+
+    def append_connection(self, source: int, outlet_index: int, sink: int,
+                          inlet_index: int) -> None:
+        if self.editor is not None:
+            self.end_edits()
+        self.sources.append(source)
+        self.outlet_indices.append(outlet_index)
+        self.sinks.append(sink)
+        self.inlet_indices.append(inlet_index)
+
+    def edge_columns(self) -> Tuple[array, array, array, array]:
+        """Get the connection columns, see ``Patch.edge_columns``"""
+        return (self.sources, self.outlet_indices, self.sinks,
+                self.inlet_indices)
+
+    def iter_containers(self) -> Iterator[Tuple[int, Node]]:
+        """Yield the index and node of each Subpatch and Clone"""
+        for index, node in self.objects.items():
+            if isinstance(node, (Subpatch, Clone)):
+                yield index, node
+
+    def replace_graph(self, nodes: Sequence[Node],
+                      connections: Iterable[Connection]) -> None:
+        """Replace the nodes and connections, see ``Patch.replace_graph``
+
+        Rows are renumbered, so handles to nodes that come after a removed
+        node are invalidated. The layout anchors are kept.
+        """
+        kinds = array('b')
+        x_positions = array('i')
+        y_positions = array('i')
+        text_ids = array('i')
+        objects = {}
+        moved = {}
+        for index, node in enumerate(nodes):
+            x_pos, y_pos = node.position
+            if isinstance(node, ColumnarNode) and node.patch is self:
+                moved[node.index] = index
+                kinds.append(node.kind)
+                text_ids.append(self.text_ids[node.index])
+            elif type(node) in KINDS:
+                kinds.append(KINDS[type(node)])
+                text_ids.append(self.intern(node.text))
+            else:
+                kinds.append(OTHER)
+                text_ids.append(-1)
+                objects[index] = node
+            x_positions.append(x_pos)
+            y_positions.append(y_pos)
+        self.row_head = self.move_anchor(self.row_head, moved)
+        self.row_tail = self.move_anchor(self.row_tail, moved)
+        self.kinds = kinds
+        self.x_positions = x_positions
+        self.y_positions = y_positions
+        self.text_ids = text_ids
+        self.objects = objects
+        self.node_indices = {node: index for index, node in objects.items()}
+        self.sources = array('i')
+        self.outlet_indices = array('i')
+        self.sinks = array('i')
+        self.inlet_indices = array('i')
+        for c in connections:
+            self.append_connection(c.source, c.outlet_index, c.sink,
+                                   c.inlet_index)
+
+    def move_nodes(self, positions: Mapping[int, Tuple[int, int]]) -> None:
+        """Set the positions of nodes, by index"""
+        x_positions = self.x_positions
+        y_positions = self.y_positions
+        objects = self.objects
+        for index, (x_pos, y_pos) in positions.items():
+            x_positions[index] = x_pos
+            y_positions[index] = y_pos
+            node = objects.get(index)
+            if node is not None:
+                node.x_pos = x_pos
+                node.y_pos = y_pos
+
+    def move_anchor(self, anchor: Optional[Node],
+                    moved: Dict[int, int]) -> Optional[Node]:
+        """Get the handle for a layout anchor after rows are renumbered
+
+        Removed rows become detached nodes at the same position.
+        """
+        if not isinstance(anchor, ColumnarNode) or anchor.patch is not self:
+            return anchor
+        if anchor.index in moved:
+            return ColumnarNode(self, moved[anchor.index])
+        return anchor.detach()
+
+    def create_obj(
+            self,
+            text: str,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> ColumnarNode:
+        """Create an object, see ``Patch.create_obj``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.append_saved(Obj, x_pos, y_pos, escape(text))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_msg(
+            self,
+            text: str,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> ColumnarNode:
+        """Create a message object, see ``Patch.create_msg``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.append_saved(Msg, x_pos, y_pos, escape(text))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_floatatom(self, *connections: OutletList,
+                         new_row: float = 1,
+                         new_col: float = 0,
+                         x_pos: int = -1,
+                         y_pos: int = -1) -> ColumnarNode:
+        """Create a number object, see ``Patch.create_floatatom``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.append_row(FLOATATOM, x_pos, y_pos, -1)
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def format_node(self, index: int) -> str:
+        kind = self.kinds[index]
+        if kind == OTHER:
+            return str(self.objects[index])
+        if kind == FLOATATOM:
+            return FLOATATOM_FORMAT % (self.x_positions[index],
+                                       self.y_positions[index])
+        return RECORD_FORMATS[kind] % (self.x_positions[index],
+                                       self.y_positions[index],
+                                       self.strings[self.text_ids[index]])
+
+    def iter_body(self, emit_subpatch: Optional[
+            Callable[[Subpatch], Iterable[str]]] = None) -> Iterator[str]:
+        """Yield the node and connection records in blocks of lines
+
+        Rows are formatted straight from the columns. Each yielded string
+        holds up to CHUNK_LINES complete lines. See ``Patch.iter_body``
+        for ``emit_subpatch``.
+        """
+        strings = self.strings
+        objects = self.objects
+        chunk = []
+        rows = zip(self.kinds, self.x_positions, self.y_positions,
+                   self.text_ids)
+        for index, (kind, x_pos, y_pos, text_id) in enumerate(rows):
+            if kind == OTHER:
+                if chunk:
+                    yield ''.join(chunk)
+                    chunk = []
+                node = objects[index]
+                if emit_subpatch is not None and isinstance(node, Subpatch):
+                    yield from emit_subpatch(node)
+                else:
+                    yield from node.iter_lines()
+                continue
+            if kind == FLOATATOM:
+                chunk.append(FLOATATOM_FORMAT % (x_pos, y_pos))
+            else:
+                chunk.append(RECORD_FORMATS[kind] % (x_pos, y_pos,
+                                                     strings[text_id]))
+            if len(chunk) >= CHUNK_LINES:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+        edges = zip(self.sources, self.outlet_indices, self.sinks,
+                    self.inlet_indices)
+        format_edge = CONNECT_FORMAT.__mod__
+        while True:
+            block = ''.join(map(format_edge,
+                                itertools.islice(edges, CHUNK_LINES)))
+            if not block:
+                break
+            yield block
+
@@ -0,0 +1,191 @@
+from typing import (Callable, Dict, Iterator, List, Mapping, Optional, Tuple,
+                    Union)
+import collections
+import json
+import math
+
+from .api import Clone, Subpatch, Patch
+from .dsp import Ports, object_name
+
+# a cost is the work per sample, or a function of the block size that
+# returns the work per sample
+Cost = Union[float, Callable[[int], float]]
+
+
+def fft_cost(block_size: int) -> float:
+    return 2 * max(1.0, math.log2(block_size))
+
+
+# rough work per sample, relative to one signal addition
+DEFAULT_COSTS: Dict[str, Cost] = {
+    '+~': 1, '-~': 1, '*~': 1, '/~': 1.5, 'max~': 1, 'min~': 1,
+    'clip~': 1.5, 'wrap~': 1.5, 'abs~': 1, 'sig~': 0.5, 'snapshot~': 0.1,
+    'inlet~': 1, 'outlet~': 1, 'dac~': 1, 'adc~': 1, 's~': 1, 'r~': 1,
+    'send~': 1, 'receive~': 1, 'throw~': 1, 'catch~': 1,
+    'osc~': 3, 'phasor~': 2, 'cos~': 3, 'noise~': 2, 'tabosc4~': 5,
+    'tabread~': 2, 'tabread4~': 5, 'tabwrite~': 1, 'tabplay~': 2,
+    'line~': 1.5, 'vline~': 4, 'lop~': 2, 'hip~': 2, 'bp~': 4,
+    'vcf~': 8, 'biquad~': 5, 'rpole~': 2, 'rzero~': 2, 'cpole~': 4,
+    'czero~': 4, 'samphold~': 1, 'env~': 3, 'delwrite~': 1.5,
+    'delread~': 2, 'delread4~': 5, 'vd~': 5, 'sqrt~': 4, 'rsqrt~': 4,
+    'exp~': 8, 'log~': 8, 'pow~': 10, 'mtof~': 10, 'ftom~': 10,
+    'dbtorms~': 10, 'rmstodb~': 10, 'expr~': 0.5,
+    'fft~': fft_cost, 'ifft~': fft_cost, 'rfft~': fft_cost,
+    'rifft~': fft_cost, 'framp~': fft_cost,
+}
+# cost of an unknown tilde object
+DEFAULT_SIGNAL_COST = 2.0
+# cost per block of calling each tilde object's perform routine
+OBJECT_OVERHEAD = 8.0
+# extra cost of each expr~ operator, on top of its base cost
+EXPR_OPERATOR_COST = 1.0
+EXPR_OPERATORS = '+-*/%&|<>=!^'
+
+
+class Hotspot(collections.namedtuple(
+        'Hotspot', ['path', 'index', 'text', 'signal', 'copies',
+                    'cost_per_block', 'fanout'])):
+    """One object's estimated cost
+
+    ``path`` names the enclosing subpatches, separated by ``/``, and
+    ``index`` is the object's position in that patch. ``copies`` is the
+    number of clone copies running it. ``cost_per_block`` includes every
+    copy.
+    """
+    __slots__ = ()
+
+
+class CostReport(collections.namedtuple(
+        'CostReport', ['block_size', 'sample_rate', 'cost_per_block',
+                       'cost_per_second', 'signal_objects',
+                       'control_objects', 'connections', 'hotspots'])):
+    """Estimated DSP cost of a patch, see ``Patch.cost_report``"""
+    __slots__ = ()
+
+    def to_dict(self) -> dict:
+        data = self._asdict()
+        data['hotspots'] = [hotspot._asdict() for hotspot in self.hotspots]
+        return data
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """Format the report as JSON, with hotspots as objects"""
+        return json.dumps(self.to_dict(), indent=indent)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'CostReport':
+        data = json.loads(text)
+        data['hotspots'] = [Hotspot(**hotspot)
+                            for hotspot in data['hotspots']]
+        return cls(**data)
+
+    def exceeds(self, baseline: 'CostReport',
+                tolerance: float = 0.05) -> bool:
+        """Check if the cost per block grew past a baseline
+
+        Parameters
+        ----------
+        baseline : CostReport
+            an earlier report, such as one read with ``from_json``
+
+        tolerance : float, optional
+            the allowed relative increase
+        """
+        return self.cost_per_block > \
+            baseline.cost_per_block * (1 + tolerance)
+
+
+def object_cost(text: str, block_size: int,
+                costs: Mapping[str, Cost]) -> float:
+    """Get the work per sample of a tilde object"""
+    name = text.split(' ', 1)[0]
+    cost = costs.get(name)
+    if cost is None:
+        cost = DEFAULT_SIGNAL_COST
+    elif callable(cost):
+        cost = cost(block_size)
+    if name == 'expr~':
+        expression = text[len(name):]
+        cost += EXPR_OPERATOR_COST * sum(
+            expression.count(operator) for operator in EXPR_OPERATORS)
+    return cost
+
+
+def iter_costs(patch: Patch, path: str, copies: int, block_size: int,
+               costs: Mapping[str, Cost],
+               totals: Dict[str, int]) -> Iterator[Hotspot]:
+    """Yield the estimated cost of each object in a patch and its
+    subpatches"""
+    fanout = collections.Counter()
+    signal_inputs = collections.Counter()
+    nodes = patch.nodes
+    signal_outlets = {}
+    for index, node in enumerate(nodes):
+        if isinstance(node, Subpatch):
+            ports = Ports(node.src)
+            signal_outlets[index] = [port not in ports.control_outlets
+                                     for port in ports.outlets]
+    totals['connections'] += len(patch.connections) * copies
+    for c in patch.connections:
+        fanout[c.source] += 1
+        if c.source in signal_outlets:
+            outlets = signal_outlets[c.source]
+            signal = c.outlet_index < len(outlets) and \
+                outlets[c.outlet_index]
+        else:
+            source_name = object_name(nodes[c.source])
+            signal = source_name is not None and source_name.endswith('~')
+        if signal:
+            signal_inputs[(c.sink, c.inlet_index)] += 1
+    # Pd adds the signals connected to one inlet
+    summing = collections.Counter()
+    for (sink, _), count in signal_inputs.items():
+        summing[sink] += count - 1
+    prefix = path + '/' if path else ''
+    for index, node in enumerate(nodes):
+        if isinstance(node, Clone):
+            yield from iter_costs(node.src, prefix + node.name,
+                                  copies * node.count, block_size, costs,
+                                  totals)
+        if isinstance(node, Subpatch):
+            yield from iter_costs(node.src, prefix + node.name, copies,
+                                  block_size, costs, totals)
+            continue
+        name = object_name(node)
+        if name is None:
+            continue
+        signal = name.endswith('~')
+        cost = summing[index] * block_size
+        if signal:
+            totals['signal_objects'] += copies
+            cost += object_cost(node.text, block_size, costs) * block_size
+            cost += OBJECT_OVERHEAD
+        else:
+            totals['control_objects'] += copies
+        yield Hotspot(path, index, node.text, signal, copies, cost * copies,
+                      fanout[index])
+
+
+def cost_report(patch: Patch, block_size: int = 64,
+                sample_rate: int = 44100,
+                costs: Optional[Mapping[str, Cost]] = None,
+                top: Optional[int] = 20) -> CostReport:
+    """Estimate the DSP cost of a patch, see ``Patch.cost_report``"""
+    table = dict(DEFAULT_COSTS)
+    if costs is not None:
+        table.update(costs)
+    totals = collections.Counter()
+    hotspots: List[Hotspot] = list(
+        iter_costs(patch, '', 1, block_size, table, totals))
+    total = sum(hotspot.cost_per_block for hotspot in hotspots)
+    hotspots.sort(key=hotspot_key)
+    if top is not None:
+        hotspots = hotspots[:top]
+    return CostReport(block_size, sample_rate, total,
+                      total * sample_rate / block_size,
+                      totals['signal_objects'], totals['control_objects'],
+                      totals['connections'], hotspots)
+
+
+def hotspot_key(hotspot: Hotspot) -> Tuple[float, int, str, int]:
+    return (-hotspot.cost_per_block, -hotspot.fanout, hotspot.path,
+            hotspot.index)
@@ -0,0 +1,352 @@
+from typing import List, Optional, Set
+import collections
+import copy
+
+from .api import Node, Array, Clone, Subpatch, Connection, Obj, Patch, escape
+from .columnar import ColumnarNode
+from .optimize import node_text, parse_float
+
+DspReport = collections.namedtuple(
+    'DspReport', ['dsp_objects_before', 'dsp_objects_after',
+                  'inlined_subpatches', 'fused_chains'])
+
+PORTS = frozenset(['inlet', 'inlet~', 'outlet', 'outlet~'])
+# objects whose behaviour depends on being in their own canvas
+CANVAS_LOCAL = frozenset(['loadbang', 'block~', 'switch~', 'namecanvas'])
+SIGNAL_OPERATORS = {'*~': '*', '+~': '+', '-~': '-', '/~': '/'}
+# older versions of expr~ accept at most 9 inlets
+MAX_EXPR_INLETS = 9
+
+
+def object_name(node: Node) -> Optional[str]:
+    kind, text = node_text(node)
+    if kind != 'obj':
+        return None
+    return text.split(' ', 1)[0]
+
+
+def is_signal_source(node: Node) -> bool:
+    name = object_name(node)
+    return name is not None and name.endswith('~')
+
+
+def count_dsp_objects(patch: Patch) -> int:
+    """Count the tilde objects in a patch and the patches it contains
+
+    Subpatches are counted once per use, and clone abstractions once per
+    copy.
+    """
+    count = 0
+    for node in patch.nodes:
+        if isinstance(node, Clone):
+            count += 1 + node.count * count_dsp_objects(node.src)
+        elif isinstance(node, Subpatch):
+            count += count_dsp_objects(node.src)
+        else:
+            name = object_name(node)
+            if name is not None and name.endswith('~'):
+                count += 1
+    return count
+
+
+def moved_copy(node: Node, x_offset: int, y_offset: int) -> Node:
+    """Copy a node from a subpatch into its parent"""
+    if isinstance(node, ColumnarNode):
+        node = node.detach()
+    else:
+        node = copy.copy(node)
+        # outlet handles belong to the original node
+        node._outlets = None
+    if not node.hidden:
+        node.x_pos += x_offset
+        node.y_pos += y_offset
+    return node
+
+
+class Ports:
+    """The inlet and outlet objects of a subpatch, in Pd's order"""
+
+    def __init__(self, src: Patch):
+        self.indices = set()
+        inlets = []
+        outlets = []
+        for index, node in enumerate(src.nodes):
+            name = object_name(node)
+            if name in PORTS:
+                self.indices.add(index)
+                ports = inlets if name.startswith('inlet') else outlets
+                ports.append((node.x_pos, index, name))
+        # Pd numbers a subpatch's inlets and outlets from left to right
+        inlets.sort()
+        outlets.sort()
+        self.inlets = [index for _, index, _ in inlets]
+        self.outlets = [index for _, index, _ in outlets]
+        self.signal_inlets = {number for number, (_, _, name)
+                              in enumerate(inlets) if name == 'inlet~'}
+        self.control_outlets = {index for _, index, name in outlets
+                                if name == 'outlet'}
+
+
+def can_inline(src: Patch, ports: Ports) -> bool:
+    """Check that inlining a subpatch keeps its behaviour
+
+    Subpatches with arrays, objects tied to their canvas, or control
+    fan-out whose order would change are kept.
+    """
+    for node in src.nodes:
+        if isinstance(node, Array) or object_name(node) in CANVAS_LOCAL:
+            return False
+    fanout = collections.Counter(
+        (c.source, c.outlet_index) for c in src.connections)
+    control_inlets = {index for number, index in enumerate(ports.inlets)
+                      if number not in ports.signal_inlets}
+    for c in src.connections:
+        if c.source in ports.indices and c.sink in ports.indices:
+            return False
+        if c.source in control_inlets and fanout[(c.source, 0)] > 1:
+            return False
+        if c.sink in ports.control_outlets and \
+                fanout[(c.source, c.outlet_index)] > 1:
+            return False
+    return True
+
+
+def inline_subpatches(patch: Patch, done: Set[int]) -> int:
+    """Replace subpatches with their contents, starting with the deepest
+
+    Returns the number of subpatches inlined.
+    """
+    if id(patch) in done:
+        return 0
+    done.add(id(patch))
+    count = 0
+    nodes = list(patch.nodes)
+    for node in nodes:
+        if isinstance(node, (Subpatch, Clone)):
+            count += inline_subpatches(node.src, done)
+
+    connections = list(patch.connections)
+    signal_sources = collections.defaultdict(list)
+    for c in connections:
+        signal_sources[(c.sink, c.inlet_index)].append(
+            is_signal_source(nodes[c.source]))
+    new_nodes = []
+    renumbered = {}
+    # for each inlined subpatch, the inner endpoints of each inlet and
+    # outlet
+    inlet_sinks = {}
+    outlet_sources = {}
+    inner_connections = []
+    for index, node in enumerate(nodes):
+        if isinstance(node, Subpatch):
+            src = node.src
+            ports = Ports(src)
+            # floats sent to a signal inlet are converted by the inlet~
+            signal_only = all(
+                all(signal_sources[(index, number)])
+                for number in ports.signal_inlets)
+            if signal_only and can_inline(src, ports):
+                inner = {}
+                for inner_index, inner_node in enumerate(src.nodes):
+                    if inner_index not in ports.indices:
+                        inner[inner_index] = len(new_nodes)
+                        new_nodes.append(moved_copy(
+                            inner_node, node.x_pos, node.y_pos))
+                sinks = {port: [] for port in ports.inlets}
+                sources = {port: [] for port in ports.outlets}
+                for c in src.connections:
+                    if c.source in sinks:
+                        sinks[c.source].append((inner[c.sink], c.inlet_index))
+                    elif c.sink in sources:
+                        sources[c.sink].append(
+                            (inner[c.source], c.outlet_index))
+                    else:
+                        inner_connections.append(Connection(
+                            inner[c.source], c.outlet_index, inner[c.sink],
+                            c.inlet_index))
+                inlet_sinks[index] = [sinks[port] for port in ports.inlets]
+                outlet_sources[index] = [sources[port]
+                                         for port in ports.outlets]
+                count += 1
+                continue
+        renumbered[index] = len(new_nodes)
+        new_nodes.append(node)
+    if not inlet_sinks:
+        return count
+
+    new_connections = []
+    for c in connections:
+        if c.source in outlet_sources:
+            ports = outlet_sources[c.source]
+            sources = ports[c.outlet_index] \
+                if c.outlet_index < len(ports) else []
+        else:
+            sources = [(renumbered[c.source], c.outlet_index)]
+        if c.sink in inlet_sinks:
+            ports = inlet_sinks[c.sink]
+            sinks = ports[c.inlet_index] if c.inlet_index < len(ports) else []
+        else:
+            sinks = [(renumbered[c.sink], c.inlet_index)]
+        for source, outlet_index in sources:
+            for sink, inlet_index in sinks:
+                new_connections.append(
+                    Connection(source, outlet_index, sink, inlet_index))
+    new_connections.extend(inner_connections)
+    patch.replace_graph(new_nodes, new_connections)
+    return count
+
+
+class SignalChain:
+    """Builds the expression for a chain of arithmetic tilde objects"""
+
+    def __init__(self):
+        self.members = []
+        self.expression = '$v1'
+        # the outside sources connected to each inlet of the expr~
+        self.inlets = [[]]
+
+    def add_operand(self, sources: List[Connection],
+                    signal: bool) -> Optional[str]:
+        if len(self.inlets) >= MAX_EXPR_INLETS:
+            return None
+        self.inlets.append(sources)
+        return '${}{}'.format('v' if signal else 'f', len(self.inlets))
+
+
+def fuse_signal_chains(patch: Patch) -> int:
+    """Replace linear chains of ``*~``, ``+~``, ``-~`` and ``/~`` objects
+    with one ``expr~``
+
+    Returns the number of chains fused.
+    """
+    nodes = list(patch.nodes)
+    connections = list(patch.connections)
+    incoming = collections.defaultdict(list)
+    by_source = collections.defaultdict(list)
+    for c in connections:
+        incoming[(c.sink, c.inlet_index)].append(c)
+        by_source[c.source].append(c)
+    operators = {}
+    for index, node in enumerate(nodes):
+        kind, text = node_text(node)
+        if kind == 'obj':
+            args = text.split(' ')
+            if args[0] in SIGNAL_OPERATORS and len(args) <= 2:
+                operators[index] = args
+
+    def next_member(index: int) -> Optional[int]:
+        """Get the operator that takes all of this one's output"""
+        outputs = by_source[index]
+        if not outputs or any(c.outlet_index != 0 for c in outputs):
+            return None
+        sink = outputs[0].sink
+        if sink not in operators or any(c.sink != sink for c in outputs) \
+                or len(incoming[(sink, 0)]) != 1 or \
+                incoming[(sink, 0)][0].source != index:
+            return None
+        return sink
+
+    def extend(chain: SignalChain, index: int) -> bool:
+        """Add an operator to the chain, if its operand can be written"""
+        args = operators[index]
+        operator = SIGNAL_OPERATORS[args[0]]
+        right = incoming[(index, 1)]
+        previous = chain.members[-1] if chain.members else None
+        if len(args) == 2:
+            value = parse_float(args[1])
+            if value is None or right or (operator == '/' and value == 0):
+                return False
+            operand = args[1] if value >= 0 else '(' + args[1] + ')'
+        elif not right or operator == '/':
+            # an unconnected signal inlet is zero, and division by a
+            # signal differs for zero divisors
+            return False
+        else:
+            signal = [is_signal_source(nodes[c.source]) for c in right]
+            # using the chain's value twice would compute it twice
+            if any(c.source == previous for c in right) or \
+                    any(signal) != all(signal):
+                return False
+            operand = chain.add_operand(right, signal[0])
+            if operand is None:
+                return False
+        chain.expression = '({} {} {})'.format(
+            chain.expression, operator, operand)
+        chain.members.append(index)
+        return True
+
+    has_previous = {sink for sink in map(next_member, operators)
+                    if sink is not None}
+    chains = []
+    for start in operators:
+        if start in has_previous:
+            continue
+        index = start
+        chain = None
+        while index is not None:
+            if chain is None:
+                left = incoming[(index, 0)]
+                if left and all(is_signal_source(nodes[c.source])
+                                for c in left):
+                    chain = SignalChain()
+                    chain.inlets[0] = left
+                    if not extend(chain, index):
+                        chain = None
+            elif not extend(chain, index):
+                if len(chain.members) > 1:
+                    chains.append(chain)
+                chain = None
+                continue
+            index = next_member(index)
+        if chain is not None and len(chain.members) > 1:
+            chains.append(chain)
+    if not chains:
+        return 0
+
+    removed = set()
+    replaced = {}
+    new_connections = []
+    for chain in chains:
+        first, last = chain.members[0], chain.members[-1]
+        removed.update(chain.members[:-1])
+        x_pos, y_pos = nodes[first].position
+        # the outer parentheses are not needed
+        replaced[last] = Obj.from_saved(
+            x_pos, y_pos, 'expr~ ' + escape(chain.expression[1:-1]))
+        for inlet_index, sources in enumerate(chain.inlets):
+            for c in sources:
+                new_connections.append(Connection(
+                    c.source, c.outlet_index, last, inlet_index))
+    members = removed.union(replaced)
+    kept = [c for c in connections
+            if c.source not in removed and c.sink not in members]
+    renumbered = {}
+    new_nodes = []
+    for index, node in enumerate(nodes):
+        if index not in removed:
+            renumbered[index] = len(new_nodes)
+            new_nodes.append(replaced.get(index, node))
+    patch.replace_graph(new_nodes, [
+        Connection(renumbered[c.source], c.outlet_index,
+                   renumbered[c.sink], c.inlet_index)
+        for c in kept + new_connections])
+    return len(chains)
+
+
+def optimize_dsp(patch: Patch) -> DspReport:
+    """Inline subpatches and fuse signal chains, see
+    ``Patch.optimize_dsp``"""
+    before = count_dsp_objects(patch)
+    inlined = inline_subpatches(patch, set())
+    fused = 0
+    seen = set()
+    stack = [patch]
+    while stack:
+        current = stack.pop()
+        fused += fuse_signal_chains(current)
+        for node in current.nodes:
+            if isinstance(node, (Subpatch, Clone)) and \
+                    id(node.src) not in seen:
+                seen.add(id(node.src))
+                stack.append(node.src)
+    return DspReport(before, count_dsp_objects(patch), inlined, fused)
@@ -0,0 +1,247 @@
+from typing import Dict, Iterator, List, Set, Tuple
+import collections
+
+from .api import Node, Connection, Patch
+
+# a node and one of its inlet numbers
+Inlet = Tuple[Node, int]
+
+
+class PatchEditor:
+    """Batched edits to a patch's graph, see ``Patch.edit``
+
+    Nodes are tracked by their position when the editor was made, and
+    nodes added by the editor get positions after the last one. Each
+    position has sets of its incoming and outgoing connections, so
+    removing, replacing and inserting nodes costs time in the number of
+    connections of the nodes involved. Connections keep their order,
+    which sets the order of fan-out. Nothing changes in the patch until
+    ``apply`` renumbers the nodes in one pass, and the patch's creators
+    raise ``RuntimeError`` until then.
+    """
+    patch: Patch
+    edges: Dict[int, List[int]]
+    outgoing: Dict[int, Set[int]]
+    incoming: Dict[int, Set[int]]
+
+    def __init__(self, patch: Patch):
+        self.patch = patch
+        # the graph being edited, since reading the patch's would apply
+        # pending edits
+        self.nodes = patch.nodes
+        self.lookup = patch.index_lookup()
+        self.count = len(self.nodes)
+        self.added: List[Node] = []
+        self.replaced: Dict[int, Node] = {}
+        self.removed: Set[int] = set()
+        # nodes added or swapped in by the editor
+        self.positions: Dict[Node, int] = {}
+        self.edges = {}
+        self.outgoing = collections.defaultdict(set)
+        self.incoming = collections.defaultdict(set)
+        edges = self.edges
+        outgoing = self.outgoing
+        incoming = self.incoming
+        for edge, (source, outlet_index, sink, inlet_index) in enumerate(
+                zip(*patch.edge_columns())):
+            edges[edge] = [source, outlet_index, sink, inlet_index]
+            outgoing[source].add(edge)
+            incoming[sink].add(edge)
+        self.next_edge = len(edges)
+        self.applied = False
+
+    def __enter__(self) -> 'PatchEditor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            if not self.applied:
+                self.apply()
+        else:
+            # the edits are dropped, and the patch can change again
+            self.release()
+
+    def release(self) -> None:
+        patch = self.patch
+        if patch.editor is self:
+            patch.editor = None
+            patch.edits_pending = False
+
+    def position(self, node: Node) -> int:
+        """Get the position of a node that is in the edited graph
+
+        Raises
+        ------
+        ValueError
+            if the node is not in the patch, or was removed or replaced
+        """
+        position = self.positions.get(node)
+        if position is None:
+            position = self.lookup(node)
+            if position >= self.count:
+                raise ValueError(
+                    '{} was created after the editor; add it with the '
+                    'editor instead'.format(type(node).__name__))
+            if position in self.replaced:
+                raise ValueError('{} was replaced'.format(
+                    type(node).__name__))
+        if position in self.removed:
+            raise ValueError('{} was removed from the patch'.format(
+                type(node).__name__))
+        return position
+
+    def add(self, node: Node) -> int:
+        """Add a node that is not in the patch, or get its position"""
+        if node not in self.positions:
+            try:
+                self.lookup(node)
+            except ValueError:
+                position = self.count + len(self.added)
+                self.added.append(node)
+                self.positions[node] = position
+                return position
+        return self.position(node)
+
+    def add_edge(self, source: int, outlet_index: int, sink: int,
+                 inlet_index: int) -> int:
+        edge = self.next_edge
+        self.next_edge += 1
+        self.edges[edge] = [source, outlet_index, sink, inlet_index]
+        self.outgoing[source].add(edge)
+        self.incoming[sink].add(edge)
+        return edge
+
+    def remove_edge(self, edge: int) -> None:
+        source, _, sink, _ = self.edges.pop(edge)
+        self.outgoing[source].discard(edge)
+        self.incoming[sink].discard(edge)
+
+    def find_edges(self, outlet: Node.Outlet, inlet: Inlet) -> List[int]:
+        source = self.position(outlet.owner)
+        sink = self.position(inlet[0])
+        return [edge for edge in self.outgoing[source]
+                if self.edges[edge][1:] == [outlet.index, sink, inlet[1]]]
+
+    def connect(self, outlet: Node.Outlet, inlet: Inlet) -> None:
+        """Connect an outlet to an inlet, adding new nodes to the patch
+
+        Parameters
+        ----------
+        outlet : Node.Outlet
+            the source, such as ``node[0]``
+
+        inlet : tuple of Node and int
+            the sink and its inlet number
+        """
+        self.add_edge(self.add(outlet.owner), outlet.index,
+                      self.add(inlet[0]), inlet[1])
+
+    def disconnect(self, outlet: Node.Outlet, inlet: Inlet) -> int:
+        """Remove the connections from an outlet to an inlet
+
+        Returns
+        -------
+        count : int
+            the number of connections removed
+        """
+        edges = self.find_edges(outlet, inlet)
+        for edge in edges:
+            self.remove_edge(edge)
+        return len(edges)
+
+    def remove(self, node: Node) -> None:
+        """Remove a node and its connections"""
+        position = self.position(node)
+        for edge in list(self.outgoing.pop(position, ())):
+            self.remove_edge(edge)
+        for edge in list(self.incoming.pop(position, ())):
+            self.remove_edge(edge)
+        self.removed.add(position)
+
+    def replace(self, old: Node, new: Node) -> None:
+        """Put a node that is not in the patch in place of another
+
+        The new node takes the old one's connections, with the same inlet
+        and outlet numbers, and its place in the node order.
+        """
+        position = self.position(old)
+        try:
+            if new not in self.positions:
+                self.lookup(new)
+        except ValueError:
+            pass
+        else:
+            raise ValueError('{} is already in the patch'.format(
+                type(new).__name__))
+        if position < self.count:
+            self.replaced[position] = new
+        else:
+            self.added[position - self.count] = new
+        self.positions.pop(old, None)
+        self.positions[new] = position
+
+    def insert_between(self, outlet: Node.Outlet, inlet: Inlet, node: Node,
+                       node_inlet: int = 0, node_outlet: int = 0) -> None:
+        """Route the connections from an outlet to an inlet through a node
+
+        The connection into the node keeps the place of the old one in
+        the outlet's fan-out order.
+
+        Parameters
+        ----------
+        outlet : Node.Outlet
+            the source of the existing connection
+
+        inlet : tuple of Node and int
+            the sink of the existing connection, and its inlet number
+
+        node : Node
+            the node to insert, which is added to the patch if needed
+
+        node_inlet, node_outlet : int, optional
+            the inlet and outlet of the inserted node to use
+
+        Raises
+        ------
+        ValueError
+            if the outlet is not connected to the inlet
+        """
+        edges = self.find_edges(outlet, inlet)
+        if not edges:
+            raise ValueError('the outlet is not connected to the inlet')
+        position = self.add(node)
+        sink = self.position(inlet[0])
+        for edge in sorted(edges):
+            self.incoming[sink].discard(edge)
+            self.edges[edge][2:] = [position, node_inlet]
+            self.incoming[position].add(edge)
+        self.add_edge(position, node_outlet, sink, inlet[1])
+
+    def iter_nodes(self) -> Iterator[Tuple[int, Node]]:
+        """Yield the position and node of everything left in the graph"""
+        nodes = self.nodes
+        for position in range(self.count):
+            if position not in self.removed:
+                node = self.replaced.get(position)
+                yield position, nodes[position] if node is None else node
+        for offset, node in enumerate(self.added):
+            position = self.count + offset
+            if position not in self.removed:
+                yield position, node
+
+    def apply(self) -> None:
+        """Renumber the nodes and replace the patch's graph"""
+        if self.applied:
+            raise RuntimeError('the edits were already applied')
+        self.release()
+        numbers = {}
+        nodes = []
+        for position, node in self.iter_nodes():
+            numbers[position] = len(nodes)
+            nodes.append(node)
+        self.patch.replace_graph(nodes, [
+            Connection(numbers[source], outlet_index, numbers[sink],
+                       inlet_index)
+            for source, outlet_index, sink, inlet_index
+            in self.edges.values()])
+        self.applied = True
@@ -0,0 +1,207 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import collections
+import contextlib
+import functools
+import sys
+import time
+
+from . import api
+from .api import Patch, SubpatchCache, TextNode
+
+Timing = collections.namedtuple('Timing', ['count', 'seconds'])
+
+# the functions timed for each phase, as (owner, attribute) pairs
+PHASES = {
+    'resolve_position': [(Patch, 'resolve_position')],
+    'escape': [(api, 'escape')],
+    'add_connections': [(Patch, 'add_connections'),
+                        (Patch, 'add_connections_many')],
+    'size': [(TextNode, 'measure')],
+    'serialize': [(Patch, '__str__'), (Patch, 'write_to')],
+}
+# creators timed per node type
+CREATORS = {
+    'create_obj': 'obj', 'create_msg': 'msg',
+    'create_floatatom': 'floatatom', 'create_subpatch': 'subpatch',
+    'create_clone': 'clone', 'create_array': 'array',
+    'create_obj_many': 'obj', 'create_msg_many': 'msg',
+}
+
+_active: Optional['Instrumentation'] = None
+
+
+class Counter:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+class Instrumentation:
+    """Call counts and times of the compile pipeline, see ``instrument``
+
+    ``phases`` is keyed by phase name, ``node_types`` by creator name,
+    such as ``'obj'``, and ``depths`` by subpatch depth, starting at 1
+    for the subpatches of the patch being serialized. Phase and node type
+    times include the phases they call; depth times do not include
+    deeper subpatches.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Counter] = collections.defaultdict(Counter)
+        self.node_types: Dict[str, Counter] = \
+            collections.defaultdict(Counter)
+        self.depths: Dict[int, Counter] = collections.defaultdict(Counter)
+        self.depth = 0
+        # time spent in deeper subpatches during each open body
+        self.child_seconds: List[float] = []
+        self.originals: List[Tuple[object, str, object]] = []
+
+    def timings(self) -> Dict[str, Dict]:
+        """Get the counters as ``Timing`` tuples"""
+        return {
+            'phases': {key: Timing(c.count, c.seconds)
+                       for key, c in self.phases.items()},
+            'node_types': {key: Timing(c.count, c.seconds)
+                           for key, c in self.node_types.items()},
+            'depths': {key: Timing(c.count, c.seconds)
+                       for key, c in sorted(self.depths.items())},
+        }
+
+    def metrics(self) -> Iterator[Tuple[str, float]]:
+        """Yield flat ``(name, value)`` pairs, such as
+        ``('phase.escape.seconds', 0.12)``, for a metrics system"""
+        for group, prefix in ((self.phases, 'phase'),
+                              (self.node_types, 'node_type'),
+                              (self.depths, 'depth')):
+            for key, counter in group.items():
+                name = '{}.{}.'.format(prefix, key)
+                yield name + 'count', counter.count
+                yield name + 'seconds', counter.seconds
+
+    def timed(self, function: Callable, counter: Counter) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter.seconds += time.perf_counter() - start
+                counter.count += 1
+        return wrapper
+
+    def timed_body(self, function: Callable) -> Callable:
+        """Time a subpatch body generator by depth, and its outermost
+        calls as the ``subpatch_str`` phase"""
+        phase = self.phases['subpatch_str']
+
+        @functools.wraps(function)
+        def wrapper(cache, patch):
+            depth = self.depth + 1
+            counter = self.depths[depth]
+            counter.count += 1
+            if depth == 1:
+                phase.count += 1
+            lines = function(cache, patch)
+            while True:
+                self.depth = depth
+                self.child_seconds.append(0.0)
+                start = time.perf_counter()
+                try:
+                    line = next(lines)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed = time.perf_counter() - start
+                    children = self.child_seconds.pop()
+                    counter.seconds += elapsed - children
+                    if self.child_seconds:
+                        self.child_seconds[-1] += elapsed
+                    else:
+                        phase.seconds += elapsed
+                    self.depth = depth - 1
+                yield line
+        return wrapper
+
+    def replace(self, owner: object, name: str, wrapper: Callable) -> None:
+        self.originals.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, wrapper)
+
+    def install(self) -> None:
+        original_escape = api.escape
+        for phase, targets in PHASES.items():
+            for owner, name in targets:
+                self.replace(owner, name, self.timed(
+                    getattr(owner, name), self.phases[phase]))
+        # modules that imported escape by name
+        for module in list(sys.modules.values()):
+            if module is not api and getattr(module, '__name__', '') \
+                    .startswith(__package__ + '.') and \
+                    getattr(module, 'escape', None) is original_escape:
+                self.replace(module, 'escape', api.escape)
+        for cls in all_subclasses(Patch):
+            for name, node_type in CREATORS.items():
+                if name in cls.__dict__:
+                    self.replace(cls, name, self.timed(
+                        cls.__dict__[name], self.node_types[node_type]))
+            for phase, targets in PHASES.items():
+                for owner, name in targets:
+                    if owner is Patch and cls is not Patch and \
+                            name in cls.__dict__:
+                        self.replace(cls, name, self.timed(
+                            cls.__dict__[name], self.phases[phase]))
+            if 'text_size' in cls.__dict__:
+                self.replace(cls, 'text_size', self.timed(
+                    cls.__dict__['text_size'], self.phases['size']))
+        self.replace(SubpatchCache, 'iter_body',
+                     self.timed_body(SubpatchCache.iter_body))
+
+    def uninstall(self) -> None:
+        while self.originals:
+            owner, name, original = self.originals.pop()
+            setattr(owner, name, original)
+
+
+def all_subclasses(cls: type) -> List[type]:
+    found = [cls]
+    for subclass in cls.__subclasses__():
+        found.extend(all_subclasses(subclass))
+    return found
+
+
+@contextlib.contextmanager
+def instrument(callback: Optional[Callable[[Instrumentation], None]] = None
+               ) -> Iterator[Instrumentation]:
+    """Count calls and time the phases of building and serializing patches
+
+    The timed functions are replaced with wrappers only inside the
+    ``with`` block, so there is no cost when instrumentation is off. A
+    Patch binds its creators when it is made, so only patches made inside
+    the block are timed by node type. Not thread safe.
+
+    Parameters
+    ----------
+    callback : function, optional
+        called with the Instrumentation when the block exits, for
+        exporting ``instrumentation.metrics()``
+
+    Yields
+    ------
+    instrumentation : Instrumentation
+        the counters, updated while the block runs
+    """
+    global _active
+    if _active is not None:
+        raise RuntimeError('instrumentation is already enabled')
+    instrumentation = Instrumentation()
+    _active = instrumentation
+    try:
+        # inside the try, so a partial install is undone
+        instrumentation.install()
+        yield instrumentation
+    finally:
+        instrumentation.uninstall()
+        _active = None
+    if callback is not None:
+        callback(instrumentation)
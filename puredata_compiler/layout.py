@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional, Tuple
+import collections
+
+from .api import Patch
+from .dsp import object_name
+
+# Pd numbers the inlets and outlets of a subpatch or abstraction by the x
+# order of these objects, control and signal ports together
+PORT_GROUPS = {'inlet': 0, 'inlet~': 0, 'outlet': 1, 'outlet~': 1}
+
+
+def back_edges(count: int, successors: List[List[int]]) -> set:
+    """Find edges that close cycles, with an iterative depth-first search
+
+    Returns a set of ``(source, sink)`` pairs. Removing them leaves a
+    graph without cycles.
+    """
+    NEW, ACTIVE, DONE = 0, 1, 2
+    state = bytearray(count)
+    found = set()
+    for root in range(count):
+        if state[root] != NEW:
+            continue
+        state[root] = ACTIVE
+        stack = [(root, iter(successors[root]))]
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state[child] == NEW:
+                    state[child] = ACTIVE
+                    stack.append((child, iter(successors[child])))
+                    break
+                if state[child] == ACTIVE:
+                    found.add((node, child))
+            else:
+                state[node] = DONE
+                stack.pop()
+    return found
+
+
+def assign_layers(count: int, successors: List[List[int]]) -> List[int]:
+    """Put each node one layer below the deepest node sending to it"""
+    in_degree = [0] * count
+    for children in successors:
+        for child in children:
+            in_degree[child] += 1
+    layers = [0] * count
+    queue = collections.deque(i for i in range(count) if in_degree[i] == 0)
+    while queue:
+        node = queue.popleft()
+        next_layer = layers[node] + 1
+        for child in successors[node]:
+            if layers[child] < next_layer:
+                layers[child] = next_layer
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                queue.append(child)
+    return layers
+
+
+def keep_port_order(row: List[int], groups: Dict[int, int],
+                    original: Dict[int, Tuple[int, int]]) -> None:
+    """Put the port objects of a row back in their original x order,
+    in the places the row's order gives to each group"""
+    slots = collections.defaultdict(list)
+    for position, node in enumerate(row):
+        group = groups.get(node)
+        if group is not None:
+            slots[group].append(position)
+    for positions in slots.values():
+        ports = sorted((row[position] for position in positions),
+                       key=original.__getitem__)
+        for position, node in zip(positions, ports):
+            row[position] = node
+
+
+def order_by_barycenter(rows: List[List[int]], neighbors: List[List[int]],
+                        rank: List[float], groups: Dict[int, int],
+                        original: Dict[int, Tuple[int, int]]) -> None:
+    """Sort each row by the mean rank of each node's neighbors
+
+    Nodes without neighbors keep their rank. ``rank`` is updated as rows
+    are sorted, so each row sees the new order of the rows before it.
+    Port objects keep their original order, see ``keep_port_order``.
+    """
+    for row in rows:
+        keys = {}
+        for node in row:
+            linked = neighbors[node]
+            if linked:
+                keys[node] = sum(rank[other] for other in linked) / \
+                    len(linked)
+            else:
+                keys[node] = rank[node]
+        row.sort(key=keys.__getitem__)
+        if groups:
+            keep_port_order(row, groups, original)
+        for position, node in enumerate(row):
+            rank[node] = position
+
+
+def auto_layout(patch: Patch, x_spacing: int = 20, y_spacing: int = 25,
+                max_width: Optional[int] = 2000, sweeps: int = 2,
+                origin: Tuple[int, int] = (25, 25)) -> None:
+    """Place nodes in layers by depth, see ``Patch.auto_layout``"""
+    nodes = patch.nodes
+    visible = [index for index, node in enumerate(nodes) if not node.hidden]
+    local = {index: position for position, index in enumerate(visible)}
+    count = len(visible)
+    successors = [[] for _ in range(count)]
+    for c in patch.connections:
+        source = local.get(c.source)
+        sink = local.get(c.sink)
+        if source is not None and sink is not None and source != sink:
+            successors[source].append(sink)
+    cycles = back_edges(count, successors)
+    if cycles:
+        successors = [[child for child in children
+                       if (node, child) not in cycles]
+                      for node, children in enumerate(successors)]
+    layers = assign_layers(count, successors)
+
+    # ports keep their x order, which sets the parent's port numbers, so
+    # each group shares a row: inlets have no inputs and are in the first
+    # layer, and outlets are moved to the last
+    groups = {}
+    original = {}
+    for node, index in enumerate(visible):
+        group = PORT_GROUPS.get(object_name(nodes[index]))
+        if group is not None:
+            groups[node] = group
+            original[node] = (nodes[index].position[0], index)
+    last_layer = max(layers, default=0)
+    for node, group in groups.items():
+        if group == 1:
+            layers[node] = last_layer
+
+    rows = [[] for _ in range(max(layers, default=-1) + 1)]
+    for node, layer in enumerate(layers):
+        rows[layer].append(node)
+    for row in rows:
+        keep_port_order(row, groups, original)
+    predecessors = [[] for _ in range(count)]
+    for node, children in enumerate(successors):
+        for child in children:
+            predecessors[child].append(node)
+    rank = [0.0] * count
+    for row in rows:
+        for position, node in enumerate(row):
+            rank[node] = position
+    for _ in range(sweeps):
+        order_by_barycenter(rows[1:], predecessors, rank, groups,
+                            original)
+        order_by_barycenter(rows[-2::-1], successors, rank, groups,
+                            original)
+
+    sizes = [nodes[index].size for index in visible]
+    positions = {}
+    x_origin, y_pos = origin
+    for row in rows:
+        x_pos = x_origin
+        height = 0
+        # wrapping before a port would put it left of the ones before it
+        last_port = max((position for position, node in enumerate(row)
+                         if node in groups), default=-1)
+        for position, node in enumerate(row):
+            width, node_height = sizes[node]
+            if max_width is not None and x_pos > x_origin and \
+                    position > last_port and \
+                    x_pos + width > x_origin + max_width:
+                # wrap wide layers onto more lines
+                x_pos = x_origin
+                y_pos += height + y_spacing
+                height = 0
+            positions[visible[node]] = (x_pos, y_pos)
+            x_pos += width + x_spacing
+            height = max(height, node_height)
+        y_pos += height + y_spacing
+    patch.move_nodes(positions)
@@ -0,0 +1,389 @@
+from typing import Dict, List, Optional, Set, Tuple
+import collections
+import struct
+
+from .api import Node, Obj, Msg, Clone, Subpatch, Connection, Patch
+from .columnar import ColumnarNode, OBJ, MSG
+
+OptimizeReport = collections.namedtuple(
+    'OptimizeReport',
+    ['removed_objects', 'removed_connections', 'folded_messages'])
+
+# objects that only send output in response to input, and do nothing else
+PURE_CONTROL = frozenset([
+    'f', 'float', 'i', 'int', 't', 'trigger', '+', '-', '*', '/', 'max',
+    'min', '==', '!=', '>', '<', '>=', '<=', 'mod', 'div', 'pow', 'abs',
+    'sqrt', 'exp', 'log', 'wrap', 'clip', 'mtof', 'ftom', 'dbtorms',
+    'rmstodb', 'dbtopow', 'powtodb', 'pack', 'unpack', 'sel', 'select',
+    'route', 'moses', 'spigot', 'swap', 'change', 'list'])
+# signal objects without side effects, which run whether or not they have
+# input
+PURE_SIGNAL = frozenset([
+    '+~', '-~', '*~', '/~', 'max~', 'min~', 'clip~', 'wrap~', 'abs~',
+    'sqrt~', 'exp~', 'log~', 'pow~', 'mtof~', 'ftom~', 'dbtorms~',
+    'rmstodb~', 'osc~', 'phasor~', 'cos~', 'noise~', 'sig~', 'line~',
+    'vline~', 'lop~', 'hip~', 'bp~', 'vcf~', 'samphold~', 'snapshot~'])
+
+BINARY_OPERATORS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b if b != 0 else 0.0,
+    'max': max,
+    'min': min,
+    '==': lambda a, b: float(a == b),
+    '!=': lambda a, b: float(a != b),
+    '>': lambda a, b: float(a > b),
+    '<': lambda a, b: float(a < b),
+    '>=': lambda a, b: float(a >= b),
+    '<=': lambda a, b: float(a <= b),
+}
+FLOAT_STORES = {'f': float, 'float': float, 'i': int, 'int': int}
+TRIGGER_OUTPUTS = {'b': 'b', 'bang': 'b', 'f': 'f', 'float': 'f',
+                   'a': 'a', 'anything': 'a'}
+# events simulated while folding one message, to give up on loops
+MAX_EVENTS = 1000
+FLOAT32 = struct.Struct('f')
+
+
+class FoldError(Exception):
+    """The chain after a message cannot be resolved at compile time"""
+
+
+def node_text(node: Node) -> Tuple[Optional[str], str]:
+    """Get the kind of a node, ``'obj'``, ``'msg'`` or None, and its text
+    """
+    if isinstance(node, ColumnarNode):
+        kind = node.kind
+        if kind == OBJ:
+            return ('obj', node.text)
+        if kind == MSG:
+            return ('msg', node.text)
+    elif isinstance(node, Msg):
+        return ('msg', node.text)
+    elif isinstance(node, Obj) and not isinstance(node, Clone):
+        return ('obj', node.text)
+    return (None, '')
+
+
+def parse_float(atom: str) -> Optional[float]:
+    try:
+        value = float(atom)
+    except ValueError:
+        return None
+    if atom.lower() in ('nan', 'inf', '-inf', '+inf', 'infinity'):
+        return None
+    return to_float32(value)
+
+
+def to_float32(value: float) -> float:
+    return FLOAT32.unpack(FLOAT32.pack(value))[0]
+
+
+def format_float(value: float) -> Optional[str]:
+    """Format a float as Pd saves it, or None if that loses precision"""
+    text = '%g' % value
+    if to_float32(float(text)) != value:
+        return None
+    return text
+
+
+class ChainSimulator:
+    """Runs the objects after a constant message, as Pd would"""
+
+    def __init__(self, texts: Dict[int, str],
+                 outgoing: Dict[Tuple[int, int], List[Connection]],
+                 members: Set[int]):
+        self.texts = texts
+        self.outgoing = outgoing
+        self.members = members
+        self.state = {}
+        self.events = []
+        self.count = 0
+        for index in members:
+            self.state[index] = initial_state(texts[index])
+
+    def run(self, source: int, message) -> List[tuple]:
+        self.events = []
+        self.emit(source, 0, message)
+        return self.events
+
+    def emit(self, index: int, outlet: int, message) -> None:
+        for c in self.outgoing.get((index, outlet), ()):
+            self.send(c.sink, c.inlet_index, message)
+
+    def send(self, index: int, inlet: int, message) -> None:
+        self.count += 1
+        if self.count > MAX_EVENTS:
+            raise FoldError('too many events')
+        if index not in self.members:
+            self.events.append((index, inlet, message))
+            return
+        args = self.texts[index].split(' ')
+        name = args[0]
+        state = self.state[index]
+        if name in FLOAT_STORES:
+            if message != 'bang':
+                state[0] = to_float32(FLOAT_STORES[name](message))
+            if inlet == 0:
+                self.emit(index, 0, state[0])
+            elif message == 'bang':
+                raise FoldError('bang to the right inlet')
+        elif name in BINARY_OPERATORS:
+            if message != 'bang':
+                state[inlet] = message
+            elif inlet != 0:
+                raise FoldError('bang to the right inlet')
+            if inlet == 0:
+                self.emit(index, 0, to_float32(
+                    BINARY_OPERATORS[name](state[0], state[1])))
+        else:
+            # trigger, which outputs from right to left
+            if inlet != 0:
+                raise FoldError('trigger has one inlet')
+            outputs = [TRIGGER_OUTPUTS[arg] for arg in args[1:]]
+            for outlet in reversed(range(len(outputs))):
+                output = outputs[outlet]
+                if output == 'b':
+                    self.emit(index, outlet, 'bang')
+                elif output == 'a' or message != 'bang':
+                    self.emit(index, outlet, message)
+                else:
+                    raise FoldError('bang to a float outlet')
+
+
+def initial_state(text: str) -> list:
+    args = text.split(' ')
+    name = args[0]
+    initial = parse_float(args[1]) if len(args) > 1 else 0.0
+    if name in FLOAT_STORES:
+        return [to_float32(FLOAT_STORES[name](initial))]
+    if name in BINARY_OPERATORS:
+        return [0.0, initial]
+    return []
+
+
+def is_foldable(text: str) -> bool:
+    """Check if the simulator supports an object"""
+    args = text.split(' ')
+    name = args[0]
+    if name in FLOAT_STORES or name in BINARY_OPERATORS:
+        return len(args) == 1 or (len(args) == 2 and
+                                  parse_float(args[1]) is not None)
+    if name in ('t', 'trigger'):
+        return len(args) > 1 and all(arg in TRIGGER_OUTPUTS
+                                     for arg in args[1:])
+    return False
+
+
+def parse_message(text: str):
+    if text == 'bang':
+        return 'bang'
+    if ' ' in text:
+        return None
+    return parse_float(text)
+
+
+class GraphOptimizer:
+    """Dead-object elimination and constant folding for one patch graph"""
+
+    def __init__(self, patch: Patch):
+        self.patch = patch
+        self.nodes = list(patch.nodes)
+        self.connections = list(patch.connections)
+        self.kinds = {}
+        self.texts = {}
+        for index, node in enumerate(self.nodes):
+            kind, text = node_text(node)
+            if kind is not None:
+                self.kinds[index] = kind
+                self.texts[index] = text
+        self.removed = set()
+        self.new_texts = {}
+
+    def fold_constants(self) -> int:
+        """Resolve chains of objects that only receive a constant message
+
+        The objects after a message box are simulated, with two sends to
+        check that their state settles. If they produce a single message
+        for one node outside the chain, the message box sends that message
+        to the node directly, and the chain is removed. Chains never
+        share objects, so they are all found in the original graph.
+        """
+        removed = self.removed
+        if removed:
+            self.connections = [c for c in self.connections
+                                if c.source not in removed
+                                and c.sink not in removed]
+        incoming = collections.defaultdict(list)
+        outgoing = collections.defaultdict(list)
+        by_source = collections.defaultdict(list)
+        for c in self.connections:
+            incoming[c.sink].append(c)
+            outgoing[(c.source, c.outlet_index)].append(c)
+            by_source[c.source].append(c)
+        replaced = {}
+        for index, kind in self.kinds.items():
+            if kind != 'msg' or index in removed:
+                continue
+            message = parse_message(self.texts[index])
+            if message is None:
+                continue
+            members = self.find_chain(index, incoming, outgoing, by_source)
+            if not members:
+                continue
+            simulator = ChainSimulator(self.texts, outgoing, members)
+            try:
+                events = simulator.run(index, message)
+                settled = {k: list(v) for k, v in simulator.state.items()}
+                repeated = simulator.run(index, message)
+            except FoldError:
+                continue
+            if events != repeated or settled != simulator.state or \
+                    len(events) != 1:
+                continue
+            sink, inlet_index, result = events[0]
+            text = 'bang' if result == 'bang' else format_float(result)
+            if text is None or sink == index:
+                continue
+            self.new_texts[index] = text
+            self.removed.update(members)
+            replaced[index] = Connection(index, 0, sink, inlet_index)
+        if replaced:
+            connections = [c for c in self.connections
+                           if c.source not in replaced
+                           and c.source not in removed
+                           and c.sink not in removed]
+            connections.extend(replaced.values())
+            self.connections = connections
+        return len(replaced)
+
+    def find_chain(self, source: int, incoming, outgoing,
+                   by_source) -> Set[int]:
+        """Get the objects that only receive messages from a message box
+
+        Every outlet involved must have at most one connection, so that
+        the order of the simulated messages is the order in Pd.
+        """
+        first = by_source[source]
+        if len(first) != 1:
+            return set()
+        members = set()
+        candidates = [first[0].sink]
+        while candidates:
+            added = []
+            for candidate in candidates:
+                if candidate in members or candidate == source or \
+                        self.kinds.get(candidate) != 'obj' or \
+                        not is_foldable(self.texts[candidate]):
+                    continue
+                if all(c.source == source or c.source in members
+                       for c in incoming[candidate]):
+                    members.add(candidate)
+                    added.append(candidate)
+            if added:
+                # retry every sink, since later members may feed earlier
+                # candidates
+                candidates = [c.sink for member in members
+                              for c in by_source[member]]
+            else:
+                candidates = []
+        for member in members:
+            for c in by_source[member]:
+                if len(outgoing[(member, c.outlet_index)]) > 1:
+                    return set()
+        return members
+
+    def is_removable(self, index: int) -> bool:
+        kind = self.kinds.get(index)
+        if kind == 'msg':
+            return '\\;' not in self.texts[index]
+        if kind == 'obj':
+            name = self.texts[index].split(' ', 1)[0]
+            return name in PURE_CONTROL or name in PURE_SIGNAL
+        return False
+
+    def eliminate_dead(self) -> None:
+        """Remove side-effect-free nodes whose output can not be used
+
+        A removable node is dead if none of its outlets are connected to
+        a live node. Control objects are also dead if no live node sends
+        to them, since they only act on input. Message boxes can be
+        clicked, so they are kept as long as their output is used.
+        """
+        removed = self.removed
+        incoming = collections.defaultdict(set)
+        outgoing = collections.defaultdict(set)
+        for c in self.connections:
+            incoming[c.sink].add(c.source)
+            outgoing[c.source].add(c.sink)
+        pending = [index for index in range(len(self.nodes))
+                   if index not in removed and self.is_removable(index)]
+        while pending:
+            index = pending.pop()
+            if index in removed:
+                continue
+            dead = not outgoing[index]
+            if not dead and self.kinds[index] == 'obj':
+                name = self.texts[index].split(' ', 1)[0]
+                dead = name in PURE_CONTROL and not incoming[index]
+            if not dead:
+                continue
+            removed.add(index)
+            for sink in outgoing.pop(index, ()):
+                incoming[sink].discard(index)
+                if self.is_removable(sink):
+                    pending.append(sink)
+            for source in incoming.pop(index, ()):
+                outgoing[source].discard(index)
+                if self.is_removable(source):
+                    pending.append(source)
+
+    def apply(self) -> Tuple[int, int]:
+        """Write the remaining nodes and connections back to the patch"""
+        renumbered = {}
+        nodes = []
+        for index, node in enumerate(self.nodes):
+            if index in self.removed:
+                continue
+            renumbered[index] = len(nodes)
+            text = self.new_texts.get(index)
+            if text is not None:
+                if isinstance(node, Msg):
+                    node.text = text
+                else:
+                    node = Msg.from_saved(*node.position, text)
+            nodes.append(node)
+        connections = [
+            Connection(renumbered[c.source], c.outlet_index,
+                       renumbered[c.sink], c.inlet_index)
+            for c in self.connections
+            if c.source in renumbered and c.sink in renumbered]
+        removed_connections = len(self.patch.connections) - len(connections)
+        if self.removed or self.new_texts:
+            self.patch.replace_graph(nodes, connections)
+        return len(self.removed), removed_connections
+
+
+def optimize(patch: Patch) -> OptimizeReport:
+    """Optimize a patch and the patches it contains, see
+    ``Patch.optimize``"""
+    removed_objects = removed_connections = folded = 0
+    seen = set()
+    stack = [patch]
+    while stack:
+        current = stack.pop()
+        optimizer = GraphOptimizer(current)
+        # unused branches are removed first, since they block folding
+        optimizer.eliminate_dead()
+        folded += optimizer.fold_constants()
+        optimizer.eliminate_dead()
+        objects, connections = optimizer.apply()
+        removed_objects += objects
+        removed_connections += connections
+        for node in current.nodes:
+            if isinstance(node, (Subpatch, Clone)) and \
+                    id(node.src) not in seen:
+                seen.add(id(node.src))
+                stack.append(node.src)
+    return OptimizeReport(removed_objects, removed_connections, folded)
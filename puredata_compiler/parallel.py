@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Mapping, Optional
+
+from .api import Patch, Subpatch, write_file
+
+
+def build_and_write(filename: str, factory: Callable[[], Patch]) -> str:
+    write_file(filename, factory())
+    return filename
+
+
+def serialize_body(patch: Patch) -> str:
+    return patch.subpatch_str()
+
+
+def compile_many(targets: Mapping[str, Callable[[], Patch]],
+                 processes: Optional[int] = None) -> List[str]:
+    """Build and write several patches in a process pool
+
+    Parameters
+    ----------
+    targets : mapping of str to function
+        for each output path, a function that returns the Patch to write.
+        The functions are sent to worker processes, so they must be
+        defined at module level.
+
+    processes : int, optional
+        the number of worker processes, by default one per CPU. With 1,
+        everything runs in this process.
+
+    Returns
+    -------
+    filenames : list of str
+        the files written, in the order of ``targets``
+    """
+    if processes == 1 or len(targets) <= 1:
+        return [build_and_write(filename, factory)
+                for filename, factory in targets.items()]
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(build_and_write, targets.keys(),
+                             targets.values()))
+
+
+def serialize_parallel(patch: Patch, processes: Optional[int] = None) -> str:
+    """Serialize a patch, writing its top-level subpatches in a process
+    pool
+
+    Each distinct Patch used as a top-level subpatch is serialized once
+    by a worker, and the results are joined in order, so the text is the
+    same as ``str(patch)``. Subpatches are told apart by identity, so
+    nothing is serialized in this process before the workers start.
+    """
+    sources: Dict[int, Patch] = {}
+    for node in patch.nodes:
+        if isinstance(node, Subpatch):
+            sources.setdefault(id(node.src), node.src)
+    if len(sources) <= 1 or processes == 1:
+        return str(patch)
+    keys = list(sources)
+    with ProcessPoolExecutor(processes) as pool:
+        bodies = dict(zip(keys, pool.map(serialize_body,
+                                         [sources[k] for k in keys])))
+
+    def emit_subpatch(node: Subpatch) -> Iterator[str]:
+        yield node.canvas_line
+        yield bodies[id(node.src)]
+        yield node.restore_line()
+
+    return ''.join(patch.iter_lines(emit_subpatch))
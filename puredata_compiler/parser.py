@@ -0,0 +1,173 @@
+from typing import BinaryIO, Iterator, List, Type, Union, TextIO
+from array import array
+import mmap
+import re
+
+from .api import Patch, Obj, Msg, FloatAtom, Subpatch, Array
+
+# a record runs up to the first semicolon that is not escaped
+RECORD_PATTERN = re.compile(rb'\s*([^;\\]*(?:\\.[^;\\]*)*);', re.S)
+# whitespace that Pd may write between atoms, where this package writes a
+# space, such as the line breaks in long records
+LINE_BREAK_PATTERN = re.compile(r' *[\t\r\n]\s*')
+
+
+def iter_records(data: Union[bytes, mmap.mmap]) -> Iterator[str]:
+    """Yield the records of a patch file, without their semicolons, and
+    with line breaks and tabs between atoms as spaces"""
+    end = 0
+    for match in RECORD_PATTERN.finditer(data):
+        end = match.end()
+        record = match.group(1).decode('utf-8')
+        if '\n' in record or '\t' in record or '\r' in record:
+            record = LINE_BREAK_PATTERN.sub(' ', record)
+        yield record
+    if data[end:].strip():
+        raise ValueError('Unterminated record at offset {}'.format(end))
+
+
+def parse(fileobj: Union[BinaryIO, TextIO],
+          patch_class: Type[Patch] = Patch) -> Patch:
+    """Read a patch from an open file
+
+    Parameters
+    ----------
+    fileobj : file object
+        the patch file. Files backed by a descriptor are memory-mapped
+        instead of being read into memory.
+
+    patch_class : type, optional
+        the Patch class to create for the patch and its subpatches
+
+    Returns
+    -------
+    patch : Patch
+        the loaded patch
+
+    Notes
+    -----
+    Only the records written by this package are supported: ``#N canvas``,
+    ``#X obj``, ``msg``, ``floatatom``, ``array``, ``connect`` and
+    ``restore``, and ``#A`` array contents. Canvas sizes and fonts are not
+    kept, so patches saved by Pd are written back with this package's
+    canvas headers. Line breaks in records become spaces, and the label
+    position and font size of Pd's floatatoms are dropped.
+    """
+    try:
+        fileno = fileobj.fileno()
+    except (AttributeError, OSError):
+        fileno = None
+    if fileno is not None:
+        try:
+            data = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped
+            data = b''
+    else:
+        data = fileobj.read()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+    records = iter_records(data)
+    try:
+        return build_patch(records, patch_class)
+    finally:
+        # the suspended generator holds a view of the map
+        records.close()
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+
+def load(filename: str, patch_class: Type[Patch] = Patch) -> Patch:
+    """Read a patch from a file, see ``parse``"""
+    with open(filename, 'rb') as fp:
+        return parse(fp, patch_class)
+
+
+def build_patch(records: Iterator[str], patch_class: Type[Patch]) -> Patch:
+    stack: List[Patch] = []
+    patch = None
+    for record in records:
+        fields = record.split(' ', 4)
+        if len(fields) < 2:
+            raise ValueError('Unsupported record: {!r}'.format(record))
+        head, tag = fields[0], fields[1]
+        if head == '#N' and tag == 'canvas':
+            if patch is not None:
+                stack.append(patch)
+            patch = patch_class()
+            continue
+        if patch is None:
+            raise ValueError('Patch must start with #N canvas, got '
+                             '{!r}'.format(record))
+        if head == '#A':
+            add_array_values(patch, record)
+            continue
+        if head != '#X':
+            raise ValueError('Unsupported record: {!r}'.format(record))
+        if tag == 'obj' or tag == 'msg':
+            node_class = Obj if tag == 'obj' else Msg
+            patch.append_saved(node_class, int(fields[2]), int(fields[3]),
+                               fields[4] if len(fields) > 4 else '')
+        elif tag == 'connect':
+            sink, inlet_index = fields[4].split(' ')
+            source, sink = int(fields[2]), int(sink)
+            count = len(patch.nodes)
+            if not (0 <= source < count and 0 <= sink < count):
+                raise ValueError('Connection to a missing node: '
+                                 '{!r}'.format(record))
+            patch.append_connection(source, int(fields[3]), sink,
+                                    int(inlet_index))
+        elif tag == 'floatatom':
+            values = record.split(' ')[2:]
+            if len(values) in (9, 10):
+                # Pd writes the label position after the limits, and
+                # since 0.52 a font size at the end
+                values = values[:5] + values[6:9]
+            if len(values) != 8:
+                raise ValueError('Unsupported floatatom: {!r}'.format(record))
+            patch.append_node(FloatAtom(*map(int, values[:5]), *values[5:]))
+        elif tag == 'array':
+            name, length, element_type, save_flag = record.split(' ')[2:]
+            patch.append_node(Array(name, int(length), element_type,
+                                    int(save_flag)))
+        elif tag == 'restore':
+            if not stack or len(fields) < 5 or not fields[4].startswith('pd '):
+                raise ValueError('Unsupported restore: {!r}'.format(record))
+            child = patch
+            continue_layout(child)
+            patch = stack.pop()
+            patch.append_node(Subpatch(int(fields[2]), int(fields[3]),
+                                       fields[4][3:], child))
+        else:
+            raise ValueError('Unsupported record: {!r}'.format(record))
+    if patch is None:
+        raise ValueError('Empty patch file')
+    if stack:
+        raise ValueError('Subpatch is missing its #X restore record')
+    continue_layout(patch)
+    return patch
+
+
+def add_array_values(patch: Patch, record: str) -> None:
+    """Store the values of an ``#A`` record in the preceding array"""
+    node = patch.nodes[-1] if patch.nodes else None
+    if not isinstance(node, Array):
+        raise ValueError('#A record without an array: {!r}'.format(
+            record[:40]))
+    values = record.split()
+    start = int(values[1])
+    if node.data is None:
+        node.data = array('f')
+    if start != len(node.data):
+        raise ValueError('#A record for {} starts at {}, expected '
+                         '{}'.format(node.name, start, len(node.data)))
+    node.data.extend(map(float, values[2:]))
+
+
+def continue_layout(patch: Patch) -> None:
+    """Place the next created node after the last visible loaded node"""
+    for node in reversed(patch.nodes):
+        if not node.hidden:
+            patch.row_head = node
+            patch.row_tail = node
+            return
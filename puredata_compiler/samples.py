@@ -0,0 +1,118 @@
+from array import array
+import ast
+import mmap
+import os
+import struct
+import sys
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+NPY_MAGIC = b'\x93NUMPY'
+# .npy dtypes that map onto a native memoryview format
+NPY_FORMATS = {'f4': 'f', 'f8': 'd', 'i1': 'b', 'u1': 'B', 'i2': 'h',
+               'u2': 'H', 'i4': 'i', 'u4': 'I', 'i8': 'q', 'u8': 'Q'}
+
+
+def load_samples(filename: str, channel: int = 0) -> memoryview:
+    """Memory-map the samples of a ``.npy`` or ``.wav`` file
+
+    Parameters
+    ----------
+    filename : str
+        a ``.npy`` file with a little-endian numeric array, or a ``.wav``
+        file with 16 or 32-bit PCM or 32-bit float samples
+
+    channel : int, optional
+        the channel to read from a multi-channel ``.wav`` file
+
+    Returns
+    -------
+    samples : memoryview
+        a view of the file, which stays mapped while the view is in use.
+        PCM samples are scaled to floats from -1 to 1, which needs a copy.
+    """
+    with open(filename, 'rb') as fp:
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    if view[:6] == NPY_MAGIC:
+        return npy_samples(view)
+    if view[:4] == b'RIFF' and view[8:12] == b'WAVE':
+        return wav_samples(view, channel)
+    raise ValueError('{} is not a .npy or .wav file'.format(
+        os.path.basename(filename)))
+
+
+def npy_samples(view: memoryview) -> memoryview:
+    major = view[6]
+    if major == 1:
+        header_size, = struct.unpack_from('<H', view, 8)
+        offset = 10
+    else:
+        header_size, = struct.unpack_from('<I', view, 8)
+        offset = 12
+    header = ast.literal_eval(
+        bytes(view[offset:offset + header_size]).decode('latin1'))
+    descr = header['descr']
+    byte_order, code = descr[0], descr[1:]
+    if code not in NPY_FORMATS or byte_order not in '<|' or (
+            byte_order == '<' and sys.byteorder != 'little'):
+        raise ValueError('Unsupported .npy dtype {!r}'.format(descr))
+    count = 1
+    for dimension in header['shape']:
+        count *= dimension
+    if header['fortran_order'] and len(header['shape']) > 1:
+        raise ValueError('Fortran-ordered .npy arrays are not supported')
+    start = offset + header_size
+    end = start + count * int(code[1])
+    return view[start:end].cast(NPY_FORMATS[code])
+
+
+def wav_samples(view: memoryview, channel: int) -> memoryview:
+    position = 12
+    fmt = None
+    while position + 8 <= len(view):
+        chunk_id = bytes(view[position:position + 4])
+        chunk_size, = struct.unpack_from('<I', view, position + 4)
+        start = position + 8
+        if chunk_id == b'fmt ':
+            fmt = struct.unpack_from('<HHIIHH', view, start)
+            if fmt[0] == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # the real format is the start of the sub-format GUID
+                fmt = struct.unpack_from('<H', view, start + 24) + fmt[1:]
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('.wav data chunk comes before fmt chunk')
+            end = min(start + chunk_size, len(view))
+            return wav_data(view[start:end], fmt, channel)
+        # chunks are padded to an even size
+        position = start + chunk_size + (chunk_size & 1)
+    raise ValueError('.wav file has no data chunk')
+
+
+def wav_data(data: memoryview, fmt: tuple, channel: int) -> memoryview:
+    format_tag, channels, _, _, block_align, bits = fmt
+    if not 0 <= channel < channels:
+        raise ValueError('Channel {} is out of range for a {}-channel '
+                         '.wav file'.format(channel, channels))
+    if sys.byteorder != 'little':
+        raise ValueError('.wav files are only mapped on little-endian '
+                         'machines')
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        code = 'f'
+    elif format_tag == WAVE_FORMAT_PCM and bits in (16, 32):
+        code = 'h' if bits == 16 else 'i'
+    else:
+        raise ValueError('Unsupported .wav format {} with {} bits'.format(
+            format_tag, bits))
+    count = len(data) // block_align
+    samples = data[:count * block_align].cast(code)[channel::channels]
+    if code == 'f':
+        return samples
+    scale = 1 / (1 << (bits - 1))
+    result = array('f')
+    step = 1 << 16
+    for start in range(0, len(samples), step):
+        result.extend(
+            [value * scale for value in samples[start:start + step].tolist()])
+    return memoryview(result)
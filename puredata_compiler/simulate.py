@@ -0,0 +1,643 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import collections
+import heapq
+import math
+import re
+
+from .api import FloatAtom, Patch
+from .analysis import GraphIndex, NodeRef
+from .optimize import (BINARY_OPERATORS, FLOAT32, node_text, parse_float,
+                       to_float32)
+
+# a float message is a float, and any other message is a tuple of its
+# selector and atoms, such as ('bang',), ('list', 1.0, 2.0) or
+# ('symbol', 'foo')
+Message = Union[float, tuple]
+Atom = Union[float, str]
+# receives a message at an inlet number
+Handler = Callable[[int, Message], None]
+# the inlets connected to an outlet, in the order the connections were made
+Targets = List[Tuple[Handler, int]]
+Dollar = collections.namedtuple('Dollar', ['number'])
+DollarSymbol = collections.namedtuple('DollarSymbol', ['text'])
+
+BANG = ('bang',)
+TRIGGER_KINDS = {'b': 'b', 'bang': 'b', 'f': 'f', 'float': 'f',
+                 'a': 'a', 'anything': 'a', 'l': 'l', 'list': 'l',
+                 's': 's', 'symbol': 's'}
+DOLLAR_PATTERN = re.compile(r'\\\$(\d+)')
+
+
+class SimulationError(Exception):
+    """A message that Pd would reject, or a loop that overflows the stack"""
+
+
+def ignore(inlet: int, message: Message) -> None:
+    pass
+
+
+def float_value(message: Message) -> float:
+    if type(message) is float:
+        return message
+    if message[0] == 'list' and len(message) > 1 and \
+            type(message[1]) is float:
+        return message[1]
+    raise SimulationError('no method for {!r}'.format(message[0]))
+
+
+def atom_value(message: Message) -> Atom:
+    """Get the float or symbol in a message to a storing inlet"""
+    if type(message) is float:
+        return message
+    if message[0] in ('symbol', 'list') and len(message) > 1:
+        return message[1]
+    raise SimulationError('no method for {!r}'.format(message[0]))
+
+
+def to_atoms(message: Message) -> List[Atom]:
+    """Get the atoms that ``$1``, ``$2``, ... stand for"""
+    if type(message) is float:
+        return [message]
+    selector = message[0]
+    if selector == 'bang':
+        return []
+    if selector in ('list', 'symbol'):
+        return list(message[1:])
+    return list(message)
+
+
+def make_message(atoms: Sequence[Atom]) -> Message:
+    if not atoms:
+        return BANG
+    if type(atoms[0]) is float:
+        if len(atoms) == 1:
+            return atoms[0]
+        return ('list',) + tuple(atoms)
+    return tuple(atoms)
+
+
+def parse_atom(token: str) -> Atom:
+    value = parse_float(token)
+    return token if value is None else value
+
+
+def from_python(atoms: Sequence[Union[int, float, str]]) -> Message:
+    return make_message([atom if isinstance(atom, str)
+                         else to_float32(float(atom)) for atom in atoms])
+
+
+def format_message(message: Message) -> str:
+    """Format a message as Pd's print object shows it"""
+    if type(message) is float:
+        return '%g' % message
+    atoms = list(message)
+    if atoms[0] == 'list' and len(atoms) > 1 and type(atoms[1]) is float:
+        del atoms[0]
+    return ' '.join('%g' % atom if type(atom) is float else atom
+                    for atom in atoms)
+
+
+def compile_message(text: str) -> List[Tuple[Optional[str], list]]:
+    """Split a message box into its messages and their receiver names
+
+    A receiver name of None is the box's outlet.
+    """
+    segments = []
+    target = None
+    atoms: list = []
+    expect_target = False
+    for token in text.split():
+        if token == '\\,':
+            segments.append((target, atoms))
+            atoms = []
+        elif token == '\\;':
+            segments.append((target, atoms))
+            atoms = []
+            expect_target = True
+        elif expect_target:
+            target = token
+            expect_target = False
+        else:
+            match = DOLLAR_PATTERN.fullmatch(token)
+            if match:
+                atoms.append(Dollar(int(match.group(1))))
+            elif '\\$' in token:
+                atoms.append(DollarSymbol(token))
+            else:
+                atoms.append(parse_atom(token))
+    segments.append((target, atoms))
+    return [(target, atoms) for target, atoms in segments if atoms]
+
+
+def substitute(template: list, args: List[Atom]) -> Message:
+    atoms = []
+    for atom in template:
+        if type(atom) is Dollar:
+            number = atom.number
+            # $0 and missing arguments are 0, as in a Pd message box
+            atoms.append(args[number - 1]
+                         if 0 < number <= len(args) else 0.0)
+        elif type(atom) is DollarSymbol:
+            def replace(match):
+                number = int(match.group(1))
+                if 0 < number <= len(args):
+                    value = args[number - 1]
+                    return value if type(value) is str else '%g' % value
+                return '0'
+            atoms.append(parse_atom(DOLLAR_PATTERN.sub(replace, atom.text)))
+        else:
+            atoms.append(atom)
+    return make_message(atoms)
+
+
+def message_box(sim: 'Simulator', node_id: int, text: str) -> Handler:
+
+    def compile_plan(segments):
+        plan = []
+        for target, template in segments:
+            targets = sim.outlet(node_id, 0) if target is None \
+                else sim.receiver(target)
+            if any(type(atom) in (Dollar, DollarSymbol)
+                   for atom in template):
+                plan.append((targets, None, template))
+            else:
+                plan.append((targets, make_message(template), None))
+        return plan
+
+    plan = compile_plan(compile_message(text))
+
+    def handler(inlet: int, message: Message) -> None:
+        nonlocal plan
+        if type(message) is not float and message[0] == 'set':
+            plan = compile_plan([(None, list(message[1:]))]
+                                if len(message) > 1 else [])
+            return
+        args = None
+        for targets, output, template in plan:
+            if output is None:
+                if args is None:
+                    args = to_atoms(message)
+                output = substitute(template, args)
+            for receive, receive_inlet in targets:
+                receive(receive_inlet, output)
+    return handler
+
+
+def passthrough(sim: 'Simulator', node_id: int, args: List[str]
+                ) -> Handler:
+    targets = sim.outlet(node_id, 0)
+
+    def handler(inlet: int, message: Message) -> None:
+        for receive, receive_inlet in targets:
+            receive(receive_inlet, message)
+    return handler
+
+
+def bang(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    targets = sim.outlet(node_id, 0)
+
+    def handler(inlet: int, message: Message) -> None:
+        for receive, receive_inlet in targets:
+            receive(receive_inlet, BANG)
+    return handler
+
+
+def trigger(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    kinds = []
+    for arg in args or ['a', 'a']:
+        kind = TRIGGER_KINDS.get(arg)
+        if kind is None:
+            raise SimulationError('trigger: unsupported type {}'.format(arg))
+        kinds.append(kind)
+    # outlets are sent from right to left
+    plan = [(kinds[outlet], sim.outlet(node_id, outlet))
+            for outlet in reversed(range(len(kinds)))]
+
+    def handler(inlet: int, message: Message) -> None:
+        for kind, targets in plan:
+            if kind == 'a':
+                output = message
+            elif kind == 'b':
+                output = BANG
+            elif kind == 'f':
+                output = 0.0 if message == BANG else float_value(message)
+            elif kind == 'l':
+                output = message if type(message) is tuple and \
+                    message[0] == 'list' else \
+                    ('list',) + tuple(to_atoms(message))
+            else:
+                output = ('symbol', atom_value(message))
+            for receive, receive_inlet in targets:
+                receive(receive_inlet, output)
+    return handler
+
+
+def float_store(sim: 'Simulator', node_id: int, args: List[str],
+                truncate: bool = False) -> Handler:
+    value = parse_float(args[0]) if args else 0.0
+    if value is None:
+        value = 0.0
+    targets = sim.outlet(node_id, 0)
+
+    def handler(inlet: int, message: Message) -> None:
+        nonlocal value
+        if inlet:
+            value = float_value(message)
+        elif type(message) is float:
+            value = message
+        elif message[0] == 'set':
+            value = float_value(('list',) + message[1:])
+            return
+        elif message[0] != 'bang':
+            value = float_value(message)
+        if truncate and math.isfinite(value):
+            # inf and nan have no integer part, and are kept as they are
+            value = float(int(value))
+        if inlet:
+            return
+        # every connection gets this value, even if one of them stores a
+        # new one through the right inlet
+        output = value
+        for receive, receive_inlet in targets:
+            receive(receive_inlet, output)
+    return handler
+
+
+def int_store(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    return float_store(sim, node_id, args, truncate=True)
+
+
+def binary(sim: 'Simulator', node_id: int, args: List[str],
+           operator: Callable[[float, float], float]) -> Handler:
+    left = 0.0
+    right = (parse_float(args[0]) if args else None) or 0.0
+    targets = sim.outlet(node_id, 0)
+    # to_float32, without the function call
+    pack_float = FLOAT32.pack
+    unpack_float = FLOAT32.unpack
+
+    def handler(inlet: int, message: Message) -> None:
+        nonlocal left, right
+        if inlet:
+            right = float_value(message)
+            return
+        if type(message) is float:
+            left = message
+        elif message[0] == 'list' and len(message) > 2:
+            right = float_value(('list',) + message[2:])
+            left = float_value(message)
+        elif message[0] != 'bang':
+            left = float_value(message)
+        output, = unpack_float(pack_float(operator(left, right)))
+        for receive, receive_inlet in targets:
+            receive(receive_inlet, output)
+    return handler
+
+
+def moses(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    threshold = (parse_float(args[0]) if args else None) or 0.0
+    low = sim.outlet(node_id, 0)
+    high = sim.outlet(node_id, 1)
+
+    def handler(inlet: int, message: Message) -> None:
+        nonlocal threshold
+        if inlet:
+            threshold = float_value(message)
+            return
+        value = float_value(message)
+        for receive, receive_inlet in low if value < threshold else high:
+            receive(receive_inlet, value)
+    return handler
+
+
+def pack(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    slots: List[Atom] = []
+    for arg in args or ['0', '0']:
+        if arg in ('s', 'symbol'):
+            slots.append('symbol')
+        elif arg in ('f', 'float'):
+            slots.append(0.0)
+        else:
+            value = parse_float(arg)
+            if value is None:
+                raise SimulationError('pack: unsupported type {}'.format(arg))
+            slots.append(value)
+    targets = sim.outlet(node_id, 0)
+
+    def handler(inlet: int, message: Message) -> None:
+        if inlet:
+            slots[inlet] = atom_value(message)
+            return
+        if type(message) is float:
+            slots[0] = message
+        elif message[0] != 'bang':
+            atoms = to_atoms(message)
+            slots[:len(atoms)] = atoms[:len(slots)]
+        output = ('list',) + tuple(slots)
+        for receive, receive_inlet in targets:
+            receive(receive_inlet, output)
+    return handler
+
+
+def unpack(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    # outlets are sent from right to left
+    plan = [sim.outlet(node_id, outlet)
+            for outlet in reversed(range(len(args) or 2))]
+    count = len(plan)
+
+    def handler(inlet: int, message: Message) -> None:
+        atoms = to_atoms(message)
+        for position in range(count - min(count, len(atoms)), count):
+            atom = atoms[count - 1 - position]
+            output = atom if type(atom) is float else ('symbol', atom)
+            for receive, receive_inlet in plan[position]:
+                receive(receive_inlet, output)
+    return handler
+
+
+def select(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    values = [parse_atom(arg) for arg in args or ['0']]
+    plan = [sim.outlet(node_id, outlet) for outlet in range(len(values))]
+    reject = sim.outlet(node_id, len(values))
+
+    def handler(inlet: int, message: Message) -> None:
+        value = atom_value(message)
+        if inlet:
+            values[0] = value
+            return
+        for outlet, match in enumerate(values):
+            if value == match:
+                for receive, receive_inlet in plan[outlet]:
+                    receive(receive_inlet, BANG)
+                return
+        for receive, receive_inlet in reject:
+            receive(receive_inlet, message)
+    return handler
+
+
+def route(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    values = [parse_atom(arg) for arg in args or ['0']]
+    plan = [sim.outlet(node_id, outlet) for outlet in range(len(values))]
+    reject = sim.outlet(node_id, len(values))
+
+    def handler(inlet: int, message: Message) -> None:
+        if inlet:
+            values[0] = atom_value(message)
+            return
+        if type(message) is float:
+            atoms = [message]
+        elif message[0] == 'list':
+            atoms = list(message[1:])
+        else:
+            atoms = list(message)
+        if atoms:
+            first = atoms[0]
+            for outlet, match in enumerate(values):
+                if first == match:
+                    output = make_message(atoms[1:])
+                    for receive, receive_inlet in plan[outlet]:
+                        receive(receive_inlet, output)
+                    return
+        for receive, receive_inlet in reject:
+            receive(receive_inlet, message)
+    return handler
+
+
+def send(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    targets = sim.receiver(args[0]) if args else None
+
+    def handler(inlet: int, message: Message) -> None:
+        nonlocal targets
+        if inlet:
+            targets = sim.receiver(atom_value(message))
+            return
+        for receive, receive_inlet in targets or ():
+            receive(receive_inlet, message)
+    return handler
+
+
+def receive(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    handler = passthrough(sim, node_id, args)
+    if args:
+        sim.receiver(args[0]).append((handler, 0))
+    return handler
+
+
+def delay(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    interval = (parse_float(args[0]) if args else None) or 0.0
+    targets = sim.outlet(node_id, 0)
+    # a new bang cancels the pending one, by changing the current token
+    token = 0
+
+    def fire(expected: int) -> None:
+        if expected == token:
+            for receive, receive_inlet in targets:
+                receive(receive_inlet, BANG)
+
+    def handler(inlet: int, message: Message) -> None:
+        nonlocal interval, token
+        if inlet:
+            interval = float_value(message)
+            return
+        token += 1
+        if type(message) is float:
+            interval = message
+        elif message[0] == 'stop':
+            return
+        elif message[0] != 'bang':
+            interval = float_value(message)
+        sim.schedule(max(interval, 0.0), fire, token)
+    return handler
+
+
+def print_message(sim: 'Simulator', node_id: int, args: List[str]
+                  ) -> Handler:
+    label = ' '.join(args) or 'print'
+    printed = sim.printed
+
+    def handler(inlet: int, message: Message) -> None:
+        printed.append((label, message))
+    return handler
+
+
+def loadbang(sim: 'Simulator', node_id: int, args: List[str]) -> Handler:
+    path = sim.index.paths[sim.index.path_ids[node_id]]
+    depth = path.count('/') + 1 if path else 0
+    sim.loadbangs.append((-depth, node_id))
+    return bang(sim, node_id, args)
+
+
+def make_binary(operator: Callable[[float, float], float]):
+    return lambda sim, node_id, args: binary(sim, node_id, args, operator)
+
+
+OBJECTS: Dict[str, Callable[['Simulator', int, List[str]], Handler]] = {
+    't': trigger, 'trigger': trigger,
+    'f': float_store, 'float': float_store,
+    'i': int_store, 'int': int_store,
+    'moses': moses,
+    'pack': pack,
+    'unpack': unpack,
+    'sel': select, 'select': select,
+    'route': route,
+    's': send, 'send': send,
+    'r': receive, 'receive': receive,
+    'delay': delay, 'del': delay,
+    'b': bang, 'bang': bang,
+    'print': print_message,
+    'loadbang': loadbang,
+    'inlet': passthrough, 'outlet': passthrough,
+}
+OBJECTS.update((name, make_binary(operator))
+               for name, operator in BINARY_OPERATORS.items())
+
+
+class Simulator:
+    """Runs the control objects of a patch without Pd, see
+    ``Patch.simulate``
+
+    Each node of the patch and its subpatches is compiled once into a
+    handler for the messages to its inlets, and each outlet into the list
+    of handlers it is connected to, in the order the connections were
+    made. Sending a message calls the handlers depth first, as Pd does,
+    so a loop that never goes through a delay overflows the stack like
+    it would in Pd. Delays are scheduled on a virtual clock, which only
+    moves in ``advance``.
+    """
+    index: GraphIndex
+    handlers: List[Handler]
+    printed: List[Tuple[str, Message]]
+    unsupported: List[NodeRef]
+    now: float
+
+    def __init__(self, patch: Patch):
+        self.index = GraphIndex(patch)
+        self.now = 0.0
+        self.queue: List[tuple] = []
+        self.sequence = 0
+        self.printed = []
+        self.unsupported = []
+        self.receivers: Dict[str, Targets] = {}
+        self.outlets: Dict[Tuple[int, int], Targets] = {}
+        self.loadbangs: List[Tuple[int, int]] = []
+        self.handlers = [self.compile(node_id)
+                         for node_id in range(len(self.index))]
+        self.connect()
+
+    def outlet(self, node_id: int, outlet_index: int) -> Targets:
+        targets = self.outlets.get((node_id, outlet_index))
+        if targets is None:
+            targets = self.outlets[(node_id, outlet_index)] = []
+        return targets
+
+    def receiver(self, name: str) -> Targets:
+        targets = self.receivers.get(name)
+        if targets is None:
+            targets = self.receivers[name] = []
+        return targets
+
+    def compile(self, node_id: int) -> Handler:
+        node = self.index.node(node_id)
+        kind, text = node_text(node)
+        if kind == 'msg':
+            return message_box(self, node_id, text)
+        if kind is None:
+            if isinstance(node, FloatAtom):
+                return float_store(self, node_id, [])
+            return ignore
+        args = text.split()
+        builder = OBJECTS.get(args[0]) if args else None
+        if builder is None:
+            if args and not args[0].endswith('~'):
+                self.unsupported.append(self.index.ref(node_id))
+            return ignore
+        return builder(self, node_id, args[1:])
+
+    def connect(self) -> None:
+        """Fill the outlets that the handlers use with their inlets"""
+        index = self.index
+        offsets = index.offsets
+        sinks = index.sinks
+        outlets = index.outlets
+        inlets = index.inlets
+        handlers = self.handlers
+        for node_id in range(len(index)):
+            for edge in range(offsets[node_id], offsets[node_id + 1]):
+                targets = self.outlets.get((node_id, outlets[edge]))
+                if targets is not None:
+                    targets.append((handlers[sinks[edge]], inlets[edge]))
+
+    def run(self, function: Callable, *args) -> None:
+        try:
+            function(*args)
+        except RecursionError:
+            raise SimulationError('stack overflow') from None
+
+    def send(self, name: str, *atoms: Union[int, float, str]) -> None:
+        """Send a message to the ``r`` objects with a name
+
+        ``send('note', 440, 0.8)`` sends the list ``440 0.8``, ``send(name)``
+        a bang and ``send(name, 'set', 3)`` the message ``set 3``.
+        """
+        message = from_python(atoms)
+
+        def deliver():
+            for receive, receive_inlet in self.receivers.get(name, ()):
+                receive(receive_inlet, message)
+        self.run(deliver)
+
+    def send_to(self, node: Union[NodeRef, Tuple[str, int]],
+                *atoms: Union[int, float, str], inlet: int = 0) -> None:
+        """Send a message to an inlet of a node, given as ``(path, index)``
+
+        Without atoms, this sends a bang, like clicking a message box.
+        """
+        handler = self.handlers[self.index.find(node[0], node[1])]
+        self.run(handler, inlet, from_python(atoms))
+
+    def loadbang(self) -> None:
+        """Bang every ``loadbang``, in subpatches before their parents"""
+        for _, node_id in sorted(self.loadbangs):
+            self.run(self.handlers[node_id], 0, BANG)
+
+    def schedule(self, interval: float, callback: Callable[[int], None],
+                 argument: int) -> None:
+        # the sequence number sends events at the same time in the order
+        # they were scheduled
+        heapq.heappush(self.queue, (self.now + interval, self.sequence,
+                                    callback, argument))
+        self.sequence += 1
+
+    def advance(self, milliseconds: float) -> None:
+        """Move the clock forward, running the delays that come due"""
+        end = self.now + milliseconds
+        queue = self.queue
+        while queue and queue[0][0] <= end:
+            self.now, _, callback, argument = heapq.heappop(queue)
+            self.run(callback, argument)
+        self.now = end
+
+    def watch(self, name: str) -> List[Message]:
+        """Get a list that collects the messages sent to a name"""
+        return self.collect(self.receiver(name))
+
+    def probe(self, node: Union[NodeRef, Tuple[str, int]],
+              outlet: int = 0) -> List[Message]:
+        """Get a list that collects the messages from an outlet of a node,
+        given as ``(path, index)``"""
+        return self.collect(self.outlet(
+            self.index.find(node[0], node[1]), outlet))
+
+    @staticmethod
+    def collect(targets: Targets) -> List[Message]:
+        messages: List[Message] = []
+
+        def handler(inlet: int, message: Message) -> None:
+            messages.append(message)
+        targets.append((handler, 0))
+        return messages
+
+    def printed_lines(self) -> List[str]:
+        """Get the printed messages as Pd's console shows them"""
+        return ['{}: {}'.format(label, format_message(message))
+                for label, message in self.printed]
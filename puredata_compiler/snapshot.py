@@ -0,0 +1,306 @@
+from array import array
+from typing import Dict, List, Tuple
+import collections.abc
+import mmap
+import os
+import pickle
+import struct
+import sys
+
+from .api import Node, Obj, Msg, FloatAtom, Subpatch, Clone, Patch
+from .build import temporary_file
+from .columnar import ColumnarPatch, OBJ, MSG, FLOATATOM, OTHER
+from .parser import continue_layout
+
+MAGIC = b'PDSNAP\0\0'
+VERSION = 1
+# magic, version, byte order, blob count, patch count, root patch
+HEADER = struct.Struct('<8sHcxIII')
+# for each patch: node, connection and stored object counts, then the
+# file offsets of its columns
+PATCH_RECORD = struct.Struct('<3I9Q')
+# for each stored object: node index, type, name blob, clone count,
+# child patch and pickle blob
+OBJECT_FIELDS = 6
+SUBPATCH, CLONE, PICKLED = 0, 1, 2
+BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+DEFAULT_FLOATATOM = '#X floatatom {} {} 5 0 0 - - -;\n'
+
+
+class Blobs(collections.abc.Sequence):
+    """Strings in a snapshot's blob table, decoded on access"""
+
+    def __init__(self, offsets: memoryview, data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return str(self.data[self.offsets[index]:self.offsets[index + 1]],
+                   'utf-8')
+
+    def raw(self, index: int) -> bytes:
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]])
+
+
+class SnapshotPatch(ColumnarPatch):
+    """A ColumnarPatch whose columns are views of a memory-mapped snapshot
+
+    Rows and text are read from the file as they are used, so writing a
+    ``.pd`` file does not decode the whole patch first. The first change
+    copies the columns and the string table into memory.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.frozen = False
+
+    def thaw(self) -> None:
+        """Copy the columns out of the file, so the patch can change"""
+        if not self.frozen:
+            return
+        self.frozen = False
+        for name in ('kinds', 'x_positions', 'y_positions', 'sources',
+                     'outlet_indices', 'sinks', 'inlet_indices'):
+            column = getattr(self, name)
+            setattr(self, name, array(column.format, column))
+        # the blob table is shared by the whole file, so only this
+        # patch's texts are copied, into a table of its own
+        blobs = self.strings
+        self.strings = []
+        self.string_ids = {}
+        self.text_sizes = {}
+        local = {-1: -1}
+        text_ids = array('i')
+        for text_id in self.text_ids:
+            new_id = local.get(text_id)
+            if new_id is None:
+                new_id = local[text_id] = self.intern(blobs[text_id])
+            text_ids.append(new_id)
+        self.text_ids = text_ids
+
+    def intern(self, text: str) -> int:
+        self.thaw()
+        return super().intern(text)
+
+    def append_row(self, kind: int, x_pos: int, y_pos: int, text_id: int):
+        self.thaw()
+        return super().append_row(kind, x_pos, y_pos, text_id)
+
+    def append_connection(self, source: int, outlet_index: int, sink: int,
+                          inlet_index: int) -> None:
+        self.thaw()
+        super().append_connection(source, outlet_index, sink, inlet_index)
+
+    def replace_graph(self, nodes, connections) -> None:
+        self.thaw()
+        super().replace_graph(nodes, connections)
+
+    def move_nodes(self, positions) -> None:
+        self.thaw()
+        super().move_nodes(positions)
+
+
+class SnapshotWriter:
+    """Collects the blob table and the columns of each distinct patch"""
+
+    def __init__(self):
+        self.blob_ids: Dict[bytes, int] = {}
+        self.blobs: List[bytes] = []
+        self.patch_ids: Dict[int, int] = {}
+        self.patches: List[Tuple[array, ...]] = []
+
+    def blob(self, data: bytes) -> int:
+        blob_id = self.blob_ids.get(data)
+        if blob_id is None:
+            blob_id = self.blob_ids[data] = len(self.blobs)
+            self.blobs.append(data)
+        return blob_id
+
+    def text(self, text: str) -> int:
+        return self.blob(text.encode('utf-8'))
+
+    def add_patch(self, patch: Patch) -> int:
+        """Add a patch after the patches it contains, and get its id"""
+        patch_id = self.patch_ids.get(id(patch))
+        if patch_id is not None:
+            return patch_id
+        if isinstance(patch, ColumnarPatch):
+            kinds = array('b', patch.kinds)
+            x_positions = array('i', patch.x_positions)
+            y_positions = array('i', patch.y_positions)
+            # renumber text ids into the shared blob table
+            local = {}
+            text_ids = array('i')
+            for text_id in patch.text_ids:
+                if text_id < 0:
+                    text_ids.append(-1)
+                    continue
+                blob_id = local.get(text_id)
+                if blob_id is None:
+                    blob_id = local[text_id] = self.text(
+                        patch.strings[text_id])
+                text_ids.append(blob_id)
+            others = patch.objects.items()
+        else:
+            kinds = array('b')
+            x_positions = array('i')
+            y_positions = array('i')
+            text_ids = array('i')
+            others = []
+            for index, node in enumerate(patch.nodes):
+                x_pos, y_pos = node.position
+                kind = node_kind(node)
+                text_id = -1
+                if kind == OTHER:
+                    others.append((index, node))
+                elif kind != FLOATATOM:
+                    text_id = self.text(node.text)
+                kinds.append(kind)
+                x_positions.append(x_pos)
+                y_positions.append(y_pos)
+                text_ids.append(text_id)
+        objects = array('i')
+        for index, node in others:
+            objects.extend(self.object_record(index, node))
+        sources, outlets, sinks, inlets = patch.edge_columns()
+        columns = (kinds, x_positions, y_positions, text_ids,
+                   array('i', sources), array('i', outlets),
+                   array('i', sinks), array('i', inlets), objects)
+        patch_id = self.patch_ids[id(patch)] = len(self.patches)
+        self.patches.append(columns)
+        return patch_id
+
+    def object_record(self, index: int, node: Node) -> List[int]:
+        if type(node) is Subpatch:
+            return [index, SUBPATCH, self.text(node.name), 0,
+                    self.add_patch(node.src), -1]
+        if type(node) is Clone:
+            return [index, CLONE, self.text(node.name), node.count,
+                    self.add_patch(node.src), -1]
+        return [index, PICKLED, -1, 0, -1,
+                self.blob(pickle.dumps(node, pickle.HIGHEST_PROTOCOL))]
+
+    def write(self, fp, root: int) -> None:
+        """Write the header, the patch records and their columns, then the
+        blob table and the offset where it starts"""
+        fp.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, len(self.blobs),
+                             len(self.patches), root))
+        position = HEADER.size + PATCH_RECORD.size * len(self.patches)
+        chunks = []
+        for columns in self.patches:
+            column_offsets = []
+            for column in columns:
+                # align each column for memoryview.cast
+                padding = -position % 8
+                chunks.append(bytes(padding))
+                position += padding
+                column_offsets.append(position)
+                chunks.append(column)
+                position += len(column) * column.itemsize
+            fp.write(PATCH_RECORD.pack(
+                len(columns[0]), len(columns[4]),
+                len(columns[8]) // OBJECT_FIELDS, *column_offsets))
+        padding = -position % 8
+        chunks.append(bytes(padding))
+        blob_start = position + padding
+        for chunk in chunks:
+            fp.write(chunk)
+        offsets = array('q', [0])
+        for data in self.blobs:
+            offsets.append(offsets[-1] + len(data))
+        fp.write(offsets)
+        fp.write(b''.join(self.blobs))
+        fp.write(struct.pack('<Q', blob_start))
+
+
+def node_kind(node: Node) -> int:
+    node_type = type(node)
+    if node_type is Obj:
+        return OBJ
+    if node_type is Msg:
+        return MSG
+    if node_type is FloatAtom and \
+            str(node) == DEFAULT_FLOATATOM.format(node.x_pos, node.y_pos):
+        return FLOATATOM
+    return OTHER
+
+
+def save_snapshot(patch: Patch, filename: str) -> None:
+    """Write a patch and the patches it contains, see
+    ``Patch.save_snapshot``"""
+    writer = SnapshotWriter()
+    root = writer.add_patch(patch)
+    # a loaded snapshot maps the old file, which must not be truncated
+    fp, temp_name = temporary_file(filename, 'wb')
+    try:
+        with fp:
+            writer.write(fp, root)
+        os.replace(temp_name, filename)
+    except BaseException:
+        os.unlink(temp_name)
+        raise
+
+
+def load_snapshot(filename: str) -> SnapshotPatch:
+    """Map a snapshot file and build its patches, see
+    ``Patch.load_snapshot``"""
+    with open(filename, 'rb') as fp:
+        data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(data)
+    magic, version, byte_order, blob_count, patch_count, root = \
+        HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError('{} is not a patch snapshot'.format(filename))
+    if version != VERSION:
+        raise ValueError('Unsupported snapshot version {}'.format(version))
+    if byte_order != BYTE_ORDER:
+        raise ValueError('The snapshot was written with another byte order')
+    blob_start, = struct.unpack_from('<Q', view, len(view) - 8)
+    offsets_end = blob_start + 8 * (blob_count + 1)
+    blobs = Blobs(view[blob_start:offsets_end].cast('q'),
+                  view[offsets_end:len(view) - 8])
+
+    def column(offset: int, count: int, fmt: str) -> memoryview:
+        size = struct.calcsize(fmt)
+        return view[offset:offset + count * size].cast(fmt)
+
+    patches: List[SnapshotPatch] = []
+    for patch_id in range(patch_count):
+        (node_count, edge_count, object_count, kinds, x_positions,
+         y_positions, text_ids, sources, outlets, sinks, inlets,
+         objects) = PATCH_RECORD.unpack_from(
+             view, HEADER.size + patch_id * PATCH_RECORD.size)
+        patch = SnapshotPatch()
+        patch.kinds = column(kinds, node_count, 'b')
+        patch.x_positions = column(x_positions, node_count, 'i')
+        patch.y_positions = column(y_positions, node_count, 'i')
+        patch.text_ids = column(text_ids, node_count, 'i')
+        patch.sources = column(sources, edge_count, 'i')
+        patch.outlet_indices = column(outlets, edge_count, 'i')
+        patch.sinks = column(sinks, edge_count, 'i')
+        patch.inlet_indices = column(inlets, edge_count, 'i')
+        patch.strings = blobs
+        records = column(objects, object_count * OBJECT_FIELDS, 'i')
+        for start in range(0, len(records), OBJECT_FIELDS):
+            index, kind, name, count, child, blob = \
+                records[start:start + OBJECT_FIELDS]
+            x_pos = patch.x_positions[index]
+            y_pos = patch.y_positions[index]
+            if kind == SUBPATCH:
+                node = Subpatch(x_pos, y_pos, blobs[name], patches[child])
+            elif kind == CLONE:
+                node = Clone(x_pos, y_pos, blobs[name], patches[child],
+                             count)
+            else:
+                node = pickle.loads(blobs.raw(blob))
+            patch.objects[index] = node
+            patch.node_indices[node] = index
+        continue_layout(patch)
+        patch.frozen = True
+        patches.append(patch)
+    return patches[root]
@@ -0,0 +1,298 @@
+from typing import (Callable, Dict, Iterable, Iterator, Mapping, Optional,
+                    Sequence, TextIO, Tuple)
+import os
+import tempfile
+
+from .api import (Node, Obj, Msg, FloatAtom, Subpatch, Clone, Connection,
+                  Patch, OutletList, write_clone_sources)
+from .columnar import CONNECT_FORMAT
+
+
+class StreamedNode(Node):
+    """Handle to a node that a StreamingPatch has already written
+
+    The handle holds the node index, used to connect it, and the position
+    and size used to place the nodes after it.
+    """
+    __slots__ = ('patch', 'index', 'x_pos', 'y_pos', 'width', 'height')
+
+    def __init__(self, patch: 'StreamingPatch', index: int, node: Node):
+        self._outlets = None
+        self.patch = patch
+        self.index = index
+        self.x_pos, self.y_pos = node.position
+        self.width, self.height = node.size
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+class StreamingPatch(Patch):
+    """A Patch that writes each node record as soon as it is created
+
+    Only the row anchors and the number of nodes are kept, so memory use
+    does not grow with the size of the patch. Connection records are
+    buffered in a temporary file and appended when the patch is closed.
+    The file is the same as one written by ``write_file`` for a Patch
+    built with the same calls.
+
+    The creators are the same as for ``Patch``. ``obj``, ``msg``,
+    ``floatatom``, ``subpatch`` and ``clone`` return StreamedNode handles,
+    which can be connected but not edited. The patch cannot be serialized
+    again, and ``nodes`` and ``connections`` stay empty.
+
+      >>> with StreamingPatch.open('big.pd') as patch:
+      ...     obj, msg = patch.get_creators('obj, msg')
+      ...     loadbang = obj('loadbang')
+      ...     msg('!', loadbang[0])
+    """
+    fileobj: TextIO
+    buffer_size: int
+    node_count: int
+    connection_count: int
+    clones: Dict[str, Clone]
+    closed: bool
+    defers_edits = False
+
+    def __init__(self, fileobj: TextIO, buffer_size: int = 1 << 16,
+                 clone_directory: Optional[str] = None):
+        """
+        Parameters
+        ----------
+        fileobj : file object
+            the destination, opened for writing text
+
+        buffer_size : int, optional
+            the number of characters collected before each write
+
+        clone_directory : str, optional
+            where to write the abstractions of clone objects on ``close``.
+            By default they are not written; see ``write_clone_sources``.
+        """
+        super().__init__()
+        self.nodes = ()
+        self.connections = ()
+        self.fileobj = fileobj
+        self.buffer_size = buffer_size
+        self.clone_directory = clone_directory
+        self.node_count = 0
+        self.connection_count = 0
+        self.clones = {}
+        self.closed = False
+        self._owns_file = False
+        self._chunk = []
+        self._chunk_size = 0
+        # the last record is held back, since the file has no final newline
+        self._pending = self.canvas_line
+        self._connection_file = tempfile.TemporaryFile(
+            'w+', encoding='utf-8')
+
+    @classmethod
+    def open(cls, filename: str,
+             buffer_size: int = 1 << 16) -> 'StreamingPatch':
+        """Start a patch file, closed along with the patch
+
+        The abstractions of clone objects are written to the same
+        directory, as ``write_file`` does.
+        """
+        patch = cls(open(filename, 'w'), buffer_size,
+                    os.path.dirname(filename))
+        patch._owns_file = True
+        return patch
+
+    def __enter__(self) -> 'StreamingPatch':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write(self, text: str) -> None:
+        self._chunk.append(self._pending)
+        self._chunk_size += len(self._pending)
+        self._pending = text
+        if self._chunk_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records, except the most recent one"""
+        if self._chunk:
+            self.fileobj.write(''.join(self._chunk))
+            self._chunk.clear()
+            self._chunk_size = 0
+
+    def close(self) -> None:
+        """Write the connection records and finish the file"""
+        if self.closed:
+            return
+        self.closed = True
+        connection_file = self._connection_file
+        if self.node_count == 0 and self.connection_count == 0:
+            # an empty patch keeps the newline after its canvas line
+            self.write('')
+        elif self.connection_count == 0:
+            self._pending = self._pending.rstrip()
+            self.write('')
+        else:
+            self.write('')
+            self.flush()
+            connection_file.seek(0)
+            last = connection_file.read(self.buffer_size)
+            while True:
+                block = connection_file.read(self.buffer_size)
+                if not block:
+                    break
+                self.fileobj.write(last)
+                last = block
+            self._pending = last.rstrip()
+            self.write('')
+        self.flush()
+        connection_file.close()
+        if self._owns_file:
+            self.fileobj.close()
+        if self.clone_directory is not None:
+            write_clone_sources(self.clone_directory, self)
+
+    def stream(self, node: Node) -> StreamedNode:
+        """Write a node and get a handle to it"""
+        return StreamedNode(self, self.append_node(node), node)
+
+    def append_node(self, node: Node) -> int:
+        if self.closed:
+            raise ValueError('StreamingPatch is closed')
+        for line in node.iter_lines():
+            self.write(line)
+        if isinstance(node, (Subpatch, Clone)):
+            self.add_clones(node)
+        index = self.node_count
+        self.node_count += 1
+        return index
+
+    def append_saved(self, node_class: type, x_pos: int, y_pos: int,
+                     text: str) -> StreamedNode:
+        return self.stream(node_class.from_saved(x_pos, y_pos, text))
+
+    def add_clones(self, node: Node) -> None:
+        clones = self.clones
+        found = node.src.iter_clones()
+        if isinstance(node, Clone):
+            found = (node, *found)
+        for clone in found:
+            other = clones.setdefault(clone.name, clone)
+            if other.src is not clone.src and \
+                    other.src.structure_hash() != clone.src.structure_hash():
+                raise ValueError(
+                    'Clone name {!r} is used for different patches'.format(
+                        clone.name))
+
+    def iter_clones(self) -> Iterator[Clone]:
+        """Yield the first clone object written under each name"""
+        yield from self.clones.values()
+
+    def node_index(self, node: Node) -> int:
+        if isinstance(node, StreamedNode) and node.patch is self:
+            return node.index
+        return super().node_index(node)
+
+    def append_connection(self, source: int, outlet_index: int, sink: int,
+                          inlet_index: int) -> None:
+        if self.closed:
+            raise ValueError('StreamingPatch is closed')
+        self._connection_file.write(
+            CONNECT_FORMAT % (source, outlet_index, sink, inlet_index))
+        self.connection_count += 1
+
+    def replace_graph(self, nodes: Sequence[Node],
+                      connections: Iterable[Connection]) -> None:
+        raise TypeError('A StreamingPatch has already written its nodes')
+
+    def move_nodes(self, positions: Mapping[int, Tuple[int, int]]) -> None:
+        raise TypeError('A StreamingPatch has already written its nodes')
+
+    def iter_body(self, emit_subpatch: Optional[
+            Callable[[Subpatch], Iterable[str]]] = None) -> Iterator[str]:
+        raise TypeError('A StreamingPatch is written as it is built and '
+                        'cannot be serialized again')
+
+    def create_obj(
+            self,
+            text: str,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> StreamedNode:
+        """Create an object, see ``Patch.create_obj``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.stream(Obj(x_pos, y_pos, text))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_msg(
+            self,
+            text: str,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> StreamedNode:
+        """Create a message object, see ``Patch.create_msg``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.stream(Msg(x_pos, y_pos, text))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_floatatom(self, *connections: OutletList,
+                         new_row: float = 1,
+                         new_col: float = 0,
+                         x_pos: int = -1,
+                         y_pos: int = -1) -> StreamedNode:
+        """Create a number object, see ``Patch.create_floatatom``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.stream(FloatAtom(x_pos, y_pos))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_subpatch(
+            self,
+            name: str,
+            src: Patch,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> StreamedNode:
+        """Insert a subpatch, see ``Patch.create_subpatch``
+
+        ``src`` is written immediately, so it must be complete.
+        """
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.stream(Subpatch(x_pos, y_pos, name, src))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
+
+    def create_clone(
+            self,
+            name: str,
+            src: Patch,
+            count: int,
+            *connections: OutletList,
+            new_row: float = 1,
+            new_col: float = 0,
+            x_pos: int = -1,
+            y_pos: int = -1) -> StreamedNode:
+        """Insert a clone object, see ``Patch.create_clone``"""
+        x_pos, y_pos, pos_update = self.resolve_position(
+            x_pos, y_pos, new_row, new_col)
+        node = self.stream(Clone(x_pos, y_pos, name, src, count))
+        self.add_connections(node, *connections)
+        pos_update(node)
+        return node
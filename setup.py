@@ -13,6 +13,11 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/dylanburati/puredata-compiler",
     packages=setuptools.find_packages(),
+    entry_points={
+        "console_scripts": [
+            "puredata-compiler=puredata_compiler.cli:main",
+        ],
+    },
     classifiers=[
         "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
@@ -0,0 +1,91 @@
+import json
+import os
+
+from puredata_compiler import build as build_module
+from puredata_compiler.build import build
+
+MODULE = '''
+from puredata_compiler import Patch
+{imports}
+
+def factory():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    obj({text})
+    return patch
+
+
+TARGETS = {{'{name}.pd': factory}}
+'''
+
+
+def write(path, text):
+    with open(str(path), 'w') as fp:
+        fp.write(text)
+
+
+def sources(directory, module):
+    with open(os.path.join(str(directory), '.puredata-cache.json')) as fp:
+        data = json.load(fp)
+    return data['modules'][os.path.abspath(str(module))]['sources']
+
+
+def test_sources_are_the_module_imports(tmp_path):
+    write(tmp_path / 'helper.py', "TEXT = 'osc~ 440'\n")
+    write(tmp_path / 'other.py', "TEXT = 'noise~'\n")
+    first = tmp_path / 'first.py'
+    second = tmp_path / 'second.py'
+    write(first, MODULE.format(imports='from helper import TEXT',
+                               text='TEXT', name='first'))
+    write(second, MODULE.format(imports='from other import TEXT',
+                                text='TEXT', name='second'))
+    report = build([str(second), str(first)], str(tmp_path))
+    assert len(report.written) == 2
+    # other.py is still loaded when first.py runs, but first.py does not
+    # import it
+    assert sources(tmp_path, first) == [str(first),
+                                        str(tmp_path / 'helper.py')]
+    assert sources(tmp_path, second) == [str(second),
+                                         str(tmp_path / 'other.py')]
+
+    write(tmp_path / 'helper.py', "TEXT = 'osc~ 880'\n")
+    report = build([str(second), str(first)], str(tmp_path))
+    assert report.skipped_modules == [str(second)]
+    assert report.written == [str(tmp_path / 'first.pd')]
+    with open(str(tmp_path / 'first.pd')) as fp:
+        assert 'osc~ 880' in fp.read()
+
+
+def test_output_directory_elsewhere(tmp_path):
+    source_dir = tmp_path / 'src'
+    output_dir = tmp_path / 'out'
+    source_dir.mkdir()
+    output_dir.mkdir()
+    write(source_dir / 'lib.py', "TEXT = 'osc~ 440'\n")
+    module = source_dir / 'mod.py'
+    write(module, MODULE.format(imports='from lib import TEXT',
+                                text='TEXT', name='m'))
+    build([str(module)], str(output_dir))
+    assert sources(output_dir, module) == [str(module),
+                                           str(source_dir / 'lib.py')]
+
+    write(source_dir / 'lib.py', "TEXT = 'osc~ 880'\n")
+    report = build([str(module)], str(output_dir))
+    assert report.skipped_modules == []
+    assert report.written == [str(output_dir / 'm.pd')]
+    with open(str(output_dir / 'm.pd')) as fp:
+        assert 'osc~ 880' in fp.read()
+
+
+def test_package_change_runs_modules_again(tmp_path, monkeypatch):
+    module = tmp_path / 'patches.py'
+    write(module, MODULE.format(imports='', text="'osc~ 440'", name='out'))
+    build([str(module)], str(tmp_path))
+    report = build([str(module)], str(tmp_path))
+    assert report.skipped_modules == [str(module)]
+
+    monkeypatch.setattr(build_module, 'package_hash', lambda: 'changed')
+    report = build([str(module)], str(tmp_path))
+    assert report.skipped_modules == []
+    # the output text is the same, so the file is not rewritten
+    assert report.unchanged == [str(tmp_path / 'out.pd')]
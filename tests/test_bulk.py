@@ -0,0 +1,60 @@
+import itertools
+
+from puredata_compiler import Patch
+
+
+def build_with_loop(texts, new_row, new_col):
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    for text in texts:
+        obj(text, new_row=new_row, new_col=new_col)
+    obj('next')
+    obj('below', new_row=1)
+    return patch
+
+
+def build_in_bulk(texts, new_row, new_col):
+    patch = Patch()
+    obj, obj_many = patch.get_creators('obj, obj_many')
+    obj_many(texts, new_row=new_row, new_col=new_col)
+    obj('next')
+    obj('below', new_row=1)
+    return patch
+
+
+def test_bulk_creators_place_nodes_like_a_loop():
+    texts = ['a', 'bb', 'ccc']
+    for new_row, new_col in itertools.product([0, 1, 1.5], [0, 1, 2]):
+        assert str(build_in_bulk(texts, new_row, new_col)) == \
+            str(build_with_loop(texts, new_row, new_col)), (new_row, new_col)
+
+
+def test_bulk_creators_after_existing_nodes():
+    for new_row, new_col in itertools.product([0, 1], [0, 1]):
+        loop = Patch()
+        obj, = loop.get_creators('obj')
+        obj('first')
+        for text in ['a', 'bb']:
+            obj(text, new_row=new_row, new_col=new_col)
+        obj('next', new_row=1)
+        bulk = Patch()
+        obj, obj_many = bulk.get_creators('obj, obj_many')
+        obj('first')
+        obj_many(['a', 'bb'], new_row=new_row, new_col=new_col)
+        obj('next', new_row=1)
+        assert str(bulk) == str(loop), (new_row, new_col)
+
+
+def test_connect_many_matches_connect():
+    loop = Patch()
+    obj, connect = loop.get_creators('obj, connect')
+    source = obj('r x')
+    sinks = [obj('print {}'.format(i)) for i in range(3)]
+    for sink in sinks:
+        connect(sink, source[0])
+    bulk = Patch()
+    obj, connect_many = bulk.get_creators('obj, connect_many')
+    source = obj('r x')
+    sinks = [obj('print {}'.format(i)) for i in range(3)]
+    connect_many([(source, 0, sink, 0) for sink in sinks])
+    assert str(bulk) == str(loop)
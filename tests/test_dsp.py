@@ -0,0 +1,68 @@
+from puredata_compiler import Patch
+
+
+def lines(patch):
+    return str(patch).splitlines()[1:]
+
+
+def test_chain_becomes_one_expr():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    osc = obj('osc~ 440')
+    last = obj('-~ 2', obj('+~ 1', obj('*~ 0.5', osc[0])[0])[0])
+    obj('dac~', last[0], last[0])
+    report = patch.optimize_dsp()
+    assert report.fused_chains == 1
+    assert report.dsp_objects_before == 5
+    assert report.dsp_objects_after == 3
+    assert '#X obj 25 50 expr~ (($v1 * 0.5) + 1) - 2;' in lines(patch)
+
+
+def test_signal_operand_becomes_an_inlet():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    osc = obj('osc~ 440')
+    noise = obj('noise~')
+    product = obj('*~', obj('+~ 1', osc[0])[0], noise[0])
+    obj('dac~', product[0])
+    assert patch.optimize_dsp().fused_chains == 1
+    assert '#X obj 25 75 expr~ ($v1 + 1) * $v2;' in lines(patch)
+
+
+def test_chain_is_not_squared():
+    # both inlets of the *~ take the chain's value, so the chain ends
+    # before it rather than writing its expression twice
+    patch = Patch()
+    obj, connect = patch.get_creators('obj, connect')
+    first = obj('+~ 1', obj('osc~ 440')[0])
+    square = obj('*~', first[0])
+    connect(square, (), first[0])
+    obj('dac~', obj('-~ 2', square[0])[0])
+    assert patch.optimize_dsp().fused_chains == 1
+    text = lines(patch)
+    assert '#X obj 25 50 +~ 1;' in text
+    assert '#X obj 25 75 expr~ ($v1 * $v2) - 2;' in text
+
+
+def test_division_by_signal_is_kept():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    quotient = obj('/~', obj('+~ 1', obj('osc~ 440')[0])[0],
+                   obj('noise~')[0])
+    obj('dac~', quotient[0])
+    assert patch.optimize_dsp().fused_chains == 0
+
+
+def test_subpatch_is_inlined():
+    inner = Patch()
+    obj, = inner.get_creators('obj')
+    obj('outlet~', obj('*~ 0.5', obj('inlet~')[0])[0])
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    gain = subpatch('gain', inner, obj('osc~ 440')[0])
+    obj('dac~', gain[0])
+    report = patch.optimize_dsp()
+    assert report.inlined_subpatches == 1
+    text = str(patch)
+    assert 'inlet~' not in text and 'outlet~' not in text
+    assert '*~ 0.5' in text
@@ -0,0 +1,114 @@
+import pickle
+
+import pytest
+
+from puredata_compiler import ColumnarPatch, Patch
+from puredata_compiler.api import Obj
+
+
+def make_chain(count):
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    nodes = [obj('t f f')]
+    for _ in range(1, count):
+        nodes.append(obj('+ 1', nodes[-1][0], new_row=0))
+    return patch, nodes
+
+
+def test_single_edits_match_a_batch():
+    single, single_nodes = make_chain(20)
+    batch, batch_nodes = make_chain(20)
+    single.remove(single_nodes[3])
+    single.replace(single_nodes[7], Obj(0, 0, '- 1'))
+    single.insert_between(single_nodes[10][0], (single_nodes[11], 0),
+                          Obj(0, 0, 'abs'))
+    with batch.edit() as graph:
+        graph.remove(batch_nodes[3])
+        graph.replace(batch_nodes[7], Obj(0, 0, '- 1'))
+        graph.insert_between(batch_nodes[10][0], (batch_nodes[11], 0),
+                             Obj(0, 0, 'abs'))
+    assert str(single) == str(batch)
+
+
+def test_edits_are_applied_when_the_graph_is_read():
+    patch, nodes = make_chain(5)
+    patch.remove(nodes[1])
+    patch.remove(nodes[3])
+    assert patch.edits_pending
+    assert len(patch.nodes) == 3
+    assert not patch.edits_pending and patch.editor is None
+    assert [(c.source, c.sink) for c in patch.connections] == []
+    assert patch.node_index(nodes[4]) == 2
+
+
+def test_removed_node_cannot_be_edited_again():
+    patch, nodes = make_chain(5)
+    patch.remove(nodes[2])
+    with pytest.raises(ValueError):
+        patch.remove(nodes[2])
+    with pytest.raises(ValueError):
+        patch.replace(nodes[2], Obj(0, 0, 'abs'))
+
+
+def test_insert_between_keeps_fanout_order():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    source = obj('r in')
+    first = obj('print a', source[0])
+    obj('print b', source[0])
+    patch.insert_between(source[0], (first, 0), Obj(0, 0, 't a'))
+    connections = [(c.source, c.sink) for c in patch.connections]
+    assert connections == [(0, 3), (0, 2), (3, 1)]
+
+
+def test_pickle_applies_pending_edits():
+    patch, nodes = make_chain(4)
+    patch.remove(nodes[0])
+    copy = pickle.loads(pickle.dumps(patch))
+    assert len(copy.nodes) == 3
+    assert str(copy) == str(patch)
+    assert copy.editor is None
+
+
+@pytest.mark.parametrize('patch_class', [Patch, ColumnarPatch])
+def test_creators_raise_inside_a_batch(patch_class):
+    patch = patch_class()
+    obj, connect = patch.get_creators('obj, connect')
+    source = obj('loadbang')
+    sink = obj('print x', source[0])
+    before = str(patch)
+    with pytest.raises(RuntimeError):
+        with patch.edit() as graph:
+            graph.remove(sink)
+            obj('f', source[0])
+    with pytest.raises(RuntimeError):
+        with patch.edit():
+            connect(sink, source[0])
+    # the failed batches changed nothing, and the patch can change again
+    assert str(patch) == before
+    obj('f', source[0])
+    assert str(patch).count('#X connect 0 0') == 2
+
+
+def test_creators_apply_pending_edits():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    source = obj('loadbang')
+    patch.remove(obj('print x', source[0]))
+    obj('f', source[0])
+    assert patch.editor is None
+    assert str(patch).splitlines()[1:] == [
+        '#X obj 25 25 loadbang;', '#X obj 25 75 f;', '#X connect 0 0 1 0;']
+
+
+def test_patch_methods_inside_a_batch():
+    patch, nodes = make_chain(4)
+    with patch.edit() as graph:
+        patch.remove(nodes[1])
+        graph.remove(nodes[2])
+        # the editor has not been applied yet
+        assert len(patch.nodes) == 4
+    assert len(patch.nodes) == 2
+    with pytest.raises(RuntimeError):
+        with patch.edit():
+            patch.edit()
@@ -0,0 +1,68 @@
+import random
+import re
+
+from puredata_compiler.api import escape, escape_many, get_display_lines, \
+    unescape
+
+
+def reference_escape(text):
+    save = re.sub(r';', ' \\; ', text)
+    save = re.sub(r',', ' \\, ', save)
+    save = re.sub(r'\$(?=[0-9])', '\\$', save)
+    return save
+
+
+def reference_unescape(text):
+    disp = re.sub(r' (?<!\\)\\; ', '\n', text)
+    disp = re.sub(r' (?<!\\)\\, ', ',', disp)
+    disp = re.sub(r'(?<!\\)\\$', '$', disp)
+    return '\n'.join(l.strip() for l in disp.split('\n'))
+
+
+ALPHABET = 'ab 1;,$\\\n\t ²'
+
+
+def random_texts(samples, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40)))
+            for _ in range(samples)]
+
+
+def test_matches_reference_codec():
+    for text in random_texts(20000):
+        saved = escape(text)
+        assert saved == reference_escape(text), repr(text)
+        assert unescape(text) == reference_unescape(text), repr(text)
+        assert unescape(saved) == reference_unescape(saved), repr(text)
+
+
+def test_escape_many():
+    texts = random_texts(1000, seed=1)
+    assert escape_many(texts) == [escape(t) for t in texts]
+    assert escape_many(iter(texts)) == escape_many(texts)
+
+
+def test_round_trip_of_messages():
+    # a comma stays in the line and a semicolon starts a new one; dollar
+    # arguments stay escaped when displayed, see test_examples
+    rng = random.Random(2)
+    words = ['set', 'note', '0.5', '-1', '$', '$a', 'b']
+    for _ in range(2000):
+        lines = []
+        for _ in range(rng.randint(1, 3)):
+            items = [' '.join(rng.choice(words)
+                              for _ in range(rng.randint(1, 3)))
+                     for _ in range(rng.randint(1, 3))]
+            lines.append(','.join(items))
+        text = ';'.join(lines)
+        displayed = unescape(escape(text))
+        assert displayed.split('\n') == [l.strip() for l in lines]
+
+
+def test_examples():
+    assert escape('set 1, bang; note $1') == \
+        'set 1 \\,  bang \\;  note \\$1'
+    assert escape('$ $a 5$1') == '$ $a 5\\$1'
+    assert unescape(' \\; a \\, b \\$1') == '\na,b \\$1'
+    assert get_display_lines('  plain text  ') == ['plain text']
+    assert get_display_lines('a \\; b') == ['a', 'b']
@@ -0,0 +1,140 @@
+import io
+import sys
+
+import pytest
+
+from puredata_compiler import ColumnarPatch, Patch, instrument
+from puredata_compiler import api
+from puredata_compiler.api import SubpatchCache, TextNode, \
+    subpatch_cache_clear
+from puredata_compiler.instrumentation import all_subclasses
+
+
+def attributes():
+    """The identity of every attribute that instrumentation may replace"""
+    owners = [SubpatchCache, TextNode] + all_subclasses(Patch) + [
+        module for name, module in sorted(sys.modules.items())
+        if name == 'puredata_compiler' or
+        name.startswith('puredata_compiler.')]
+    return {(owner.__name__, name): id(value)
+            for owner in owners for name, value in vars(owner).items()}
+
+
+def build():
+    inner = Patch()
+    obj, = inner.get_creators('obj')
+    obj('outlet', obj('inlet')[0])
+    middle = Patch()
+    obj, subpatch = middle.get_creators('obj, subpatch')
+    subpatch('deep', inner, obj('inlet')[0])
+    patch = Patch()
+    obj, msg, floatatom, subpatch, array, clone, obj_many, connect = \
+        patch.get_creators('obj, msg, floatatom, subpatch, array, clone, '
+                           'obj_many, connect')
+    source = obj('loadbang')
+    box = msg('set 1, 2; x $1', source[0])
+    floatatom(box[0])
+    subpatch('middle', middle, source[0])
+    array('table', 3)
+    clone('voice', inner, 2)
+    first, second = obj_many(['f', '+ 1'])
+    connect(second, first[0])
+    return patch
+
+
+def counts(timings):
+    return {key: timing.count for key, timing in timings.items()}
+
+
+def test_phases_node_types_and_depths():
+    subpatch_cache_clear()
+    with instrument() as instrumentation:
+        patch = build()
+        str(patch)
+        patch.write_to(io.StringIO())
+    timings = instrumentation.timings()
+    assert counts(timings['phases']) == {
+        'resolve_position': 9, 'escape': 8, 'add_connections': 10,
+        'size': 7, 'serialize': 2, 'subpatch_str': 2}
+    assert counts(timings['node_types']) == {
+        'obj': 5, 'msg': 1, 'floatatom': 1, 'subpatch': 2, 'clone': 1,
+        'array': 1}
+    # the second serialization reuses the cached body of the middle
+    # subpatch, so the deep one is only written once
+    assert counts(timings['depths']) == {1: 2, 2: 1}
+    assert all(timing.seconds >= 0 for group in timings.values()
+               for timing in group.values())
+    metrics = dict(instrumentation.metrics())
+    assert metrics['phase.serialize.count'] == 2
+    assert metrics['depth.2.count'] == 1
+
+
+def test_subclass_creators_are_timed():
+    with instrument() as instrumentation:
+        patch = ColumnarPatch()
+        obj, msg = patch.get_creators('obj, msg')
+        msg('bang', obj('loadbang')[0])
+        str(patch)
+    timings = instrumentation.timings()
+    assert counts(timings['node_types']) == {
+        'obj': 1, 'msg': 1, 'floatatom': 0, 'subpatch': 0, 'clone': 0,
+        'array': 0}
+    assert counts(timings['phases']) == {
+        'resolve_position': 2, 'escape': 2, 'add_connections': 2,
+        'size': 1, 'serialize': 1, 'subpatch_str': 0}
+
+
+def test_attributes_are_restored():
+    before = attributes()
+    with instrument():
+        assert attributes() != before
+        str(build())
+    assert attributes() == before
+
+
+def test_attributes_are_restored_after_an_exception():
+    before = attributes()
+    with pytest.raises(KeyError):
+        with instrument():
+            raise KeyError('stop')
+    assert attributes() == before
+    # instrumentation can be enabled again
+    with instrument():
+        pass
+    assert attributes() == before
+
+
+def test_nesting_raises():
+    before = attributes()
+    with instrument():
+        with pytest.raises(RuntimeError):
+            with instrument():
+                pass
+        inside = attributes()
+    assert attributes() == before
+    assert inside != before
+
+
+def test_callback_gets_the_counters():
+    results = []
+    with instrument(callback=results.append) as instrumentation:
+        api.escape('a;b')
+    assert results == [instrumentation]
+    assert instrumentation.timings()['phases']['escape'].count == 1
+
+
+def test_failed_install_is_undone(monkeypatch):
+    before = attributes()
+
+    def fail(owner):
+        raise TypeError('cannot time {}'.format(owner.__name__))
+
+    monkeypatch.setattr('puredata_compiler.instrumentation.all_subclasses',
+                        fail)
+    with pytest.raises(TypeError):
+        with instrument():
+            pass
+    monkeypatch.undo()
+    assert attributes() == before
+    with instrument():
+        pass
@@ -0,0 +1,48 @@
+import random
+
+from puredata_compiler import Patch
+from puredata_compiler.dsp import object_name
+
+
+def port_order(patch, kind):
+    return [index for _, index in sorted(
+        (node.x_pos, index) for index, node in enumerate(patch.nodes)
+        if object_name(node).startswith(kind))]
+
+
+def random_patch(rng):
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    inlets = [obj(rng.choice(['inlet', 'inlet~']), new_row=0)
+              for _ in range(rng.randint(2, 5))]
+    nodes = list(inlets)
+    for i in range(rng.randint(3, 40)):
+        sources = [rng.choice(nodes)[0] for _ in range(rng.randint(1, 2))]
+        nodes.append(obj('+ {}'.format(i), *sources))
+    for _ in range(rng.randint(2, 4)):
+        obj(rng.choice(['outlet', 'outlet~']),
+            rng.choice(nodes[len(inlets):])[0], new_row=0)
+    return patch
+
+
+def test_ports_keep_their_x_order():
+    for seed in range(100):
+        rng = random.Random(seed)
+        patch = random_patch(rng)
+        inlets = port_order(patch, 'inlet')
+        outlets = port_order(patch, 'outlet')
+        patch.auto_layout(max_width=rng.choice([None, 100, 2000]))
+        assert port_order(patch, 'inlet') == inlets, seed
+        assert port_order(patch, 'outlet') == outlets, seed
+
+
+def test_connections_run_downwards():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    first = obj('loadbang')
+    second = obj('t b b', first[0], new_row=0)
+    obj('print', second[0], second[1], new_row=0)
+    patch.auto_layout()
+    y_positions = [node.y_pos for node in patch.nodes]
+    assert y_positions == sorted(y_positions)
+    assert len(set(y_positions)) == 3
@@ -0,0 +1,85 @@
+from puredata_compiler import Patch
+from puredata_compiler.columnar import ColumnarPatch
+
+
+def lines(patch):
+    return str(patch).splitlines()[1:]
+
+
+def test_constant_chain_is_folded():
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    value = obj('* 2', obj('+ 4', msg('3', obj('loadbang')[0])[0])[0])
+    obj('s result', value[0])
+    report = patch.optimize()
+    assert report.folded_messages == 1
+    assert report.removed_objects == 2
+    assert lines(patch) == [
+        '#X obj 25 25 loadbang;',
+        '#X msg 25 50 14;',
+        '#X obj 25 125 s result;',
+        '#X connect 0 0 1 0;',
+        '#X connect 1 0 2 0;',
+    ]
+
+
+def test_unused_objects_are_removed():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    obj('osc~ 440')
+    obj('+ 1', obj('r x')[0])
+    obj('print', obj('* 2', obj('r y')[0])[0])
+    report = patch.optimize()
+    assert report.removed_objects == 2
+    assert report.removed_connections == 1
+    text = [l.split(' ', 4)[-1] for l in lines(patch) if '#X obj' in l]
+    assert text == ['r x;', 'r y;', '* 2;', 'print;']
+
+
+def test_side_effects_are_kept():
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    box = msg('; pd dsp 1', obj('loadbang')[0])
+    obj('dac~', obj('osc~ 440')[0])
+    obj('delay 100', box[0])
+    before = lines(patch)
+    report = patch.optimize()
+    assert report == (0, 0, 0)
+    assert lines(patch) == before
+
+
+def test_trigger_order_is_folded():
+    # the right outlet of the trigger sets the right inlet of the - first,
+    # so the result is 5 - 5 rather than 5 - 0
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    trigger = obj('t f f', msg('5', obj('loadbang')[0])[0])
+    difference = obj('- 0', trigger[0], trigger[1])
+    obj('s out', difference[0])
+    assert patch.optimize().folded_messages == 1
+    assert '#X msg 25 50 0;' in lines(patch)
+
+
+def test_loop_is_not_folded():
+    patch = Patch()
+    obj, msg, connect = patch.get_creators('obj, msg, connect')
+    add = obj('+ 1', msg('1', obj('loadbang')[0])[0])
+    connect(add, add[0])
+    obj('s out', add[0])
+    assert patch.optimize().folded_messages == 0
+    assert '#X obj 25 75 + 1;' in lines(patch)
+
+
+def test_subpatches_and_columnar_patches():
+    inner = ColumnarPatch()
+    obj, = inner.get_creators('obj')
+    obj('outlet', obj('inlet')[0])
+    obj('noise~')
+    patch = Patch()
+    subpatch, = patch.get_creators('subpatch')
+    subpatch('a', inner)
+    subpatch('b', inner)
+    report = patch.optimize()
+    # the shared subpatch is optimized once
+    assert report.removed_objects == 1
+    assert 'noise~' not in str(patch)
@@ -0,0 +1,23 @@
+from puredata_compiler import Patch
+
+
+def section(seed):
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    prev = obj('inlet')
+    for i in range(20):
+        prev = obj('+ {}'.format(seed * 20 + i), prev[0])
+    obj('outlet', prev[0])
+    return patch
+
+
+def test_parallel_serialize_matches_serial():
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    shared = section(0)
+    prev = obj('r in')
+    for i in range(4):
+        prev = subpatch('s{}'.format(i), shared if i % 2 else section(i),
+                        prev[0], new_row=0)
+    obj('print', prev[0])
+    assert patch.serialize(parallel=True, processes=2) == str(patch)
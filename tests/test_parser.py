@@ -0,0 +1,90 @@
+import io
+
+import pytest
+
+from puredata_compiler import Patch, write_file
+from puredata_compiler.columnar import ColumnarPatch
+from puredata_compiler.dsp import object_name
+from puredata_compiler.parser import parse
+
+
+def build():
+    inner = Patch()
+    obj, msg = inner.get_creators('obj, msg')
+    obj('outlet', msg('set $1, bang; other 2', obj('inlet')[0])[0])
+    patch = Patch()
+    obj, msg, floatatom, subpatch, array = patch.get_creators(
+        'obj, msg, floatatom, subpatch, array')
+    voice = subpatch('voice', inner, obj('loadbang')[0])
+    obj('print', voice[0], new_col=1)
+    floatatom(new_row=1)
+    array('table', 3, [0.5, -1, 2])
+    obj('osc~ 440', x_pos=300, y_pos=40)
+    return patch
+
+
+def test_file_round_trip(tmp_path):
+    patch = build()
+    path = str(tmp_path / 'patch.pd')
+    write_file(path, patch)
+    loaded = Patch.load(path)
+    with open(path) as fp:
+        assert str(loaded) == fp.read()
+    assert str(loaded) == str(patch)
+
+
+def test_parse_text_and_bytes():
+    text = str(build())
+    assert str(parse(io.StringIO(text))) == text
+    assert str(parse(io.BytesIO(text.encode('utf-8')))) == text
+
+
+def test_loaded_patch_can_be_extended():
+    loaded = parse(io.StringIO(str(build())))
+    osc = len(loaded.nodes) - 1
+    obj, = loaded.get_creators('obj')
+    obj('dac~', loaded.nodes[osc][0])
+    lines = str(loaded).splitlines()
+    assert [l for l in lines if l.endswith(' dac~;')]
+    assert lines[-1] == '#X connect {} 0 {} 0;'.format(osc, osc + 1)
+
+
+def test_patch_class():
+    loaded = parse(io.StringIO(str(build())), ColumnarPatch)
+    assert isinstance(loaded, ColumnarPatch)
+    assert str(loaded) == str(build())
+
+
+def test_unterminated_record():
+    with pytest.raises(ValueError):
+        parse(io.StringIO('#N canvas 0 50 1000 600 10;\n#X obj 1 2 f'))
+
+
+def test_bad_file_on_disk(tmp_path):
+    # the file is memory-mapped, and the error is not replaced by one from
+    # closing the map
+    path = tmp_path / 'bad.pd'
+    path.write_bytes(b'#N canvas 0 50 1000 600 10;\n'
+                     b'#X obj 10 10 loadbang;\n'
+                     b'#X text 10 80 a comment;\n')
+    with pytest.raises(ValueError, match='Unsupported record'):
+        Patch.load(str(path))
+
+
+def test_pd_floatatoms_and_line_breaks(tmp_path):
+    path = tmp_path / 'saved.pd'
+    path.write_bytes(b'#N canvas 0 50 450 300 12;\r\n'
+                     b'#X floatatom 10 40 5 0 0 0 - - -;\r\n'
+                     b'#X floatatom 10 80 5 0 0 1 freq in out 0;\r\n'
+                     b'#X obj 10 120 osc~\r\n440;\r\n'
+                     b'#X msg 10 160 set 1 \\, bang\n\tnow;\r\n'
+                     b'#X connect 1 0 2 0;\r\n')
+    loaded = Patch.load(str(path))
+    assert str(loaded).splitlines()[1:] == [
+        '#X floatatom 10 40 5 0 0 - - -;',
+        '#X floatatom 10 80 5 0 0 freq in out;',
+        '#X obj 10 120 osc~ 440;',
+        '#X msg 10 160 set 1 \\, bang now;',
+        '#X connect 1 0 2 0;',
+    ]
+    assert object_name(loaded.nodes[2]) == 'osc~'
@@ -0,0 +1,107 @@
+from array import array
+import struct
+
+import pytest
+
+from puredata_compiler import Patch, load_samples
+from puredata_compiler.api import Array
+
+
+def write_wav(path, format_tag, bits, channels, samples):
+    code = {8: 'b', 16: 'h', 32: 'f' if format_tag == 3 else 'i'}[bits]
+    data = array(code, samples).tobytes()
+    block_align = channels * bits // 8
+    path.write_bytes(struct.pack(
+        '<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + len(data), b'WAVE', b'fmt ', 16,
+        format_tag, channels, 44100, 44100 * block_align, block_align, bits,
+        b'data', len(data)) + data)
+    return str(path)
+
+
+def write_npy(path, descr, shape, data):
+    header = "{{'descr': '{}', 'fortran_order': False, 'shape': {}, }}".format(
+        descr, shape)
+    header += ' ' * (63 - (10 + len(header)) % 64) + '\n'
+    path.write_bytes(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) +
+                     header.encode('latin1') + data)
+    return str(path)
+
+
+@pytest.mark.parametrize('bits, full_scale', [(16, 1 << 15), (32, 1 << 31)])
+def test_wav_pcm_is_scaled(tmp_path, bits, full_scale):
+    values = [0, full_scale // 2, -full_scale, full_scale - 1]
+    path = write_wav(tmp_path / 'pcm.wav', 1, bits, 1, values)
+    samples = load_samples(path)
+    assert samples.format == 'f'
+    assert samples.tolist()[:3] == [0.0, 0.5, -1.0]
+    # the largest value rounds to 1 in 32-bit floats
+    assert 0.99 < samples[3] <= 1.0
+
+
+def test_wav_float_is_mapped(tmp_path):
+    path = write_wav(tmp_path / 'float.wav', 3, 32, 1, [0.25, -0.5, 1.5])
+    samples = load_samples(path)
+    assert samples.tolist() == [0.25, -0.5, 1.5]
+    # a view of the mapped file, not a copy
+    assert samples.readonly
+
+
+def test_wav_channels(tmp_path):
+    frames = [(1, -1), (2, -2), (3, -3)]
+    path = write_wav(tmp_path / 'stereo.wav', 3, 32, 2,
+                     [v for frame in frames for v in frame])
+    assert load_samples(path).tolist() == [1.0, 2.0, 3.0]
+    assert load_samples(path, channel=1).tolist() == [-1.0, -2.0, -3.0]
+    with pytest.raises(ValueError):
+        load_samples(path, channel=2)
+
+
+def test_unsupported_wav(tmp_path):
+    path = write_wav(tmp_path / 'bytes.wav', 1, 8, 1, [1, 2])
+    with pytest.raises(ValueError, match='8 bits'):
+        load_samples(path)
+
+
+def test_npy(tmp_path):
+    path = write_npy(tmp_path / 'a.npy', '<f4', (2, 3),
+                     array('f', range(6)).tobytes())
+    assert load_samples(path).tolist() == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    path = write_npy(tmp_path / 'b.npy', '|u1', (3,), bytes([1, 2, 255]))
+    assert load_samples(path).tolist() == [1, 2, 255]
+    path = write_npy(tmp_path / 'c.npy', '>f4', (1,), b'\0' * 4)
+    with pytest.raises(ValueError, match='dtype'):
+        load_samples(path)
+
+
+@pytest.mark.parametrize('count, starts', [
+    (999, [0]), (1000, [0]), (1001, [0, 1000]), (2000, [0, 1000])])
+def test_chunk_boundaries(count, starts):
+    node = Array('table', data=array('f', range(count)))
+    records = list(node.iter_lines())[1:]
+    assert [int(r.split(' ')[1]) for r in records] == starts
+    values = [float(v) for r in records for v in r[:-2].split(' ')[2:]]
+    assert values == list(range(count))
+
+
+def test_round_trip_through_the_parser(tmp_path):
+    data = array('f', [i / 7 for i in range(2500)])
+    patch = Patch()
+    array_, = patch.get_creators('array')
+    array_('table', data=data)
+    path = tmp_path / 'table.pd'
+    path.write_text(str(patch))
+    loaded = Patch.load(str(path))
+    assert str(loaded) == str(patch)
+    node = loaded.nodes[0]
+    assert node.length == 2500 and node.save_flag == 1
+    # %g keeps six significant digits
+    assert all(abs(a - b) <= 1e-5 * abs(b) for a, b in zip(node.data, data))
+
+
+@pytest.mark.parametrize('value', [float('inf'), float('-inf'), float('nan')])
+def test_non_finite_samples_are_rejected(value):
+    data = array('d', range(1500))
+    data[1200] = value
+    node = Array('table', data=data)
+    with pytest.raises(ValueError, match='index 1200'):
+        list(node.iter_lines())
@@ -0,0 +1,129 @@
+import pytest
+
+from puredata_compiler import Patch
+from puredata_compiler.simulate import SimulationError
+
+
+def printed(sim):
+    return sim.printed_lines()
+
+
+def test_counter_fans_out_one_value():
+    # [f] sends the same value to every connection, even when an earlier
+    # one stores the next value in its right inlet
+    patch = Patch()
+    obj, connect = patch.get_creators('obj, connect')
+    go = obj('r go')
+    trigger = obj('t b b', go[0])
+    value = obj('f', trigger[0])
+    increment = obj('+ 1', value[0])
+    connect(value, (), increment[0])
+    obj('print', value[0])
+    sim = patch.simulate()
+    for _ in range(3):
+        sim.send('go')
+    assert printed(sim) == ['print: 0', 'print: 1', 'print: 2']
+
+
+def test_int_keeps_non_finite_values():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    value = obj('i', obj('* 1e+30', obj('r in')[0])[0])
+    obj('print', value[0])
+    obj('print other', obj('i', obj('r other')[0])[0])
+    sim = patch.simulate()
+    sim.send('in', 1e30)
+    sim.send('other', float('nan'))
+    sim.send('other', -2.5)
+    assert printed(sim) == ['print: inf', 'other: nan', 'other: -2']
+
+
+def test_trigger_sends_right_to_left():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    trigger = obj('t b f', obj('r in')[0])
+    obj('print left', trigger[0])
+    obj('print right', trigger[1])
+    sim = patch.simulate()
+    sim.send('in', 5)
+    assert printed(sim) == ['right: 5', 'left: bang']
+
+
+def test_message_box_arguments_and_semicolons():
+    patch = Patch()
+    obj, msg = patch.get_creators('obj, msg')
+    box = msg('$2 $1, 7; other $1', obj('r in')[0])
+    obj('print out', box[0])
+    obj('print other', obj('r other')[0])
+    sim = patch.simulate()
+    sim.send('in', 1, 2)
+    assert printed(sim) == ['out: 2 1', 'out: 7', 'other: 1']
+
+
+def test_pack_unpack_moses_route():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    source = obj('r in')
+    pack = obj('pack 0 0', source[0])
+    unpack = obj('unpack 0 0', pack[0])
+    moses = obj('moses 10', unpack[1])
+    obj('print low', moses[0])
+    obj('print high', moses[1])
+    route = obj('route 1 2', obj('r notes')[0])
+    obj('print one', route[0])
+    obj('print other', route[2])
+    sim = patch.simulate()
+    sim.send('in', 3)
+    sim.send('in', 20)
+    sim.send('notes', 1, 5, 6)
+    sim.send('notes', 3, 4)
+    assert printed(sim) == ['low: 0', 'low: 0', 'one: 5 6', 'other: 3 4']
+
+
+def test_delay_runs_on_the_virtual_clock():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    delay = obj('delay 100', obj('r start')[0])
+    obj('print done', delay[0])
+    sim = patch.simulate()
+    sim.send('start')
+    sim.advance(50)
+    # a second bang reschedules the pending one
+    sim.send('start')
+    sim.advance(99)
+    assert printed(sim) == []
+    sim.advance(1)
+    assert printed(sim) == ['done: bang']
+    assert sim.now == 150
+
+
+def test_subpatch_ports_and_probe():
+    inner = Patch()
+    obj, = inner.get_creators('obj')
+    obj('outlet', obj('* 2', obj('inlet')[0])[0])
+    patch = Patch()
+    obj, subpatch = patch.get_creators('obj, subpatch')
+    subpatch('double', inner, obj('r in')[0])
+    sim = patch.simulate()
+    results = sim.probe(('double', 2))
+    sim.send('in', 21)
+    assert results == [42.0]
+    assert sim.unsupported == []
+
+
+def test_loop_without_delay_overflows():
+    patch = Patch()
+    obj, connect = patch.get_creators('obj, connect')
+    add = obj('+ 1', obj('r x')[0])
+    connect(add, add[0])
+    sim = patch.simulate()
+    with pytest.raises(SimulationError):
+        sim.send('x', 1)
+
+
+def test_unsupported_objects_are_listed():
+    patch = Patch()
+    obj, = patch.get_creators('obj')
+    obj('osc~ 440', obj('expr $f1 * 2', obj('r in')[0])[0])
+    sim = patch.simulate()
+    assert [ref.text for ref in sim.unsupported] == ['expr $f1 * 2']
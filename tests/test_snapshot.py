@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from puredata_compiler import Patch
+from puredata_compiler.api import Subpatch
+from puredata_compiler.columnar import ColumnarPatch
+from puredata_compiler.snapshot import SnapshotPatch
+
+
+def build(patch_class=Patch):
+    inner = patch_class()
+    obj, msg = inner.get_creators('obj, msg')
+    obj('outlet', msg('set $1, bang; other 2', obj('inlet')[0])[0])
+    patch = patch_class()
+    obj, floatatom, subpatch, array, clone = patch.get_creators(
+        'obj, floatatom, subpatch, array, clone')
+    source = obj('loadbang')
+    subpatch('a', inner, source[0])
+    subpatch('b', inner, source[0], new_row=0)
+    clone('voice', inner, 4, source[0])
+    floatatom(source[0])
+    array('table', 3, [0.5, -1, 2])
+    obj('osc~ 440', x_pos=300, y_pos=40)
+    return patch
+
+
+@pytest.mark.parametrize('patch_class', [Patch, ColumnarPatch])
+def test_round_trip(tmp_path, patch_class):
+    patch = build(patch_class)
+    path = str(tmp_path / 'patch.pds')
+    patch.save_snapshot(path)
+    loaded = Patch.load_snapshot(path)
+    assert isinstance(loaded, SnapshotPatch)
+    assert str(loaded) == str(patch)
+    # the snapshot of a loaded patch is read back the same
+    again = str(tmp_path / 'again.pds')
+    loaded.save_snapshot(again)
+    assert str(Patch.load_snapshot(again)) == str(patch)
+
+
+def test_shared_subpatch_is_stored_once(tmp_path):
+    path = str(tmp_path / 'patch.pds')
+    build().save_snapshot(path)
+    loaded = Patch.load_snapshot(path)
+    subpatches = [node for node in loaded.nodes
+                  if isinstance(node, Subpatch)]
+    assert len(subpatches) == 2
+    assert subpatches[0].src is subpatches[1].src
+
+
+def test_loaded_patch_can_change(tmp_path):
+    patch = build()
+    path = str(tmp_path / 'patch.pds')
+    patch.save_snapshot(path)
+    loaded = Patch.load_snapshot(path)
+    obj, = loaded.get_creators('obj')
+    obj('dac~', loaded.nodes[-1][0])
+    obj, = patch.get_creators('obj')
+    obj('dac~', patch.nodes[-1][0])
+    assert str(loaded) == str(patch)
+    # the file is not changed
+    assert 'dac~' not in str(Patch.load_snapshot(path))
+
+
+def test_save_over_a_loaded_snapshot(tmp_path):
+    patch = build()
+    path = str(tmp_path / 'patch.pds')
+    patch.save_snapshot(path)
+    loaded = Patch.load_snapshot(path)
+    # the new file replaces the mapped one instead of truncating it
+    Patch().save_snapshot(path)
+    assert str(loaded) == str(patch)
+    assert str(Patch.load_snapshot(path)) == str(Patch())
+    assert os.listdir(str(tmp_path)) == ['patch.pds']
+
+
+def test_not_a_snapshot(tmp_path):
+    path = tmp_path / 'patch.pd'
+    path.write_text(str(build()))
+    with pytest.raises(ValueError):
+        Patch.load_snapshot(str(path))
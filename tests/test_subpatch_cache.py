@@ -0,0 +1,52 @@
+from puredata_compiler import Patch
+from puredata_compiler.api import Obj, subpatch_cache_clear, \
+    subpatch_cache_info
+
+
+def make_parent():
+    inner = Patch()
+    obj, = inner.get_creators('obj')
+    osc = obj('osc~ 440')
+    parent = Patch()
+    subpatch, = parent.get_creators('subpatch')
+    subpatch('a', inner)
+    return parent, inner, osc
+
+
+def test_parameter_edit_reaches_output():
+    parent, _, osc = make_parent()
+    assert 'osc~ 440' in str(parent)
+    osc.parameters['text'] = 'osc~ 880'
+    text = str(parent)
+    assert 'osc~ 880' in text
+    assert 'osc~ 440' not in text
+
+
+def test_position_edit_reaches_output():
+    parent, _, osc = make_parent()
+    str(parent)
+    osc.x_pos = 77
+    assert '#X obj 77 ' in str(parent)
+
+
+def test_appended_node_reaches_output():
+    parent, inner, _ = make_parent()
+    str(parent)
+    inner.nodes.append(Obj(10, 20, 'dac~'))
+    assert '#X obj 10 20 dac~;' in str(parent)
+
+
+def test_shared_subpatch_is_serialized_once():
+    subpatch_cache_clear()
+    inner = Patch()
+    obj, = inner.get_creators('obj')
+    obj('osc~ 440')
+    parent = Patch()
+    subpatch, = parent.get_creators('subpatch')
+    for i in range(10):
+        subpatch('voice{}'.format(i), inner)
+    text = str(parent)
+    assert text.count('osc~ 440') == 10
+    info = subpatch_cache_info()
+    assert info.misses == 1
+    assert info.hits == 9